@@ -0,0 +1,107 @@
+"""
+admission.py — Admission control and backpressure for heavy analysis work.
+
+At most `max_concurrent` analyses run at once; up to `max_queue` more wait for
+a slot (for at most `queue_timeout_s`). Anything beyond that is rejected
+immediately with an `Overloaded` error carrying a Retry-After estimate, so the
+server sheds load instead of thrashing or running out of memory.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class Overloaded(Exception):
+    """Raised when an analysis can't be admitted; maps to 429/503 + Retry-After."""
+
+    def __init__(self, reason: str, status_code: int, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, time-limited wait queue."""
+
+    def __init__(self, max_concurrent: int = 1, max_queue: int = 4,
+                 queue_timeout_s: float = 120.0, queue_slo_s: float = 30.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_s = queue_timeout_s
+        self.queue_slo_s = queue_slo_s
+
+        self._cond = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.slo_violations = 0
+        self._queue_waits = deque(maxlen=1000)  # seconds, most recent admissions
+        self._avg_run_s = None  # EWMA of run durations, for Retry-After
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: queued work ahead / concurrency."""
+        avg = self._avg_run_s or 30.0
+        return max(1, math.ceil(avg * (self.waiting + 1) / self.max_concurrent))
+
+    @contextmanager
+    def slot(self):
+        """Hold one analysis slot for the duration of the block (or raise Overloaded)."""
+        queued_at = time.monotonic()
+        with self._cond:
+            if self.running >= self.max_concurrent or self.waiting > 0:
+                if self.waiting >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    raise Overloaded("Analysis queue is full", 429, self.retry_after())
+                self.waiting += 1
+                try:
+                    deadline = queued_at + self.queue_timeout_s
+                    while self.running >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected_timeout += 1
+                            raise Overloaded("Timed out waiting for an analysis slot", 503, self.retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.running += 1
+            self.admitted += 1
+            waited = time.monotonic() - queued_at
+            self._queue_waits.append(waited)
+            if waited > self.queue_slo_s:
+                self.slo_violations += 1
+
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self.running -= 1
+                self._avg_run_s = elapsed if self._avg_run_s is None else 0.8 * self._avg_run_s + 0.2 * elapsed
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = np.array(self._queue_waits) if self._queue_waits else np.zeros(1)
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+                "queue_slo_s": self.queue_slo_s,
+                "queue_slo_violations": self.slo_violations,
+                "queue_wait_p50_s": round(float(np.percentile(waits, 50)), 3),
+                "queue_wait_p95_s": round(float(np.percentile(waits, 95)), 3),
+                "avg_run_s": round(self._avg_run_s, 3) if self._avg_run_s is not None else None,
+            }
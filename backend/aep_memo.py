@@ -0,0 +1,277 @@
+"""
+aep_memo.py — Stage-level memoization of the MonteCarloAEP pipeline for what-if reruns.
+
+A MonteCarloAEP run is a chain of stages, each depending on a subset of the
+options. Every stage is cached under the options it actually reads, so a
+what-if rerun recomputes only what changed:
+
+    stage                  key
+    plant                  data fingerprint
+    plant_aggregate        + time_resolution, uncertainty_nan_energy
+    reanalysis_aggregate   + time_resolution, reanalysis_products, reg_* vars, end_date_lt, uncertainty_windiness
+    analysis               all of the above (the initialized MonteCarloAEP)
+    mc_inputs              num_sim, reanalysis_products, uncertainty_* sampling ranges, seed
+    regression_models      reg_model, ml_setup_kwargs (+ outlier filters per outlier settings)
+
+Runs are seeded, so two what-ifs that differ only in, say, `reg_model` use the
+same sampled inputs and their difference reflects the option, not the noise.
+Unseeded runs (seed=None) never reuse sampled inputs.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from reanalysis_cache import CachedReanalysisMixin
+
+try:
+    import openoa
+    from openoa.analysis import MonteCarloAEP
+    HAS_OPENOA = True
+except Exception:
+    MonteCarloAEP = object
+    HAS_OPENOA = False
+
+# _MemoMonteCarloAEP re-implements parts of this OpenOA release's MonteCarloAEP
+# (pinned by OPENOA_REF in setup_data.py and the Dockerfile)
+OPENOA_VERSION = "3.2"
+if HAS_OPENOA and getattr(openoa, "__version__", None) != OPENOA_VERSION:
+    print(f"⚠️ aep_memo mirrors OpenOA {OPENOA_VERSION} but {getattr(openoa, '__version__', '?')} is installed; "
+          "what-if results may differ from MonteCarloAEP", flush=True)
+
+# Options accepted by MonteCarloAEP.__init__ that shape its aggregates
+INIT_OPTIONS = (
+    "time_resolution", "reanalysis_products", "reg_temperature", "reg_wind_direction",
+    "end_date_lt", "uncertainty_nan_energy", "uncertainty_windiness",
+)
+# Options passed to MonteCarloAEP.run()
+RUN_OPTIONS = (
+    "num_sim", "reg_model", "uncertainty_meter", "uncertainty_losses", "uncertainty_windiness",
+    "uncertainty_loss_max", "outlier_detection", "uncertainty_outlier", "ml_setup_kwargs",
+)
+
+
+def stage_key(*parts) -> str:
+    """Canonical, hashable key for a stage's inputs."""
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+class StageCache:
+    """Small LRU cache per stage with hit/miss counters."""
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: dict[str, OrderedDict] = {}
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+
+    def get(self, stage: str, key: str):
+        with self._lock:
+            entries = self._entries.setdefault(stage, OrderedDict())
+            if key in entries:
+                entries.move_to_end(key)
+                self.hits[stage] = self.hits.get(stage, 0) + 1
+                return entries[key]
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            return None
+
+    def put(self, stage: str, key: str, value):
+        with self._lock:
+            entries = self._entries.setdefault(stage, OrderedDict())
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                stage: {"entries": len(entries), "hits": self.hits.get(stage, 0), "misses": self.misses.get(stage, 0)}
+                for stage, entries in self._entries.items()
+            }
+
+
+@contextmanager
+def seeded(seed: int | None):
+    """Seed the global RNGs MonteCarloAEP draws from, restoring their state afterwards."""
+    if seed is None:
+        yield
+        return
+    np_state, py_state = np.random.get_state(), random.getstate()
+    np.random.seed(seed)
+    random.seed(seed)
+    try:
+        yield
+    finally:
+        np.random.set_state(np_state)
+        random.setstate(py_state)
+
+
+class _MemoMonteCarloAEP(CachedReanalysisMixin, MonteCarloAEP):
+    """
+    MonteCarloAEP whose preprocessing and sampling stages go through a StageCache
+    (reanalysis aggregates additionally come from the persistent reanalysis cache).
+    Bound to a cache and data fingerprint by `_memo_class`; the stage timings of
+    the latest run are collected in `stage_log`.
+    """
+
+    _stages: StageCache = None
+    _fingerprint: str = ""
+    _seed: int | None = None
+    stage_log: dict = None
+
+    def _log(self, stage: str, cached: bool, started: float):
+        type(self).stage_log[stage] = {"cached": cached, "seconds": round(time.time() - started, 3)}
+
+    def calculate_aggregate_dataframe(self):
+        # Meter energy + losses; shared by every reanalysis/regression choice
+        started = time.time()
+        key = stage_key(self._fingerprint, self.time_resolution, self.uncertainty_nan_energy)
+        cached = self._stages.get("plant_aggregate", key)
+        if cached is None:
+            self.process_revenue_meter_energy()
+            self.process_loss_estimates()
+            self._stages.put("plant_aggregate", key, self.aggregate)
+        self.aggregate = (cached if cached is not None else self.aggregate).copy()
+        self._log("plant_aggregate", cached is not None, started)
+
+        started = time.time()
+        key = stage_key(
+            self._fingerprint, self.time_resolution, list(self.reanalysis_products), self.reg_temperature,
+            self.reg_wind_direction, self.end_date_lt, self.uncertainty_windiness.tolist(),
+        )
+        cached = self._stages.get("reanalysis_aggregate", key)
+        if cached is None:
+            self.process_reanalysis_data()
+            self._stages.put("reanalysis_aggregate", key, (self._reanalysis_aggregate, self.end_date_lt))
+        else:
+            self._reanalysis_aggregate, self.end_date_lt = cached
+            self.aggregate = self.aggregate.join(self._reanalysis_aggregate)
+        self._log("reanalysis_aggregate", cached is not None, started)
+
+        # Remainder of MonteCarloAEP.calculate_aggregate_dataframe
+        if self.time_resolution in ("MS", "ME"):
+            self.trim_monthly_df()
+        self.aggregate = self.aggregate.dropna(
+            subset=["gross_energy_gwh"] + [product for product in self.reanalysis_products]
+        )
+
+    def setup_monte_carlo_inputs(self):
+        started = time.time()
+        key = stage_key(
+            self.num_sim, list(self.reanalysis_products), self.uncertainty_meter, self.uncertainty_losses,
+            np.asarray(self.uncertainty_windiness).tolist(), np.asarray(self.uncertainty_loss_max).tolist(),
+            self.outlier_detection, np.asarray(self.uncertainty_outlier).tolist(), self._seed,
+        )
+        # Unseeded runs draw fresh inputs: reusing a sample would tie them together
+        cached = self._stages.get("mc_inputs", key) if self._seed is not None else None
+        if cached is None:
+            # A seeded run keeps the RNG state after sampling too, so a rerun
+            # continues from the same point as a run that draws the inputs itself
+            super().setup_monte_carlo_inputs()
+            if self._seed is not None:
+                self._stages.put("mc_inputs", key, (self.mc_inputs, np.random.get_state(), random.getstate()))
+        else:
+            self.mc_inputs, np_state, py_state = cached
+            np.random.set_state(np_state)
+            random.setstate(py_state)
+        self._log("mc_inputs", cached is not None, started)
+
+
+def _memo_class(stages: StageCache, fingerprint: str, seed: int | None):
+    return type("MemoMonteCarloAEP", (_MemoMonteCarloAEP,), {
+        "_stages": stages, "_fingerprint": fingerprint, "_seed": seed, "stage_log": {},
+    })
+
+
+class WhatIfEngine:
+    """Runs MonteCarloAEP what-ifs against memoized stages of one plant."""
+
+    def __init__(self, load_plant, fingerprint, max_entries: int = 8):
+        self.load_plant = load_plant  # () -> PlantData
+        self.fingerprint = fingerprint  # () -> str
+        self.stages = StageCache(max_entries)
+        self._lock = threading.Lock()  # A cached analysis object is not safe to run concurrently
+
+    def _plant(self, fp: str, log: dict):
+        started = time.time()
+        plant = self.stages.get("plant", fp)
+        cached = plant is not None
+        if not cached:
+            plant = self.load_plant()
+            self.stages.clear()  # Everything downstream belonged to older data
+            self.stages.put("plant", fp, plant)
+        log["plant"] = {"cached": cached, "seconds": round(time.time() - started, 3)}
+        return plant
+
+    def run(self, options: dict, seed: int | None = 42) -> dict:
+        """Run with `options` (INIT_OPTIONS + RUN_OPTIONS); returns results and per-stage timings."""
+        started = time.time()
+        init_options = {k: options[k] for k in INIT_OPTIONS if options.get(k) is not None}
+        run_options = {k: options[k] for k in RUN_OPTIONS if options.get(k) is not None}
+        reg_model = run_options.get("reg_model", "lin")
+        if init_options.get("time_resolution", "MS") in ("MS", "ME") and reg_model != "lin":
+            raise ValueError("For monthly time resolution, only linear regression is allowed!")
+
+        with self._lock:
+            fp = self.fingerprint()
+            log = {}
+            plant = self._plant(fp, log)
+            cls = _memo_class(self.stages, fp, seed)
+
+            t0 = time.time()
+            key = stage_key(fp, init_options)
+            analysis = self.stages.get("analysis", key)
+            if analysis is None:
+                analysis = cls(plant, reg_model=reg_model, **init_options)
+                # After init the object only reads plant metadata; point it at the shared
+                # plant (bypassing the deepcopy converter) instead of keeping its own copy
+                object.__setattr__(analysis, "plant", plant)
+                analysis._memo = {"filters": {}, "models": {}}
+                self.stages.put("analysis", key, analysis)
+                log.update(cls.stage_log)
+                log["analysis"] = {"cached": False, "seconds": round(time.time() - t0, 3)}
+            else:
+                # Bind this run's cache and seed to the cached object
+                analysis.__class__ = cls
+                for stage in ("plant_aggregate", "reanalysis_aggregate", "analysis"):
+                    log[stage] = {"cached": True, "seconds": 0.0}
+
+            # OpenOA memoizes outlier filters and fitted ML models on the object; keep
+            # one memo per setting that invalidates them so what-ifs never mix them up
+            # (reused ML hyperparameters skip OpenOA's randomized search, so from there on the
+            # run draws from a different point of the seeded stream than a fresh run would)
+            filters_key = stage_key(options.get("outlier_detection"), options.get("uncertainty_outlier"))
+            models_key = stage_key(reg_model, options.get("ml_setup_kwargs"), filters_key)
+            models_cached = models_key in analysis._memo["models"]
+            analysis.outlier_filtering = analysis._memo["filters"].setdefault(filters_key, {})
+            analysis.opt_model = analysis._memo["models"].setdefault(models_key, {})
+
+            t0 = time.time()
+            with seeded(seed):
+                analysis.run(progress_bar=False, **run_options)
+            log["mc_inputs"] = cls.stage_log["mc_inputs"]
+            log["regression_models"] = {"cached": models_cached}
+            log["monte_carlo"] = {"cached": False, "seconds": round(time.time() - t0, 3)}
+            results = analysis.results.copy()
+
+        return {
+            "aep_gwh": results["aep_GWh"].to_numpy(),
+            "avail_pct": results["avail_pct"].to_numpy(),
+            "curt_pct": results["curt_pct"].to_numpy(),
+            "stages": log,
+            "elapsed_s": round(time.time() - started, 3),
+        }
+
+    def stats(self) -> dict:
+        return self.stages.stats()
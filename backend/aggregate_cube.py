@@ -0,0 +1,400 @@
+"""
+aggregate_cube.py — Precomputed turbine × month × wind-speed-bin aggregate cube.
+
+Every dashboard chart (power curve, monthly production, turbine comparison) is a
+reduction over the same SCADA dimensions. The cube stores sum, count, max and
+sum of squares of each measure per (turbine, month, 0.5 m/s bin) cell, so a
+chart query sums a few thousand cells instead of rescanning 10-minute data.
+
+All four reducers are mergeable, so cubes built over separate row chunks (time
+or turbine partitions) combine exactly with `merge_cubes`; building in chunks
+of SCADA_CHUNK_ROWS bounds peak memory by the chunk rather than the dataset.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+WS_BIN_WIDTH = 0.5  # m/s
+WS_MAX = 25.0  # m/s — last bin shown on the power curve
+N_WS_BINS = int(round(WS_MAX / WS_BIN_WIDTH)) + 1
+# Trailing bin for rows whose wind speed is missing or outside [0, WS_MAX].
+# It is excluded from power curves but still counts towards monthly/turbine totals.
+OTHER_BIN = N_WS_BINS
+
+MEASURES = ("power", "energy")
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+CUBE_FORMAT_VERSION = 1
+
+# Rows reduced per chunk when building cubes (see merge_cubes)
+SCADA_CHUNK_ROWS = int(os.environ.get("SCADA_CHUNK_ROWS", "500000"))
+
+
+# --- Column / index detection (same keyword rules as the chart extraction) ---
+
+def find_column(columns, keywords):
+    """Return the first column whose lowercase name contains any keyword."""
+    for c in columns:
+        cl = str(c).lower()
+        if any(k in cl for k in keywords):
+            return c
+    return None
+
+
+def detect_columns(scada: pd.DataFrame) -> dict:
+    """Map cube measures (plus wind speed) to SCADA column names."""
+    ws_col = find_column(scada.columns, ["ws", "windspeed", "wmet_horwdspd"])
+    power_col = find_column(scada.columns, ["p_avg", "wtur_w", "power"])
+    energy_col = find_column(scada.columns, ["energy"]) or power_col
+    return {"wind_speed": ws_col, "power": power_col, "energy": energy_col}
+
+
+def scada_datetimes(scada: pd.DataFrame) -> pd.DatetimeIndex:
+    """Timestamps of each SCADA row, from a datetime column or index level."""
+    if "Date_time" in scada.columns:
+        values = scada["Date_time"]
+    else:
+        dt_col = None
+        for c in scada.columns:
+            if str(c).lower().strip() in ["date_time", "time", "timestamp", "datetime", "date"]:
+                dt_col = c
+                break
+        if dt_col is not None:
+            values = scada[dt_col]
+        elif scada.index.nlevels > 1:
+            values = scada.index.get_level_values(-1)
+            for i in range(scada.index.nlevels):
+                level_values = scada.index.get_level_values(i)
+                if pd.api.types.is_datetime64_any_dtype(level_values):
+                    values = level_values
+                    break
+        else:
+            values = scada.index
+    return pd.DatetimeIndex(pd.to_datetime(values, utc=True, errors="coerce")).tz_localize(None)
+
+
+def scada_turbine_ids(scada: pd.DataFrame) -> np.ndarray:
+    """Turbine ID of each SCADA row, as strings."""
+    if "Wind_turbine_name" in scada.columns:
+        return scada["Wind_turbine_name"].astype(str).to_numpy()
+    if scada.index.nlevels > 1:
+        names = list(scada.index.names)
+        level = names.index("asset_id") if "asset_id" in names else None
+        if level is None:
+            for i in range(scada.index.nlevels):
+                if not pd.api.types.is_datetime64_any_dtype(scada.index.get_level_values(i)):
+                    level = i
+                    break
+        if level is not None:
+            return scada.index.get_level_values(level).astype(str).to_numpy()
+    # Single-turbine (or undistinguishable) data: treat the whole frame as one unit
+    return np.full(len(scada), "plant", dtype=object)
+
+
+def energy_to_gwh(value: float, column) -> float:
+    """Convert an energy sum to GWh based on the unit hinted by the column name."""
+    name = str(column).lower()
+    if "kwh" in name:
+        return value / 1e6
+    if "mwh" in name:
+        return value / 1e3
+    if "wh" in name:
+        return value / 1e9
+    # Assume kWh if unknown, common in SCADA
+    return value / 1e6
+
+
+def wind_speed_bins(ws: np.ndarray) -> np.ndarray:
+    """0.5 m/s bin code for each wind speed; OTHER_BIN if missing/out of range."""
+    with np.errstate(invalid="ignore"):
+        codes = np.rint(np.asarray(ws, dtype=np.float64) / WS_BIN_WIDTH)
+    valid = np.isfinite(codes) & (codes >= 0) & (codes < N_WS_BINS)
+    return np.where(valid, codes, OTHER_BIN).astype(np.int64)
+
+
+# --- Mergeable per-cell reducers ---
+
+def segment_max(cell: np.ndarray, values: np.ndarray, n_cells: int) -> np.ndarray:
+    """Max of `values` per cell code (-inf for empty cells), via sort + reduceat."""
+    out = np.full(n_cells, -np.inf)
+    if len(cell) == 0:
+        return out
+    order = np.argsort(cell, kind="stable")
+    sorted_cell = cell[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cell[1:] != sorted_cell[:-1]])
+    out[sorted_cell[starts]] = np.maximum.reduceat(values[order], starts)
+    return out
+
+
+def reduce_cells(cell: np.ndarray, values: np.ndarray, n_cells: int):
+    """Return (sum, sumsq, max, count) of the non-NaN `values` per cell code."""
+    values = np.asarray(values, dtype=np.float64)
+    ok = ~np.isnan(values)
+    cell, values = cell[ok], values[ok]
+    sums = np.bincount(cell, weights=values, minlength=n_cells)
+    sumsq = np.bincount(cell, weights=values * values, minlength=n_cells)
+    counts = np.bincount(cell, minlength=n_cells).astype(np.int64)
+    return sums, sumsq, segment_max(cell, values, n_cells), counts
+
+
+@dataclass
+class AggregateCube:
+    """Sum / sum of squares / max / count per (measure, turbine, month, ws bin)."""
+
+    turbines: np.ndarray  # (T,) turbine IDs as strings
+    months: np.ndarray  # (M,) datetime64[M], sorted
+    columns: dict  # measure / "wind_speed" -> source SCADA column name
+    sums: np.ndarray  # (len(MEASURES), T, M, N_WS_BINS + 1) float64
+    sumsq: np.ndarray
+    maxima: np.ndarray
+    counts: np.ndarray  # int64
+    fingerprint: str = ""
+
+    # --- Selection helpers ---
+
+    def _masks(self, turbines=None, start=None, end=None):
+        t_mask = np.ones(len(self.turbines), dtype=bool)
+        if turbines is not None:
+            t_mask = np.isin(self.turbines, [str(t) for t in turbines])
+        m_mask = np.ones(len(self.months), dtype=bool)
+        if start is not None:
+            m_mask &= self.months >= np.datetime64(pd.Timestamp(start), "M")
+        if end is not None:
+            m_mask &= self.months <= np.datetime64(pd.Timestamp(end), "M")
+        return t_mask, m_mask
+
+    def _select(self, array, measure, turbines=None, start=None, end=None):
+        t_mask, m_mask = self._masks(turbines, start, end)
+        return array[MEASURES.index(measure)][t_mask][:, m_mask]
+
+    # --- Chart queries ---
+
+    def power_curve(self, turbines=None, start=None, end=None) -> list:
+        """Binned mean ("actual") and max ("ideal") power per 0.5 m/s bin."""
+        sums = self._select(self.sums, "power", turbines, start, end).sum(axis=(0, 1))
+        counts = self._select(self.counts, "power", turbines, start, end).sum(axis=(0, 1))
+        maxima = self._select(self.maxima, "power", turbines, start, end).max(axis=(0, 1), initial=-np.inf)
+        points = []
+        for b in np.flatnonzero(counts[:N_WS_BINS]):
+            points.append({
+                "wind_speed": round(float(b * WS_BIN_WIDTH), 1),
+                "actual_power": round(float(sums[b] / counts[b]), 1),
+                "ideal_power": round(float(maxima[b]), 1),
+            })
+        return points
+
+    def monthly_energy(self, turbines=None, start=None, end=None) -> pd.Series:
+        """Energy sum per calendar month (1-12), in the source column's unit."""
+        t_mask, m_mask = self._masks(turbines, start, end)
+        per_month = self._select(self.sums, "energy", turbines, start, end).sum(axis=(0, 2))
+        calendar = self.months[m_mask].astype(int) % 12 + 1
+        return pd.Series(per_month, index=calendar).groupby(level=0).sum()
+
+    def monthly_production(self, turbines=None, start=None, end=None) -> list:
+        """Monthly production chart rows (GWh) aggregated over all years selected."""
+        rows = []
+        for month, val in self.monthly_energy(turbines, start, end).items():
+            rows.append({
+                "month": MONTHS[int(month) - 1],
+                "actual_gwh": round(energy_to_gwh(float(val), self.columns.get("energy")), 3),
+            })
+        return rows
+
+    def turbine_mean_power(self, start=None, end=None) -> dict:
+        """Mean power per turbine over all wind speeds (NaN if no samples)."""
+        sums = self._select(self.sums, "power", None, start, end).sum(axis=(1, 2))
+        counts = self._select(self.counts, "power", None, start, end).sum(axis=(1, 2))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        return {str(t): float(m) for t, m in zip(self.turbines, means)}
+
+    def turbine_bins(self, measure="power", turbines=None, start=None, end=None):
+        """(turbine IDs, sums, sumsq, counts) per (turbine, ws bin), summed over months; (T, N_WS_BINS) each."""
+        t_mask, _ = self._masks(turbines, start, end)
+        reduced = [
+            self._select(array, measure, turbines, start, end)[..., :N_WS_BINS].sum(axis=1)
+            for array in (self.sums, self.sumsq, self.counts)
+        ]
+        return (self.turbines[t_mask], *reduced)
+
+    def turbine_stats(self, measure="power", start=None, end=None) -> pd.DataFrame:
+        """Per-turbine count, sum, mean, std and max of a measure."""
+        sums = self._select(self.sums, measure, None, start, end).sum(axis=(1, 2))
+        sumsq = self._select(self.sumsq, measure, None, start, end).sum(axis=(1, 2))
+        counts = self._select(self.counts, measure, None, start, end).sum(axis=(1, 2))
+        maxima = self._select(self.maxima, measure, None, start, end).max(axis=(1, 2), initial=-np.inf)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sums / counts
+            var = np.maximum(sumsq / counts - mean ** 2, 0) * counts / np.maximum(counts - 1, 1)
+        return pd.DataFrame({
+            "count": counts,
+            "sum": sums,
+            "mean": mean,
+            "std": np.sqrt(var),
+            "max": np.where(counts > 0, maxima, np.nan),
+        }, index=pd.Index(self.turbines, name="turbine_id"))
+
+
+def build_cube_from_arrays(turbine_ids, times, wind_speed, measures: dict,
+                           columns: dict | None = None, fingerprint: str = "") -> AggregateCube:
+    """Build a cube from flat per-row arrays (turbine ID, timestamp, wind speed, measures)."""
+    times = np.asarray(times, dtype="datetime64[ns]")
+    valid = ~np.isnat(times)
+    turbine_codes, turbines = pd.factorize(np.asarray(turbine_ids)[valid], sort=True)
+    month_vals = times[valid].astype("datetime64[M]")
+    months, month_codes = np.unique(month_vals, return_inverse=True)
+    bins = wind_speed_bins(np.asarray(wind_speed)[valid])
+
+    n_t, n_m, n_b = len(turbines), len(months), N_WS_BINS + 1
+    n_cells = n_t * n_m * n_b
+    cell = (turbine_codes.astype(np.int64) * n_m + month_codes) * n_b + bins
+
+    shape = (len(MEASURES), n_t, n_m, n_b)
+    sums, sumsq = np.zeros(shape), np.zeros(shape)
+    maxima, counts = np.full(shape, -np.inf), np.zeros(shape, dtype=np.int64)
+    for i, name in enumerate(MEASURES):
+        values = measures.get(name)
+        if values is None:
+            continue
+        s, sq, mx, n = reduce_cells(cell, np.asarray(values)[valid], n_cells)
+        sums[i], sumsq[i] = s.reshape(shape[1:]), sq.reshape(shape[1:])
+        maxima[i], counts[i] = mx.reshape(shape[1:]), n.reshape(shape[1:])
+
+    return AggregateCube(
+        turbines=np.asarray(turbines, dtype=str),
+        months=months,
+        columns=dict(columns or {}),
+        sums=sums,
+        sumsq=sumsq,
+        maxima=maxima,
+        counts=counts,
+        fingerprint=fingerprint,
+    )
+
+
+def merge_cubes(cubes, fingerprint: str | None = None) -> AggregateCube:
+    """
+    Combine cubes built over disjoint rows (e.g. time or turbine partitions)
+    into one over their union: sums, squares and counts add, maxima take the max.
+    """
+    cubes = list(cubes)
+    if len(cubes) == 1:
+        return cubes[0]
+    turbines = np.unique(np.concatenate([c.turbines.astype(str) for c in cubes])) if cubes else np.array([], dtype=str)
+    months = (
+        np.unique(np.concatenate([c.months for c in cubes])) if cubes else np.array([], dtype="datetime64[M]")
+    )
+    shape = (len(MEASURES), len(turbines), len(months), N_WS_BINS + 1)
+    sums, sumsq = np.zeros(shape), np.zeros(shape)
+    maxima, counts = np.full(shape, -np.inf), np.zeros(shape, dtype=np.int64)
+    for c in cubes:
+        # Positions of this cube's turbines/months in the union (unique, so += is safe)
+        cell = np.ix_(
+            range(len(MEASURES)),
+            np.searchsorted(turbines, c.turbines.astype(str)),
+            np.searchsorted(months, c.months),
+            range(N_WS_BINS + 1),
+        )
+        sums[cell] += c.sums
+        sumsq[cell] += c.sumsq
+        counts[cell] += c.counts
+        maxima[cell] = np.maximum(maxima[cell], c.maxima)
+
+    columns = next((c.columns for c in cubes if c.columns), {})
+    if fingerprint is None:
+        fingerprints = {c.fingerprint for c in cubes}
+        fingerprint = fingerprints.pop() if len(fingerprints) == 1 else ""
+    return AggregateCube(
+        turbines=turbines,
+        months=months.astype("datetime64[M]"),
+        columns=dict(columns),
+        sums=sums,
+        sumsq=sumsq,
+        maxima=maxima,
+        counts=counts,
+        fingerprint=fingerprint,
+    )
+
+
+def build_cube(scada: pd.DataFrame, fingerprint: str = "", chunk_rows: int | None = SCADA_CHUNK_ROWS) -> AggregateCube:
+    """
+    Build the aggregate cube from a (prepared) SCADA DataFrame.
+
+    Rows are reduced `chunk_rows` at a time and the partial cubes merged, so
+    only one chunk's float64 copies exist at once (None = a single pass).
+    """
+    columns = detect_columns(scada)
+    names = {k: (str(v) if v is not None else None) for k, v in columns.items()}
+    step = chunk_rows if chunk_rows and chunk_rows > 0 else max(len(scada), 1)
+    cube = None
+    for lo in range(0, max(len(scada), 1), step):
+        chunk = scada.iloc[lo:lo + step]
+        measures = {
+            name: chunk[columns[name]].to_numpy(dtype=np.float64) if columns[name] is not None else None
+            for name in MEASURES
+        }
+        ws = (
+            chunk[columns["wind_speed"]].to_numpy(dtype=np.float64)
+            if columns["wind_speed"] is not None else np.full(len(chunk), np.nan)
+        )
+        part = build_cube_from_arrays(
+            scada_turbine_ids(chunk),
+            scada_datetimes(chunk).values,
+            ws,
+            measures,
+            columns=names,
+            fingerprint=fingerprint,
+        )
+        cube = part if cube is None else merge_cubes([cube, part])
+    return cube
+
+
+# --- Persistence ---
+
+def save_cube(cube: AggregateCube, path: str) -> None:
+    """Write the cube to a single .npz file (atomic replace)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        version=np.array(CUBE_FORMAT_VERSION),
+        turbines=cube.turbines.astype(str),
+        months=cube.months,
+        columns=np.array(json.dumps(cube.columns)),
+        fingerprint=np.array(cube.fingerprint),
+        sums=cube.sums,
+        sumsq=cube.sumsq,
+        maxima=cube.maxima,
+        counts=cube.counts,
+    )
+    os.replace(tmp_path, path)
+
+
+def load_cube(path: str, fingerprint: str | None = None) -> AggregateCube | None:
+    """Load a persisted cube; None if missing, outdated or built from other data."""
+    if not os.path.isfile(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as f:
+            if int(f["version"]) != CUBE_FORMAT_VERSION:
+                return None
+            if fingerprint is not None and str(f["fingerprint"]) != fingerprint:
+                return None
+            return AggregateCube(
+                turbines=f["turbines"],
+                months=f["months"],
+                columns=json.loads(str(f["columns"])),
+                sums=f["sums"],
+                sumsq=f["sumsq"],
+                maxima=f["maxima"],
+                counts=f["counts"],
+                fingerprint=str(f["fingerprint"]),
+            )
+    except Exception as e:
+        print(f"⚠️ Could not load aggregate cube from {path}: {e}")
+        return None
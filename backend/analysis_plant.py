@@ -0,0 +1,168 @@
+"""
+analysis_plant.py — MonteCarloAEP PlantData rebuilt from the published artifacts.
+
+project_ENGIE.prepare() re-reads every CSV and derives the full 10-minute SCADA
+(~3.5 s, ~100 MB) although MonteCarloAEP only reads the meter, curtailment,
+asset and reanalysis tables. The reanalysis products are already published
+(reanalysis_store.py); the small remaining tables and the plant metadata are
+kept here as the "tables" artifact. `build_analysis_plant` turns them into a
+SCADA-free PlantData in ~0.1 s: the frames already carry OpenOA column names,
+so the metadata maps every column to itself.
+
+OpenOA sets the index of each frame while building the PlantData, and every
+MonteCarloAEP deep-copies its plant, so a run still works on private copies of
+these tables; what it no longer does is parse the dataset or hold its SCADA.
+
+Analyses that need the SCADA (multi_analysis.py) pass the SCADA store too: its
+columns are the prepared plant's SCADA columns, so the same tables plus the
+store give back the full plant (~0.5 s) without project_ENGIE.prepare().
+"""
+
+import io
+import json
+import os
+import shutil
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+try:
+    from openoa import PlantData
+    HAS_OPENOA = True
+except Exception:
+    PlantData = None
+    HAS_OPENOA = False
+
+PLANT_TABLES_FORMAT_VERSION = 2
+TIME_TABLES = ("meter", "curtail")
+
+
+@dataclass
+class PlantTables:
+    """Meter / curtailment / asset tables and metadata of a plant, in OpenOA column names."""
+
+    metadata: dict  # PlantMetaData dict with identity column maps
+    meter: pd.DataFrame  # indexed by time
+    curtail: pd.DataFrame  # indexed by time
+    asset: pd.DataFrame  # indexed by asset_id
+    fingerprint: str = ""
+
+
+def identity_metadata(metadata) -> dict:
+    """`PlantMetaData` as a dict whose column maps send every OpenOA column name to itself."""
+    def bucket(meta) -> dict:
+        out = {name: name for name in meta.col_map}
+        if getattr(meta, "frequency", None) is not None:
+            out["frequency"] = meta.frequency
+        return out
+
+    return {
+        "latitude": metadata.latitude,
+        "longitude": metadata.longitude,
+        "capacity": metadata.capacity,
+        "reference_system": metadata.reference_system,
+        "reference_longitude": metadata.reference_longitude,
+        "utm_zone": metadata.utm_zone,
+        "scada": bucket(metadata.scada),
+        "meter": bucket(metadata.meter),
+        "curtail": bucket(metadata.curtail),
+        "asset": bucket(metadata.asset),
+        "reanalysis": {name: bucket(meta) for name, meta in metadata.reanalysis.items()},
+    }
+
+
+def build_plant_tables(plant, fingerprint: str = "") -> PlantTables:
+    """Keep the tables MonteCarloAEP reads from a prepared plant."""
+    frames = {}
+    for name in TIME_TABLES:
+        df = getattr(plant, name).select_dtypes(include="number").astype(np.float64)
+        df.index = pd.DatetimeIndex(df.index, name="time")
+        frames[name] = df
+    asset = plant.asset.drop(columns="geometry", errors="ignore")  # Rebuilt by PlantData
+    return PlantTables(metadata=identity_metadata(plant.metadata), asset=asset, fingerprint=fingerprint, **frames)
+
+
+def save_plant_tables(tables: PlantTables, path: str) -> None:
+    """Write <path>/{meter,curtail}.npz + meta.json (metadata and asset table)."""
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name in TIME_TABLES:
+        df = getattr(tables, name)
+        np.savez(
+            os.path.join(tmp_path, f"{name}.npz"),
+            time=df.index.values.astype("datetime64[ns]"),
+            **{f"col_{i}": df[c].to_numpy(dtype=np.float64) for i, c in enumerate(df.columns)},
+        )
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({
+            "version": PLANT_TABLES_FORMAT_VERSION,
+            "fingerprint": tables.fingerprint,
+            "metadata": tables.metadata,
+            "columns": {name: [str(c) for c in getattr(tables, name).columns] for name in TIME_TABLES},
+            "asset": tables.asset.to_json(orient="split"),
+        }, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_plant_tables(path: str, fingerprint: str | None = None) -> PlantTables | None:
+    """Load persisted plant tables; None if missing or outdated."""
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.isfile(meta_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("version") != PLANT_TABLES_FORMAT_VERSION:
+            return None
+        if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+            return None
+        frames = {}
+        for name in TIME_TABLES:
+            with np.load(os.path.join(path, f"{name}.npz")) as z:
+                frames[name] = pd.DataFrame(
+                    {c: z[f"col_{i}"] for i, c in enumerate(meta["columns"][name])},
+                    index=pd.DatetimeIndex(z["time"], name="time"),
+                )
+        asset = pd.read_json(io.StringIO(meta["asset"]), orient="split")
+        asset.index.name = "asset_id"
+        return PlantTables(metadata=meta["metadata"], asset=asset, fingerprint=meta.get("fingerprint", ""), **frames)
+    except Exception as e:
+        print(f"⚠️ Could not load plant tables from {path}: {e}")
+        return None
+
+
+def scada_frame(scada_store) -> pd.DataFrame:
+    """The SCADA store as a flat frame with OpenOA's time and asset_id columns, time-major like the prepared plant."""
+    asset_id = np.repeat(scada_store.turbines, np.diff(scada_store.offsets))
+    order = np.lexsort((asset_id, scada_store.time))  # The store is turbine-major
+    return pd.DataFrame({
+        "time": scada_store.time[order],
+        "asset_id": asset_id[order],
+        **{name: values[order] for name, values in scada_store.data.items()},
+    })
+
+
+def build_analysis_plant(tables: PlantTables, reanalysis_store, scada_store=None):
+    """
+    PlantData validated for MonteCarloAEP, from the tables and the reanalysis
+    store; SCADA-free unless `scada_store` is given.
+    """
+    reanalysis = {}
+    for name, df in reanalysis_store.frames.items():
+        if name not in tables.metadata["reanalysis"]:
+            continue
+        # Only the columns OpenOA maps (the store also keeps the source's extra variables)
+        columns = [c for c in tables.metadata["reanalysis"][name] if c in df.columns]
+        reanalysis[name] = df[columns].reset_index()
+    return PlantData(
+        metadata=tables.metadata,
+        analysis_type="MonteCarloAEP",
+        meter=tables.meter.reset_index(),
+        curtail=tables.curtail.reset_index(),
+        asset=tables.asset.reset_index(),
+        reanalysis=reanalysis,
+        scada=scada_frame(scada_store) if scada_store is not None else None,
+    )
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+batch_runner.py — Run save_results.py analyses for a fleet of plants and parameter sets.
+
+Jobs from a JSON manifest run in a pool of worker processes (worker_pool.py),
+each with an RSS limit it is killed at, so one oversized job fails alone
+instead of taking the machine down. A failing job is recorded and the batch
+moves on. Every finished job is appended to a checkpoint, so rerunning the
+same command after an interruption skips what already completed:
+
+    python batch_runner.py fleet.json --workers 2 --max-job-rss-mb 2500
+    python batch_runner.py fleet.json --retry-failed    # resume, also rerun failures
+
+Manifest:
+
+    {
+      "defaults": {"num_sim": 20, "reg_model": "lin", "time_resolution": "MS"},
+      "plants": [
+        {"name": "La Haute Borne"},
+        {"name": "Other plant", "data_path": "/data/other_plant.zip",
+         "parameter_sets": [{"num_sim": 50}, {"reg_model": "gam", "time_resolution": "D"}]}
+      ]
+    }
+
+`data_path` is an ENGIE-format dataset (directory or .zip, relative to the
+manifest; La Haute Borne if omitted). Output, under --out (default batch_runs/<manifest name>/):
+
+    <plant>/<job id>.json   results.json-shaped payload of each job
+    checkpoint.jsonl        one line per finished job (ok or failed)
+    index.json              summary of every job in the manifest
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from run_store import params_key
+from worker_pool import WorkerPool
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUT_DIR = os.path.join(BACKEND_DIR, "batch_runs")
+INDEX_VERSION = 1
+
+# compute_results() defaults; None = every reanalysis product of the plant
+DEFAULT_PARAMS = {"num_sim": 20, "reg_model": "lin", "time_resolution": "MS", "reanalysis_products": None}
+PLANT_KEYS = ("name", "data_path", "parameter_sets")
+
+
+# --- Manifest ---
+
+def slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").lower() or "plant"
+
+
+def job_id(plant: str, data_path, params: dict) -> str:
+    """Stable id of a (plant, dataset, parameters) job, so checkpoints survive manifest edits."""
+    key = json.dumps([plant, data_path, params_key(params)])
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def load_manifest(path: str) -> list[dict]:
+    """Expand a manifest into jobs; raises ValueError on unknown keys or missing names."""
+    with open(path) as f:
+        manifest = json.load(f)
+    defaults = {**DEFAULT_PARAMS, **manifest.get("defaults", {})}
+    problems = [f"defaults.{k}" for k in manifest.get("defaults", {}) if k not in DEFAULT_PARAMS]
+
+    jobs, seen = [], set()
+    for i, plant in enumerate(manifest.get("plants", [])):
+        problems += [f"plants[{i}].{k}" for k in plant if k not in PLANT_KEYS]
+        name = plant.get("name")
+        if not name:
+            problems.append(f"plants[{i}].name is required")
+            continue
+        data_path = None
+        if plant.get("data_path"):
+            # Relative to the manifest's directory
+            data_path = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(path)), plant["data_path"]))
+            if not (os.path.exists(data_path) or os.path.isfile(f"{data_path}.zip")):
+                problems.append(f"plants[{i}].data_path ({data_path} does not exist)")
+        for j, overrides in enumerate(plant.get("parameter_sets") or [{}]):
+            problems += [f"plants[{i}].parameter_sets[{j}].{k}" for k in overrides if k not in DEFAULT_PARAMS]
+            params = {**defaults, **overrides}
+            jid = job_id(name, data_path, params)
+            if jid in seen:
+                continue  # Same plant and parameters listed twice
+            seen.add(jid)
+            jobs.append({"id": jid, "plant": name, "data_path": data_path, "params": params})
+    if problems:
+        raise ValueError(f"Invalid manifest {path}: unknown or missing {', '.join(problems)}")
+    return jobs
+
+
+# --- Checkpoint and outputs ---
+
+def result_path(out_dir: str, job: dict) -> str:
+    return os.path.join(out_dir, slug(job["plant"]), f"{job['id']}.json")
+
+
+def write_json(path: str, payload) -> None:
+    """Write JSON atomically (a killed run never leaves a truncated file)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(out_dir: str) -> dict:
+    """Latest checkpoint record per job id."""
+    records = {}
+    path = os.path.join(out_dir, "checkpoint.jsonl")
+    if os.path.isfile(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Line torn by an interruption
+                records[record["id"]] = record
+    return records
+
+
+def append_checkpoint(out_dir: str, record: dict) -> None:
+    with open(os.path.join(out_dir, "checkpoint.jsonl"), "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_index(out_dir: str, manifest: str, jobs: list, records: dict) -> dict:
+    entries = []
+    for job in jobs:
+        record = records.get(job["id"], {})
+        entries.append({
+            "id": job["id"],
+            "plant": job["plant"],
+            "data_path": job["data_path"],
+            "params": job["params"],
+            "status": record.get("status", "pending"),
+            "result": os.path.relpath(result_path(out_dir, job), out_dir) if record.get("status") == "ok" else None,
+            "aep_gwh": record.get("aep_gwh"),
+            "uncertainty": record.get("uncertainty"),
+            "mode": record.get("mode"),
+            "elapsed_s": record.get("elapsed_s"),
+            "error": record.get("error"),
+            "finished_at": record.get("finished_at"),
+        })
+    counts = {}
+    for e in entries:
+        counts[e["status"]] = counts.get(e["status"], 0) + 1
+    index = {
+        "version": INDEX_VERSION,
+        "manifest": os.path.abspath(manifest),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "counts": counts,
+        "jobs": entries,
+    }
+    write_json(os.path.join(out_dir, "index.json"), index)
+    return index
+
+
+# --- Running ---
+
+def run_job(pool: WorkerPool, job: dict, out_dir: str, timeout: float | None, store: bool) -> dict:
+    """Run one job in the pool; returns its checkpoint record (never raises)."""
+    started = time.time()
+    record = {"id": job["id"], "plant": job["plant"]}
+    try:
+        result = pool.run(
+            "save_results:compute_results",
+            timeout=timeout,
+            store=store,
+            plant_name=job["plant"],
+            data_path=job["data_path"],
+            **job["params"],
+        )
+        write_json(result_path(out_dir, job), result)
+        record.update({
+            "status": "ok",
+            "aep_gwh": result.get("aep_gwh"),
+            "uncertainty": result.get("uncertainty"),
+            "mode": result.get("mode"),
+            "run_id": result.get("run_id"),
+        })
+    except Exception as e:  # WorkerCrashed / JobMemoryExceeded / TimeoutError / the job's own error
+        record.update({"status": "failed", "error": f"{type(e).__name__}: {e}"})
+    record["elapsed_s"] = round(time.time() - started, 1)
+    record["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return record
+
+
+def run_batch(manifest: str, out_dir: str, workers: int = 1, max_job_rss_mb: float | None = None,
+              max_jobs_per_worker: int = 10, timeout: float | None = None, retry_failed: bool = False,
+              store: bool = False, max_job_vm_mb: float | None = None) -> dict:
+    """Run every job of `manifest` not already completed in `out_dir`; returns the index."""
+    jobs = load_manifest(manifest)
+    os.makedirs(out_dir, exist_ok=True)
+    records = read_checkpoint(out_dir)
+
+    def done(job):
+        record = records.get(job["id"])
+        if record is None:
+            return False
+        if record["status"] == "ok":
+            return os.path.isfile(result_path(out_dir, job))
+        return not retry_failed
+
+    todo = [job for job in jobs if not done(job)]
+    # Group by dataset so a worker keeps reusing the plant it already loaded
+    todo.sort(key=lambda job: (job["data_path"] or "", job["plant"]))
+    print(f"📋 {len(jobs)} job(s) in {manifest}: {len(jobs) - len(todo)} already done, {len(todo)} to run", flush=True)
+    if not todo:
+        return write_index(out_dir, manifest, jobs, records)
+
+    pool = WorkerPool(
+        size=min(workers, len(todo)),
+        initializer="save_results:setup_engie",
+        max_jobs=max_jobs_per_worker,
+        max_job_rss_mb=max_job_rss_mb,
+        max_job_vm_mb=max_job_vm_mb,
+    )
+    started = time.time()
+    executor = ThreadPoolExecutor(max_workers=pool.size)
+    try:
+        futures = [executor.submit(run_job, pool, job, out_dir, timeout, store) for job in todo]
+        for n, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            append_checkpoint(out_dir, record)
+            records[record["id"]] = record
+            write_index(out_dir, manifest, jobs, records)
+            icon = "✅" if record["status"] == "ok" else "❌"
+            detail = f"{record['aep_gwh']} GWh" if record["status"] == "ok" else record["error"]
+            print(f"{icon} [{n}/{len(todo)}] {record['plant']} {record['id']} "
+                  f"({record['elapsed_s']}s): {detail}", flush=True)
+    except KeyboardInterrupt:
+        print("⏸️ Interrupted; finished jobs are checkpointed, rerun the same command to resume", flush=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=False)
+        pool.shutdown()
+
+    index = write_index(out_dir, manifest, jobs, records)
+    print(f"📦 Batch finished in {time.time() - started:.0f}s: {index['counts']} — "
+          f"{os.path.join(out_dir, 'index.json')}", flush=True)
+    return index
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt  # SIGTERM stops the batch like Ctrl-C
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0], formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("manifest", help="JSON manifest of plants and parameter sets")
+    parser.add_argument("--out", help="Output directory (default batch_runs/<manifest name>)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (default 1)")
+    parser.add_argument("--max-job-rss-mb", type=float, help="Kill a job whose worker RSS passes this (polled every 0.5 s)")
+    parser.add_argument("--max-job-vm-mb", type=float, help="Hard address-space limit (RLIMIT_AS) per worker")
+    parser.add_argument("--max-jobs-per-worker", type=int, default=10, help="Recycle workers after N jobs")
+    parser.add_argument("--timeout", type=float, default=3600, help="Per-job timeout in seconds (default 3600)")
+    parser.add_argument("--retry-failed", action="store_true", help="Rerun jobs checkpointed as failed")
+    parser.add_argument("--store", action="store_true", help="Also record each run in the run history")
+    args = parser.parse_args()
+
+    manifest = os.path.abspath(args.manifest)
+    out_dir = os.path.abspath(args.out or os.path.join(DEFAULT_OUT_DIR, os.path.splitext(os.path.basename(manifest))[0]))
+    os.chdir(BACKEND_DIR)  # save_results.py finds OpenOA_Repo relative to the working directory
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        index = run_batch(
+            manifest, out_dir, workers=max(1, args.workers), max_job_rss_mb=args.max_job_rss_mb,
+            max_jobs_per_worker=args.max_jobs_per_worker, timeout=args.timeout or None,
+            retry_failed=args.retry_failed, store=args.store, max_job_vm_mb=args.max_job_vm_mb,
+        )
+    except ValueError as e:
+        print(f"❌ {e}", flush=True)
+        sys.exit(2)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    sys.exit(1 if index["counts"].get("failed") else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+bootstrap.py — Block-bootstrap confidence bands for the power curve and monthly production.
+
+SCADA is reduced once to daily aggregates (power sum/count per 0.5 m/s bin and
+energy per day, summed over turbines). A moving-block bootstrap then resamples
+runs of BOOTSTRAP_BLOCK_DAYS consecutive days, which keeps the day-to-day
+autocorrelation of wind inside each block. Every replicate is a row of a
+(replicates × days) draw-count matrix, so all replicates are evaluated at once
+by one matrix product instead of a Python loop:
+
+    power curve      (W @ power_sums) / (W @ power_counts)   per wind-speed bin
+    monthly energy   W_m @ energy_m                          per calendar month
+
+Monthly bands resample only days of the same month of the same year (a
+seasonal block bootstrap, stratified by year), so a January replicate is never
+built from July wind and no block runs from one year's January 31 into the
+next year's January 1. The record's total for a calendar month is the sum of
+its per-year replicates. The bands describe the sampling uncertainty of the
+actual production, not an expectation (there is no budget model).
+"""
+
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import (
+    MONTHS,
+    N_WS_BINS,
+    SCADA_CHUNK_ROWS,
+    WS_BIN_WIDTH,
+    detect_columns,
+    energy_to_gwh,
+    scada_datetimes,
+    wind_speed_bins,
+)
+
+BOOTSTRAP_REPLICATES = int(os.environ.get("BOOTSTRAP_REPLICATES", "2000"))
+BOOTSTRAP_BLOCK_DAYS = int(os.environ.get("BOOTSTRAP_BLOCK_DAYS", "7"))
+BOOTSTRAP_CONFIDENCE = float(os.environ.get("BOOTSTRAP_CONFIDENCE", "0.9"))
+BOOTSTRAP_SEED = int(os.environ.get("BOOTSTRAP_SEED", "0"))  # Fixed: the same data gives the same bands
+
+
+@dataclass
+class DailyAggregates:
+    """Per-day sums over all turbines: power per wind-speed bin, and energy."""
+
+    days: np.ndarray  # (D,) datetime64[D], sorted
+    power_sums: np.ndarray  # (D, N_WS_BINS) float64
+    power_counts: np.ndarray  # (D, N_WS_BINS) float64
+    energy: np.ndarray  # (D,) float64, in the source column's unit
+
+
+def daily_aggregates(times, wind_speed, power=None, energy=None) -> DailyAggregates:
+    """Daily aggregates of flat per-row arrays (rows without a timestamp are dropped)."""
+    times = np.asarray(times, dtype="datetime64[ns]")
+    valid = ~np.isnat(times)
+    days, codes = np.unique(times[valid].astype("datetime64[D]"), return_inverse=True)
+    n_days = len(days)
+    bins = wind_speed_bins(np.asarray(wind_speed)[valid])
+
+    power_sums = np.zeros((n_days, N_WS_BINS))
+    power_counts = np.zeros((n_days, N_WS_BINS))
+    if power is not None:
+        values = np.asarray(power, dtype=np.float64)[valid]
+        ok = ~np.isnan(values) & (bins < N_WS_BINS)  # Power curve bins only
+        cell = codes[ok] * N_WS_BINS + bins[ok]
+        power_sums = np.bincount(cell, weights=values[ok], minlength=n_days * N_WS_BINS).reshape(n_days, -1)
+        power_counts = np.bincount(cell, minlength=n_days * N_WS_BINS).reshape(n_days, -1).astype(np.float64)
+
+    daily_energy = np.zeros(n_days)
+    if energy is not None:
+        values = np.asarray(energy, dtype=np.float64)[valid]
+        ok = ~np.isnan(values)
+        daily_energy = np.bincount(codes[ok], weights=values[ok], minlength=n_days)
+
+    return DailyAggregates(days=days, power_sums=power_sums, power_counts=power_counts, energy=daily_energy)
+
+
+def merge_daily(parts) -> DailyAggregates:
+    """Combine daily aggregates of disjoint row chunks (days present in several chunks add up)."""
+    parts = list(parts)
+    if len(parts) == 1:
+        return parts[0]
+    days, codes = np.unique(np.concatenate([p.days for p in parts]), return_inverse=True)
+    power_sums = np.zeros((len(days), N_WS_BINS))
+    power_counts = np.zeros((len(days), N_WS_BINS))
+    energy = np.zeros(len(days))
+    np.add.at(power_sums, codes, np.concatenate([p.power_sums for p in parts]))
+    np.add.at(power_counts, codes, np.concatenate([p.power_counts for p in parts]))
+    np.add.at(energy, codes, np.concatenate([p.energy for p in parts]))
+    return DailyAggregates(days=days, power_sums=power_sums, power_counts=power_counts, energy=energy)
+
+
+def daily_from_frame(scada: pd.DataFrame, chunk_rows: int = SCADA_CHUNK_ROWS) -> DailyAggregates:
+    """Daily aggregates of a (prepared) SCADA DataFrame, `chunk_rows` rows at a time."""
+    columns = detect_columns(scada)
+    step = chunk_rows if chunk_rows and chunk_rows > 0 else max(len(scada), 1)
+    parts = []
+    for lo in range(0, max(len(scada), 1), step):
+        chunk = scada.iloc[lo:lo + step]
+        column = {k: (chunk[c].to_numpy(dtype=np.float64) if c is not None else None) for k, c in columns.items()}
+        ws = column["wind_speed"] if column["wind_speed"] is not None else np.full(len(chunk), np.nan)
+        parts.append(daily_aggregates(scada_datetimes(chunk).values, ws, column["power"], column["energy"]))
+    return merge_daily(parts)
+
+
+def daily_from_store(store, turbines=None, start=None, end=None, chunk_rows: int = SCADA_CHUNK_ROWS) -> DailyAggregates:
+    """Daily aggregates of a ScadaStore selection, streamed in time partitions."""
+    ws, power, energy = store.column("wind_speed"), store.column("power"), store.column("energy")
+    parts = []
+    for chunk in store.iter_chunks(turbines, start, end, by="time", chunk_rows=chunk_rows):
+        idx = np.concatenate([np.arange(s.start, s.stop) for _, s in chunk])
+        parts.append(daily_aggregates(
+            store.time[idx],
+            ws[idx] if ws is not None else np.full(len(idx), np.nan),
+            power[idx] if power is not None else None,
+            energy[idx] if energy is not None else None,
+        ))
+    return merge_daily(parts) if parts else daily_aggregates(np.array([], dtype="datetime64[ns]"), np.array([]))
+
+
+def block_bootstrap_weights(n: int, block_len: int, replicates: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    (replicates, n) matrix of how often each of `n` ordered observations is drawn
+    by a moving-block bootstrap with blocks of `block_len` consecutive ones.
+    """
+    block_len = max(1, min(block_len, n))
+    n_blocks = -(-n // block_len)
+    starts = rng.integers(0, n - block_len + 1, size=(replicates, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_len)).reshape(replicates, -1)[:, :n]
+    flat = (np.arange(replicates)[:, None] * n + idx).ravel()
+    return np.bincount(flat, minlength=replicates * n).reshape(replicates, n).astype(np.float64)
+
+
+def _percentiles(confidence: float):
+    alpha = (1 - confidence) / 2
+    return [100 * alpha, 100 * (1 - alpha)]
+
+
+def power_curve_bands(daily: DailyAggregates, replicates: int = BOOTSTRAP_REPLICATES,
+                      block_days: int = BOOTSTRAP_BLOCK_DAYS, confidence: float = BOOTSTRAP_CONFIDENCE,
+                      seed: int = BOOTSTRAP_SEED) -> dict:
+    """Bootstrap band of the binned mean power: {wind speed: (low, high)}."""
+    observed = np.flatnonzero(daily.power_counts.sum(axis=0) > 0)
+    if len(daily.days) == 0 or len(observed) == 0:
+        return {}
+    rng = np.random.default_rng(seed)
+    weights = block_bootstrap_weights(len(daily.days), block_days, replicates, rng)
+    sums = weights @ daily.power_sums[:, observed]
+    counts = weights @ daily.power_counts[:, observed]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    low, high = np.nanpercentile(means, _percentiles(confidence), axis=0)
+    return {round(float(b * WS_BIN_WIDTH), 1): (float(lo), float(hi)) for b, lo, hi in zip(observed, low, high)}
+
+
+def monthly_energy_bands(daily: DailyAggregates, replicates: int = BOOTSTRAP_REPLICATES,
+                         block_days: int = BOOTSTRAP_BLOCK_DAYS, confidence: float = BOOTSTRAP_CONFIDENCE,
+                         seed: int = BOOTSTRAP_SEED) -> pd.DataFrame:
+    """
+    Seasonal block bootstrap of the energy per calendar month (1-12), summed
+    over the record like AggregateCube.monthly_energy: mean, low and high.
+    Blocks stay within one month of one year.
+    """
+    rng = np.random.default_rng(seed)
+    year_month = daily.days.astype("datetime64[M]").astype(int)
+    calendar = year_month % 12 + 1
+    rows = {}
+    for month in np.unique(calendar):
+        totals = np.zeros(replicates)
+        for segment in np.unique(year_month[calendar == month]):
+            energy = daily.energy[year_month == segment]
+            totals += block_bootstrap_weights(len(energy), block_days, replicates, rng) @ energy
+        low, high = np.percentile(totals, _percentiles(confidence))
+        rows[int(month)] = {"mean": float(totals.mean()), "low": float(low), "high": float(high)}
+    return pd.DataFrame.from_dict(rows, orient="index", columns=["mean", "low", "high"])
+
+
+# --- Chart annotation ---
+
+def add_power_curve_bands(points: list, daily: DailyAggregates, **kwargs) -> list:
+    """Add `actual_power_low` / `actual_power_high` to power curve rows (in place)."""
+    bands = power_curve_bands(daily, **kwargs)
+    for point in points:
+        low, high = bands.get(point["wind_speed"], (point["actual_power"], point["actual_power"]))
+        point["actual_power_low"] = round(low, 1)
+        point["actual_power_high"] = round(high, 1)
+    return points
+
+
+def add_monthly_bands(rows: list, daily: DailyAggregates, energy_column, **kwargs) -> list:
+    """
+    Add the bootstrap band of the monthly rows' `actual_gwh` as `actual_low_gwh` /
+    `actual_high_gwh` (in place).
+    """
+    bands = monthly_energy_bands(daily, **kwargs)
+    for row in rows:
+        month = MONTHS.index(row["month"]) + 1
+        if month not in bands.index:
+            continue
+        row["actual_low_gwh"] = round(energy_to_gwh(float(bands.at[month, "low"]), energy_column), 3)
+        row["actual_high_gwh"] = round(energy_to_gwh(float(bands.at[month, "high"]), energy_column), 3)
+    return rows
@@ -0,0 +1,213 @@
+"""
+cost_model.py — Runtime and peak-memory estimates for MonteCarloAEP runs.
+
+Every real /analyze run appends one record (parameters, stage durations, peak
+RSS) to a JSON-lines log. Estimates model a run as
+
+    analysis_s = init(time_resolution)
+                 + per_product(reg_model) * len(reanalysis_products)
+                 + per_sim(reg_model) * num_sim
+
+per (reg_model, time_resolution) group: priors measured on La Haute Borne
+are used until the group has recorded runs, then scaled by the observed
+ratio, and replaced by a least-squares fit once the runs vary enough in
+num_sim and product count. Peak memory is the process RSS when the analysis
+starts (plant loaded) plus the analysis' own growth, fitted on the same
+features.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from worker_pool import peak_rss_mb
+
+RUN_LOG_PATH = os.environ.get(
+    "ANALYSIS_RUN_LOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "analysis_runs.jsonl")
+)
+
+# Priors (seconds, 1 CPU): MonteCarloAEP init by resolution, plus fixed model
+# fitting per reanalysis product and per-simulation cost at daily resolution
+PRIOR_INIT_S = {"MS": 0.4, "ME": 0.4, "D": 0.5, "h": 3.2}
+PRIOR_MODEL_S = {"lin": (0.0, 0.015), "gam": (1.6, 0.06), "gbm": (5.0, 22.0), "etr": (10.0, 35.0)}
+RESOLUTION_SCALE = {"MS": 0.75, "ME": 0.75, "D": 1.0, "h": 4.0}
+# Building the SCADA-free analysis plant from published artifacts (analysis_plant.py)
+PRIOR_PLANT_LOAD_S = 0.3
+PRIOR_OVERHEAD_S = 1.0  # Plot, chart data and response building
+PRIOR_PROJECTED_OVERHEAD_S = 0.2  # Same, when `fields` skips the plot and some charts
+# RSS (MB) of a process with the analysis plant built, and the analysis' growth
+# on top of it, with the same structure as the runtime priors
+PRIOR_BASE_RSS_MB = 500.0
+PRIOR_INIT_MB = {"MS": 40.0, "ME": 40.0, "D": 50.0, "h": 150.0}
+PRIOR_MODEL_MB = {"lin": (0.0, 1.3), "gam": (20.0, 1.3), "gbm": (30.0, 2.0), "etr": (60.0, 2.0)}
+MIN_FIT_RUNS = 5
+
+
+def current_rss_mb() -> float:
+    """Current resident set size of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+class PeakMemory:
+    """Context manager sampling this process's RSS in a background thread; `.start_mb`/`.peak_mb`."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.start_mb = 0.0
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+def features(params: dict) -> np.ndarray:
+    return np.array([1.0, len(params["reanalysis_products"]), params["num_sim"]], dtype=float)
+
+
+def prior_runtime_s(params: dict) -> float:
+    per_product, per_sim = PRIOR_MODEL_S[params["reg_model"]]
+    scale = RESOLUTION_SCALE[params["time_resolution"]]
+    return float(
+        PRIOR_INIT_S[params["time_resolution"]]
+        + scale * (per_product * len(params["reanalysis_products"]) + per_sim * params["num_sim"])
+    )
+
+
+def prior_analysis_memory_mb(params: dict) -> float:
+    per_product, per_sim = PRIOR_MODEL_MB[params["reg_model"]]
+    scale = RESOLUTION_SCALE[params["time_resolution"]]
+    return float(
+        PRIOR_INIT_MB[params["time_resolution"]]
+        + scale * (per_product * len(params["reanalysis_products"]) + per_sim * params["num_sim"])
+    )
+
+
+def record_run(params: dict, plant_load_s: float, analysis_s: float, total_s: float,
+               memory: PeakMemory, fields: list | None = None, path: str = RUN_LOG_PATH):
+    """Append one completed run to the run log (single small O_APPEND write, safe across workers)."""
+    record = {
+        "timestamp": time.time(),
+        "pid": os.getpid(),
+        "params": {k: params[k] for k in ("num_sim", "reg_model", "time_resolution", "reanalysis_products")},
+        "fields": sorted(fields) if fields is not None else None,
+        "plant_load_s": round(plant_load_s, 3),
+        "analysis_s": round(analysis_s, 3),
+        "total_s": round(total_s, 3),
+        "start_memory_mb": round(memory.start_mb, 1),
+        "peak_memory_mb": round(memory.peak_mb, 1),
+    }
+    try:
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"⚠️ Could not record analysis run in {path}: {e}", flush=True)
+
+
+class CostModel:
+    """Estimates runtime and peak memory from the run log (re-read when it changes)."""
+
+    def __init__(self, path: str = RUN_LOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._records: list[dict] = []
+
+    def records(self) -> list[dict]:
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return []
+        with self._lock:
+            if stamp != self._stamp:
+                records = []
+                with open(self.path) as f:
+                    for line in f:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            continue  # Torn or foreign line
+                self._records, self._stamp = records, stamp
+            return self._records
+
+    @staticmethod
+    def _calibrate(params: dict, runs: list[dict], observed, prior) -> tuple[float, str]:
+        """Fit `observed(run)` on the group's runs, or scale the prior by what they observed."""
+        if not runs:
+            return prior(params), "prior"
+        X = np.array([features(r["params"]) for r in runs])
+        y = np.array([observed(r) for r in runs], dtype=float)
+        if len(runs) >= MIN_FIT_RUNS and np.linalg.matrix_rank(X) == X.shape[1]:
+            coef = np.linalg.lstsq(X, y, rcond=None)[0]
+            estimate = float(features(params) @ coef)
+            if estimate > 0:
+                return estimate, "fit"
+        priors = np.array([prior(r["params"]) for r in runs])
+        ratio = float(np.sum(y) / np.sum(priors))
+        return prior(params) * ratio, "scaled_prior"
+
+    def estimate(self, params: dict, plant_loaded: bool = False, fields: list | None = None) -> dict:
+        """Predicted runtime (s) and peak memory (MB) of one analysis with `params` returning `fields`."""
+        records = self.records()
+        group = [
+            r for r in records
+            if r["params"]["reg_model"] == params["reg_model"]
+            and r["params"]["time_resolution"] == params["time_resolution"]
+        ]
+        analysis_s, runtime_basis = self._calibrate(params, group, lambda r: r["analysis_s"], prior_runtime_s)
+        growth_mb, memory_basis = self._calibrate(
+            params, group, lambda r: max(0.0, r["peak_memory_mb"] - r["start_memory_mb"]), prior_analysis_memory_mb,
+        )
+
+        # Plant loads over all groups (mostly cache hits, the occasional build),
+        # and the post-analysis overhead of runs that returned the same fields
+        fields = sorted(fields) if fields is not None else None
+        loads = [r["plant_load_s"] for r in records]
+        overheads = [
+            max(0.0, r["total_s"] - r["plant_load_s"] - r["analysis_s"])
+            for r in records if r.get("fields") == fields
+        ]
+        plant_load_s = 0.0 if plant_loaded else (float(np.median(loads)) if loads else PRIOR_PLANT_LOAD_S)
+        if overheads:
+            overhead_s = float(np.median(overheads))
+        else:
+            overhead_s = PRIOR_OVERHEAD_S if fields is None else PRIOR_PROJECTED_OVERHEAD_S
+        base_mb = float(np.median([r["start_memory_mb"] for r in records])) if records else PRIOR_BASE_RSS_MB
+
+        return {
+            "runtime_s": round(plant_load_s + analysis_s + overhead_s, 2),
+            "peak_memory_mb": round(base_mb + growth_mb, 1),
+            "breakdown_s": {
+                "plant_load": round(plant_load_s, 2),
+                "analysis": round(analysis_s, 2),
+                "overhead": round(overhead_s, 2),
+            },
+            "breakdown_mb": {"plant_loaded": round(base_mb, 1), "analysis": round(growth_mb, 1)},
+            "calibration": {
+                "runtime": runtime_basis,
+                "memory": memory_basis,
+                "matching_runs": len(group),
+                "recorded_runs": len(records),
+            },
+        }
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+loadtest.py — Local load generator and scenario runner for main.py / main_static.py.
+
+Starts the app under uvicorn (or targets a running server with --url), drives
+it with N concurrent keep-alive clients per concurrency level, and writes a
+JSON report with latency percentiles, throughput, error/rejection/fallback
+rates and server RSS, so releases and instance sizes can be compared:
+
+    python loadtest.py run --app main_static --scenario default --concurrency 1,8,32
+    python loadtest.py run --app main,main_static --scenario analyze --duration 60
+    python loadtest.py compare loadtest_reports/old.json loadtest_reports/new.json
+
+Standard library only (asyncio HTTP/1.1 client); no external services.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_DIR = os.path.join(BACKEND_DIR, "loadtest_reports")
+REPORT_VERSION = 1
+
+# Built-in scenarios: weighted steps (name, method, path, JSON body or None).
+# "default" and "analyze" only use endpoints main_static.py also serves.
+# Analyses pass reuse=false (the default, explicit for older servers) so main.py computes
+# them; only "analyze-reuse" asks for the run history.
+SCENARIOS = {
+    "default": [
+        (5, "health", "GET", "/", None),
+        (1, "analyze", "POST", "/analyze", {"plant_name": "La Haute Borne", "reuse": False}),
+    ],
+    "health": [
+        (1, "health", "GET", "/", None),
+    ],
+    "analyze": [
+        (1, "analyze", "POST", "/analyze", {"plant_name": "La Haute Borne", "reuse": False}),
+    ],
+    "analyze-headline": [
+        (1, "analyze_headline", "POST", "/analyze", {"fields": ["aep_gwh", "uncertainty"], "reuse": False}),
+    ],
+    "analyze-reuse": [
+        (1, "analyze_reused", "POST", "/analyze", {"plant_name": "La Haute Borne", "reuse": True}),
+    ],
+    "queries": [
+        (3, "power_curve", "GET", "/power-curve?turbine=R80711", None),
+        (3, "monthly_production", "GET", "/monthly-production", None),
+        (2, "turbines", "GET", "/turbines", None),
+        (2, "turbine_performance", "GET", "/turbine-performance", None),
+        (1, "estimate", "POST", "/estimate", {"num_sim": 50}),
+    ],
+    "mixed": [
+        (4, "health", "GET", "/", None),
+        (3, "power_curve", "GET", "/power-curve", None),
+        (3, "monthly_production", "GET", "/monthly-production", None),
+        (1, "estimate", "POST", "/estimate", {}),
+        (1, "analyze_headline", "POST", "/analyze", {"fields": ["aep_gwh", "uncertainty"], "reuse": False}),
+        (1, "analyze", "POST", "/analyze", {"reuse": False}),
+        (2, "runs", "GET", "/runs?limit=20", None),
+    ],
+}
+
+# Server-side knobs recorded in every report, so runs are comparable
+RECORDED_ENV = (
+    "ANALYSIS_MAX_CONCURRENCY", "ANALYSIS_MAX_QUEUE", "ANALYSIS_QUEUE_TIMEOUT_S", "ANALYSIS_POOL_SIZE",
+    "ANALYSIS_WORKER_MAX_JOBS", "ANALYSIS_WORKER_MAX_RSS_MB", "ANALYSIS_JOB_MAX_RSS_MB", "SHARED_DATA", "PREPARED_DATA_DIR",
+    "WHAT_IF_CACHE_ENTRIES", "MULTI_ANALYSIS_WORKERS", "QUERY_CACHE_MAX_AGE", "RUN_REUSE_MAX_AGE_S",
+)
+
+# Degraded responses: {"mode": "SIMULATION_FALLBACK"} from main.py, ERROR_FALLBACK from main_static.py
+FALLBACK_MARKERS = (b'"SIMULATION_FALLBACK"', b'"ERROR_FALLBACK"')
+REJECTED_STATUSES = (429, 503)
+
+
+# --- HTTP/1.1 client ---
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection (reconnects after errors or Connection: close)."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes | None = None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: keep-alive\r\n"
+        if body is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        self.writer.write(head.encode() + b"\r\n" + (body or b""))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # Trailers
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            data = b"".join(chunks)
+        elif "content-length" in headers:
+            data = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            data = await self.reader.read()
+            self.close()
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, headers, data
+
+
+# --- Statistics ---
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(samples: list, elapsed_s: float) -> dict:
+    """Latency percentiles (ms), throughput and error/rejection/fallback rates of `samples`."""
+    n = len(samples)
+    latencies = sorted(s["latency_s"] * 1000 for s in samples)
+    statuses, errors = {}, {}
+    for s in samples:
+        key = str(s["status"]) if s["status"] is not None else "none"
+        statuses[key] = statuses.get(key, 0) + 1
+        if s["error"]:
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+    failed = sum(1 for s in samples if s["status"] is None or s["status"] >= 400)
+    rejected = sum(1 for s in samples if s["status"] in REJECTED_STATUSES)
+    return {
+        "requests": n,
+        "throughput_rps": round(n / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+        "error_rate": round(failed / n, 4) if n else 0.0,
+        "rejected_rate": round(rejected / n, 4) if n else 0.0,
+        "fallback_rate": round(sum(s["fallback"] for s in samples) / n, 4) if n else 0.0,
+        "coalesced_rate": round(sum(s["coalesced"] for s in samples) / n, 4) if n else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / n, 2) if n else 0.0,
+            "max": round(latencies[-1], 2) if n else 0.0,
+        },
+        "status_codes": statuses,
+        "errors": errors,
+    }
+
+
+# --- Server process and RSS ---
+
+def process_tree_rss_mb(pid: int) -> float | None:
+    """RSS of `pid` plus its descendants (uvicorn --workers, pool workers) in MB; None if unknown."""
+    if not os.path.isdir("/proc"):
+        return None
+    total_kb, stack, seen = 0, [pid], set()
+    while stack:
+        p = stack.pop()
+        if p in seen:
+            continue
+        seen.add(p)
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+            for task in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{task}/children") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except (OSError, ValueError):
+            continue  # Exited while we looked
+    return round(total_kb / 1024, 1)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """`uvicorn <app>:app` started from the backend directory, logging to a file."""
+
+    def __init__(self, app: str, port: int, workers: int, log_path: str):
+        self.app = app
+        self.port = port
+        self.workers = workers
+        self.log_path = log_path
+        self.process = None
+
+    def start(self, timeout: float):
+        cmd = [
+            sys.executable, "-m", "uvicorn", f"{self.app}:app",
+            "--host", "127.0.0.1", "--port", str(self.port), "--workers", str(self.workers),
+        ]
+        self._log = open(self.log_path, "w")
+        self.process = subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=self._log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.app} exited with code {self.process.returncode}; see {self.log_path}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.25)
+        self.stop()
+        raise RuntimeError(f"{self.app} did not start within {timeout}s; see {self.log_path}")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.process is not None:
+            self._log.close()
+
+
+# --- Load generation ---
+
+async def _virtual_user(host, port, steps, weights, deadline, budget, timeout, samples, rng):
+    conn = Connection(host, port)
+    try:
+        while time.monotonic() < deadline and budget["left"] != 0:
+            if budget["left"] > 0:
+                budget["left"] -= 1
+            _, name, method, path, body = rng.choices(steps, weights)[0]
+            payload = json.dumps(body).encode() if body is not None else None
+            status, headers, data, error = None, {}, b"", None
+            started = time.perf_counter()
+            try:
+                status, headers, data = await asyncio.wait_for(conn.request(method, path, payload), timeout)
+            except Exception as e:
+                error = type(e).__name__
+                conn.close()
+            samples.append({
+                "step": name,
+                "status": status,
+                "latency_s": time.perf_counter() - started,
+                "error": error,
+                "fallback": any(marker in data for marker in FALLBACK_MARKERS),
+                "coalesced": headers.get("x-analysis-coalesced") == "true",
+            })
+    finally:
+        conn.close()
+
+
+async def _sample_rss(pid, stop: asyncio.Event, out: list, interval: float = 0.5):
+    while True:
+        rss = process_tree_rss_mb(pid)
+        if rss is not None:
+            out.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+            return
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(host, port, steps, concurrency, duration_s, requests, timeout, server_pid, seed) -> dict:
+    """Drive `concurrency` clients for `duration_s` (or until `requests` are sent) and summarize."""
+    samples, rss = [], []
+    budget = {"left": requests if requests else -1}
+    weights = [step[0] for step in steps]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(server_pid, stop, rss)) if server_pid else None
+    started = time.monotonic()
+    deadline = started + duration_s if duration_s else float("inf")
+    await asyncio.gather(*(
+        _virtual_user(host, port, steps, weights, deadline, budget, timeout, samples, random.Random(seed + i))
+        for i in range(concurrency)
+    ))
+    elapsed = time.monotonic() - started
+    stop.set()
+    if sampler is not None:
+        await sampler
+
+    level = {"concurrency": concurrency, "duration_s": round(elapsed, 2), **summarize(samples, elapsed)}
+    level["server_rss_mb"] = {"start": rss[0], "peak": max(rss), "end": rss[-1]} if rss else None
+    level["endpoints"] = {}
+    for name in dict.fromkeys(step[1] for step in steps):
+        subset = [s for s in samples if s["step"] == name]
+        if subset:
+            level["endpoints"][name] = summarize(subset, elapsed)
+    return level
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_scenario(name: str) -> tuple[str, list]:
+    """A built-in scenario, or a JSON file with [{"weight", "name", "method", "path", "body"}, ...]."""
+    if name in SCENARIOS:
+        return name, SCENARIOS[name]
+    with open(name) as f:
+        steps = json.load(f)
+    return os.path.splitext(os.path.basename(name))[0], [
+        (s.get("weight", 1), s.get("name", s["path"]), s.get("method", "GET").upper(), s["path"], s.get("body"))
+        for s in steps
+    ]
+
+
+def print_level(app: str, level: dict):
+    lat = level["latency_ms"]
+    rss = level["server_rss_mb"]
+    print(
+        f"   {app:<12} c={level['concurrency']:<4} {level['requests']:>6} req  "
+        f"{level['throughput_rps']:>8.2f} rps  p50 {lat['p50']:>9.1f}  p95 {lat['p95']:>9.1f}  "
+        f"p99 {lat['p99']:>9.1f} ms  err {level['error_rate']:.1%}  rej {level['rejected_rate']:.1%}  "
+        f"fallback {level['fallback_rate']:.1%}  rss {rss['peak'] if rss else '?'} MB",
+        flush=True,
+    )
+
+
+def run(args) -> list[str]:
+    scenario_name, steps = load_scenario(args.scenario)
+    levels = [int(c) for c in str(args.concurrency).split(",")]
+    os.makedirs(args.out, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    targets = [args.url] if args.url else args.app.split(",")
+    paths = []
+
+    for target in targets:
+        label = target if not args.url else "external"
+        stem = os.path.join(args.out, f"{label}-{scenario_name}-{stamp}")
+        server = None
+        if args.url:
+            host, _, port = args.url.split("://", 1)[-1].rstrip("/").partition(":")
+            port, pid = int(port or 80), args.pid
+        else:
+            host, port = "127.0.0.1", free_port()
+            server = Server(target, port, args.workers, f"{stem}.server.log")
+            print(f"🚀 Starting {target} on port {port} (workers={args.workers})...", flush=True)
+            server.start(args.startup_timeout)
+            pid = server.process.pid
+        try:
+            idle_rss = process_tree_rss_mb(pid) if pid else None
+            if args.warmup:
+                asyncio.run(run_level(host, port, steps, 1, 0, args.warmup, args.timeout, None, args.seed))
+            report = {
+                "version": REPORT_VERSION,
+                "created": stamp,
+                "git_commit": git_commit(),
+                "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+                "target": {
+                    "app": label,
+                    "url": args.url or f"http://{host}:{port}",
+                    "workers": None if args.url else args.workers,
+                    "env": {k: os.environ[k] for k in RECORDED_ENV if k in os.environ},
+                },
+                "scenario": {
+                    "name": scenario_name,
+                    "steps": [{"weight": w, "name": n, "method": m, "path": p, "body": b} for w, n, m, p, b in steps],
+                    "duration_s": args.duration,
+                    "requests": args.requests,
+                    "timeout_s": args.timeout,
+                    "warmup": args.warmup,
+                },
+                "server_idle_rss_mb": idle_rss,
+                "levels": [],
+            }
+            print(f"📈 {label}: scenario '{scenario_name}', concurrency {levels}", flush=True)
+            for concurrency in levels:
+                level = asyncio.run(run_level(
+                    host, port, steps, concurrency, args.duration, args.requests, args.timeout, pid, args.seed,
+                ))
+                report["levels"].append(level)
+                print_level(label, level)
+        finally:
+            if server is not None:
+                server.stop()
+
+        with open(f"{stem}.json", "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {stem}.json", flush=True)
+        paths.append(f"{stem}.json")
+    return paths
+
+
+# --- Report comparison ---
+
+COMPARED = (
+    ("throughput_rps", lambda l: l["throughput_rps"]),
+    ("p50_ms", lambda l: l["latency_ms"]["p50"]),
+    ("p95_ms", lambda l: l["latency_ms"]["p95"]),
+    ("p99_ms", lambda l: l["latency_ms"]["p99"]),
+    ("error_rate", lambda l: l["error_rate"]),
+    ("fallback_rate", lambda l: l["fallback_rate"]),
+    ("peak_rss_mb", lambda l: (l["server_rss_mb"] or {}).get("peak")),
+)
+
+
+def compare(base_path: str, new_path: str):
+    """Print a per-concurrency comparison of two reports."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"📊 {base['target']['app']} @ {base.get('git_commit')}  →  {new['target']['app']} @ {new.get('git_commit')}")
+    if base["scenario"]["name"] != new["scenario"]["name"]:
+        print(f"⚠️ Different scenarios: {base['scenario']['name']} vs {new['scenario']['name']}")
+    new_levels = {level["concurrency"]: level for level in new["levels"]}
+    for level in base["levels"]:
+        other = new_levels.get(level["concurrency"])
+        if other is None:
+            continue
+        print(f"\n   concurrency {level['concurrency']}")
+        for name, get in COMPARED:
+            a, b = get(level), get(other)
+            if a is None or b is None:
+                continue
+            delta = f"{(b - a) / a:+.1%}" if a else "n/a"
+            print(f"     {name:<15} {a:>12.4g} {b:>12.4g}  {delta:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local load tests for the SUBHAG backend")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="Run a scenario and write a report")
+    p.add_argument("--app", default="main_static", help="Comma-separated apps to start (main, main_static)")
+    p.add_argument("--url", help="Target an already running server instead of starting one")
+    p.add_argument("--pid", type=int, help="Server PID for RSS sampling with --url")
+    p.add_argument("--workers", type=int, default=1, help="uvicorn --workers")
+    p.add_argument("--scenario", default="default", help=f"One of {', '.join(SCENARIOS)} or a JSON file")
+    p.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    p.add_argument("--duration", type=float, default=20.0, help="Seconds per level (0 = until --requests)")
+    p.add_argument("--requests", type=int, default=0, help="Stop each level after this many requests")
+    p.add_argument("--warmup", type=int, default=2, help="Sequential requests before measuring")
+    p.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    p.add_argument("--startup-timeout", type=float, default=120.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", default=REPORT_DIR, help="Report directory")
+
+    c = sub.add_parser("compare", help="Compare two reports")
+    c.add_argument("base")
+    c.add_argument("new")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if not args.duration and not args.requests:
+            parser.error("set --duration or --requests")
+        run(args)
+    else:
+        compare(args.base, args.new)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+multi_analysis.py — Run several OpenOA analyses on one plant, in parallel.
+
+The analyses run in worker processes started with MULTI_ANALYSIS_START_METHOD
+(default "spawn"; "fork" is unsafe from the threaded API server). Each worker
+builds its plant once, in its initializer, from the artifacts the caller has
+published (`attach_plant`: plant tables, reanalysis and SCADA stores, ~0.5 s
+for La Haute Borne), so neither the caller nor the workers parse the dataset
+and no plant is pickled between them. With SHARED_DATA=1 those artifacts are
+memory-mapped and their pages shared by every worker; the PlantData built from
+them, and the deep copy every OpenOA analysis takes of its plant, are still
+private to each worker, so MULTI_ANALYSIS_MEMORY_MB caps the worker count at
+MULTI_ANALYSIS_WORKER_MB each.
+
+Inside a daemonic process (a worker_pool worker), which may not have children,
+the analyses run in threads on one plant built in-process; every OpenOA
+analysis deep-copies its plant, so sharing one is safe. The EYA gap analysis
+is derived from the AEP, turbine ideal energy and electrical loss results, so
+requesting it schedules those first.
+"""
+
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+MULTI_ANALYSIS_START_METHOD = os.environ.get("MULTI_ANALYSIS_START_METHOD", "spawn")
+# Peak RSS of one worker (imports, its plant and an analysis' copy of it) and the
+# memory all workers together may use; 0 = no cap, one worker per CPU
+MULTI_ANALYSIS_WORKER_MB = float(os.environ.get("MULTI_ANALYSIS_WORKER_MB", "700"))
+MULTI_ANALYSIS_MEMORY_MB = float(os.environ.get("MULTI_ANALYSIS_MEMORY_MB", "0"))
+
+# Reanalysis products shipped with La Haute Borne
+REANALYSIS_PRODUCTS = ["era5", "merra2"]
+
+# Turbines with a reliable wind vane, as in OpenOA's wake loss example
+WAKE_WIND_DIRECTION_ASSETS = ["R80711", "R80721", "R80736"]
+# Vanes whose northing calibration changes at a known date; their wind directions
+# are only used before it (R80711 shifts shortly after 2015-11-25)
+WIND_VANE_VALID_UNTIL = {"R80711": pd.Timestamp("2015-11-25 00:00")}
+
+# Illustrative EYA figures from OpenOA's EYA gap analysis example (no real EYA ships with the dataset)
+DEFAULT_EYA_ESTIMATES = {
+    "aep": 16.46,  # GWh/yr
+    "gross_energy": 20.0,  # GWh/yr
+    "availability_losses": 0.04,
+    "electrical_losses": 0.014,
+    "turbine_losses": 0.037,
+    "blade_degradation_losses": 0.011,
+    "wake_losses": 0.087,
+}
+
+
+def _mean_std(values) -> dict:
+    values = np.asarray(values, dtype=float).ravel()
+    return {"mean": float(np.mean(values)), "std": float(np.std(values))}
+
+
+def run_aep(plant, num_sim: int) -> dict:
+    from openoa.analysis import MonteCarloAEP
+
+    analysis = MonteCarloAEP(plant, reanalysis_products=REANALYSIS_PRODUCTS)
+    analysis.run(num_sim=num_sim, reanalysis_products=REANALYSIS_PRODUCTS)
+    results = analysis.results
+    return {
+        "aep_gwh": _mean_std(results["aep_GWh"]),
+        "availability_loss": _mean_std(results["avail_pct"]),
+        "curtailment_loss": _mean_std(results["curt_pct"]),
+    }
+
+
+def run_tie(plant, num_sim: int) -> dict:
+    from openoa.analysis import TurbineLongTermGrossEnergy
+
+    if num_sim > 1:
+        analysis = TurbineLongTermGrossEnergy(
+            plant, UQ=True, num_sim=num_sim, wind_bin_threshold=(1.0, 3.0),
+            max_power_filter=(0.8, 0.9), correction_threshold=(0.85, 0.95),
+        )
+    else:
+        analysis = TurbineLongTermGrossEnergy(
+            plant, UQ=False, wind_bin_threshold=2.0, max_power_filter=0.9, correction_threshold=0.9,
+        )
+    analysis.run(reanalysis_products=REANALYSIS_PRODUCTS)
+    return {"turbine_ideal_energy_gwh": _mean_std(np.asarray(analysis.plant_gross) / 1e6)}
+
+
+def run_electrical_losses(plant, num_sim: int) -> dict:
+    from openoa.analysis import ElectricalLosses
+
+    if num_sim > 1:
+        analysis = ElectricalLosses(plant, UQ=True, num_sim=num_sim, uncertainty_correction_threshold=(0.9, 0.995))
+    else:
+        analysis = ElectricalLosses(plant, UQ=False)
+    analysis.run()
+    return {"electrical_losses": _mean_std(analysis.electrical_losses)}
+
+
+def wake_end_date(plant, wind_direction_asset_ids=None) -> str:
+    """Last SCADA timestamp, capped where one of the wind vanes used stops being reliable."""
+    end = plant.scada.index.get_level_values("time").max()
+    vanes = wind_direction_asset_ids if wind_direction_asset_ids is not None else plant.turbine_ids
+    for asset_id in vanes:
+        if asset_id in WIND_VANE_VALID_UNTIL:
+            end = min(end, WIND_VANE_VALID_UNTIL[asset_id])
+    return end.strftime("%Y-%m-%d %H:%M")
+
+
+def run_wake_losses(plant, num_sim: int) -> dict:
+    from openoa.analysis import WakeLosses
+
+    uq = num_sim > 1
+    vanes = [t for t in WAKE_WIND_DIRECTION_ASSETS if t in plant.turbine_ids] or None
+    analysis = WakeLosses(
+        plant=plant,
+        wind_direction_col="WMET_HorWdDir",
+        wind_direction_data_type="scada",
+        wind_direction_asset_ids=vanes,
+        end_date=wake_end_date(plant, vanes),
+        reanalysis_products=REANALYSIS_PRODUCTS,
+        UQ=uq,
+    )
+    analysis.run(num_sim=num_sim if uq else 1)
+    suffix = "_mean" if uq else ""
+    return {
+        "wake_losses_por": float(getattr(analysis, f"wake_losses_por{suffix}")),
+        "wake_losses_lt": float(getattr(analysis, f"wake_losses_lt{suffix}")),
+        "turbine_wake_losses_lt": {
+            str(t): float(v) for t, v in zip(analysis.turbine_ids, getattr(analysis, f"turbine_wake_losses_lt{suffix}"))
+        },
+    }
+
+
+def run_eya_gap(report: dict, eya_estimates: dict | None = None) -> dict:
+    """Gap analysis from already-computed AEP, TIE and electrical loss results."""
+    from openoa.analysis import EYAGapAnalysis
+
+    oa_results = {
+        "aep": report["aep"]["results"]["aep_gwh"]["mean"],
+        "availability_losses": report["aep"]["results"]["availability_loss"]["mean"],
+        "electrical_losses": report["electrical_losses"]["results"]["electrical_losses"]["mean"],
+        "turbine_ideal_energy": report["tie"]["results"]["turbine_ideal_energy_gwh"]["mean"],
+    }
+    gap = EYAGapAnalysis(plant=None, eya_estimates=eya_estimates or DEFAULT_EYA_ESTIMATES, oa_results=oa_results)
+    gap.run()
+    labels = ["eya_aep", "turbine_ideal_energy_diff", "availability_losses_diff",
+              "electrical_losses_diff", "unaccounted"]
+    return {
+        "oa_results": oa_results,
+        "eya_estimates": eya_estimates or DEFAULT_EYA_ESTIMATES,
+        "waterfall_gwh": {label: float(v) for label, v in zip(labels, gap.compiled_data)},
+    }
+
+
+# Analyses that run on the plant, and those derived from other analyses' results
+ANALYSES = {
+    "aep": run_aep,
+    "tie": run_tie,
+    "electrical_losses": run_electrical_losses,
+    "wake_losses": run_wake_losses,
+}
+DERIVED = {"eya_gap": ("aep", "tie", "electrical_losses")}
+ANALYSIS_NAMES = (*ANALYSES, *DERIVED)
+
+def attach_plant(data_path: str):
+    """Full PlantData (SCADA included) rebuilt from the artifacts published for `data_path`."""
+    from analysis_plant import build_analysis_plant
+    from prepared_data import get_plant_tables, get_reanalysis, get_store
+
+    tables, reanalysis, store = get_plant_tables(data_path), get_reanalysis(data_path), get_store(data_path)
+    if tables is None or reanalysis is None or store is None:
+        raise RuntimeError(f"Plant artifacts for {data_path} are not published (see shared_data.publish)")
+    return build_analysis_plant(tables, reanalysis, store)
+
+
+# Set in worker processes by _init_worker
+_PLANT = None
+
+
+def _init_worker(load_plant):
+    global _PLANT
+    _PLANT = load_plant()
+
+
+def _run_one(name: str, num_sim: int, plant=None) -> dict:
+    plant = plant if plant is not None else _PLANT
+    started = time.time()
+    try:
+        results = ANALYSES[name](plant, num_sim)
+        return {"status": "success", "duration_s": round(time.time() - started, 2), "pid": os.getpid(), "results": results}
+    except Exception as e:
+        traceback.print_exc()
+        return {"status": "error", "duration_s": round(time.time() - started, 2), "pid": os.getpid(), "error": str(e)}
+
+
+def _can_start_processes() -> bool:
+    # Daemonic processes (e.g. worker_pool workers) may not have children
+    return not multiprocessing.current_process().daemon
+
+
+def max_workers_for_memory(memory_mb: float = MULTI_ANALYSIS_MEMORY_MB,
+                           worker_mb: float = MULTI_ANALYSIS_WORKER_MB) -> int | None:
+    """Workers that fit in `memory_mb` at `worker_mb` each (at least one); None if uncapped."""
+    if memory_mb <= 0 or worker_mb <= 0:
+        return None
+    return max(1, int(memory_mb // worker_mb))
+
+
+def run_report(load_plant, analyses, num_sim: int = 5, eya_estimates: dict | None = None,
+               max_workers: int | None = None) -> dict:
+    """
+    Run `analyses` (names from ANALYSIS_NAMES) in parallel and return
+    {name: {"status", "duration_s", "results" | "error"}} plus run metadata.
+
+    `load_plant` is a picklable callable returning the plant, e.g.
+    functools.partial(attach_plant, data_path); each worker process calls it
+    once (threads share one call).
+    """
+    requested = list(dict.fromkeys(analyses))
+    unknown = [a for a in requested if a not in ANALYSIS_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown analyses: {', '.join(unknown)} (choose from {', '.join(ANALYSIS_NAMES)})")
+    base = [a for a in ANALYSES if a in requested or any(a in DERIVED[d] for d in requested if d in DERIVED)]
+
+    started = time.time()
+    processes = _can_start_processes()
+    workers = max(1, min(len(base), max_workers or os.cpu_count() or 1))
+    if processes:
+        workers = min(workers, max_workers_for_memory() or workers)
+    report = {}
+    if base:
+        if processes:
+            executor = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context(MULTI_ANALYSIS_START_METHOD),
+                initializer=_init_worker, initargs=(load_plant,),
+            )
+        else:
+            plant = load_plant()
+            executor = ThreadPoolExecutor(workers)
+        with executor:
+            if processes:
+                futures = {executor.submit(_run_one, name, num_sim): name for name in base}
+            else:
+                futures = {executor.submit(_run_one, name, num_sim, plant): name for name in base}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    report[name] = future.result()
+                except Exception as e:  # Worker process died (e.g. OOM-killed)
+                    report[name] = {"status": "error", "duration_s": round(time.time() - started, 2), "error": str(e)}
+                print(f"   {name}: {report[name]['status']} in {report[name]['duration_s']}s", flush=True)
+
+    for name, deps in DERIVED.items():
+        if name not in requested:
+            continue
+        t0 = time.time()
+        failed = [d for d in deps if report[d]["status"] != "success"]
+        if failed:
+            report[name] = {"status": "skipped", "duration_s": 0.0, "error": f"Requires successful {', '.join(failed)}"}
+            continue
+        try:
+            report[name] = {"status": "success", "duration_s": round(time.time() - t0, 2), "results": run_eya_gap(report, eya_estimates)}
+        except Exception as e:
+            traceback.print_exc()
+            report[name] = {"status": "error", "duration_s": round(time.time() - t0, 2), "error": str(e)}
+
+    return {
+        "analyses": {name: report[name] for name in (*base, *[d for d in DERIVED if d in requested])},
+        "requested": requested,
+        "num_sim": num_sim,
+        "executor": "processes" if processes else "threads",
+        "start_method": MULTI_ANALYSIS_START_METHOD if processes else None,
+        "workers": workers,
+        "wall_time_s": round(time.time() - started, 2),
+        "sum_of_analysis_time_s": round(sum(r["duration_s"] for r in report.values()), 2),
+    }
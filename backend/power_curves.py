@@ -0,0 +1,132 @@
+"""
+power_curves.py — Per-turbine binned power curves and underperformance scoring.
+
+Each turbine's power curve follows the method of bins of IEC 61400-12-1: mean
+power per 0.5 m/s wind-speed bin, a bin counting only with at least
+POWER_CURVE_MIN_BIN_SAMPLES samples. The curves come straight from the
+aggregate cube, whose (turbine, month, bin) sums and counts are already one
+bincount pass over turbine × bin codes, so fitting every turbine of the fleet
+is a sum over the month axis rather than a loop over turbines.
+
+The fleet reference curve is the per-bin median of the turbine curves, so a
+single faulty turbine cannot drag it down. Each turbine is scored by what it
+produced in its valid bins against what the reference gives for the same
+wind-speed distribution:
+
+    deviation % = 100 × (Σ_b n_tb · P_tb / Σ_b n_tb · P_ref,b − 1)
+
+and flagged as underperforming at or below −UNDERPERFORMANCE_THRESHOLD_PCT.
+"""
+
+import os
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+
+from aggregate_cube import N_WS_BINS, WS_BIN_WIDTH
+
+POWER_CURVE_MIN_BIN_SAMPLES = int(os.environ.get("POWER_CURVE_MIN_BIN_SAMPLES", "3"))
+UNDERPERFORMANCE_THRESHOLD_PCT = float(os.environ.get("UNDERPERFORMANCE_THRESHOLD_PCT", "3.0"))
+
+
+@dataclass
+class FleetPowerCurves:
+    """Binned power curve of every turbine, the fleet reference and each turbine's deviation from it."""
+
+    turbines: np.ndarray  # (T,) turbine IDs as strings
+    wind_speed: np.ndarray  # (N_WS_BINS,) bin centres, m/s
+    counts: np.ndarray  # (T, N_WS_BINS) samples per bin
+    power: np.ndarray  # (T, N_WS_BINS) mean power, NaN where the bin has too few samples
+    power_std: np.ndarray  # (T, N_WS_BINS)
+    reference: np.ndarray  # (N_WS_BINS,) median over turbines, NaN where no turbine has the bin
+    deviation_pct: np.ndarray  # (T,) NaN if the turbine shares no scored bin with the reference
+    underperforming: np.ndarray  # (T,) bool
+    threshold_pct: float
+
+    def reference_curve(self) -> list:
+        """Fleet reference power per bin, with the number of turbines it is the median of."""
+        n_turbines = np.isfinite(self.power).sum(axis=0)
+        return [
+            {"wind_speed": round(float(self.wind_speed[b]), 1), "power": round(float(self.reference[b]), 1),
+             "turbines": int(n_turbines[b])}
+            for b in np.flatnonzero(np.isfinite(self.reference))
+        ]
+
+    def turbine_curve(self, turbine) -> list:
+        """One turbine's binned curve next to the reference."""
+        t = int(np.flatnonzero(self.turbines == str(turbine))[0])
+        points = []
+        for b in np.flatnonzero(np.isfinite(self.power[t])):
+            ref = self.reference[b]
+            points.append({
+                "wind_speed": round(float(self.wind_speed[b]), 1),
+                "power": round(float(self.power[t, b]), 1),
+                "power_std": round(float(self.power_std[t, b]), 1),
+                "samples": int(self.counts[t, b]),
+                "reference_power": round(float(ref), 1),
+                "deviation_pct": round(float(100 * (self.power[t, b] / ref - 1)), 2) if ref > 0 else None,
+            })
+        return points
+
+    def scores(self) -> list:
+        """Per-turbine deviation from the reference, worst first (unscored turbines last)."""
+        valid_bins = np.isfinite(self.power).sum(axis=1)
+        order = np.argsort(np.where(np.isfinite(self.deviation_pct), self.deviation_pct, np.inf), kind="stable")
+        return [
+            {
+                "turbine_id": str(self.turbines[t]),
+                "deviation_pct": round(float(self.deviation_pct[t]), 2) if np.isfinite(self.deviation_pct[t]) else None,
+                "underperforming": bool(self.underperforming[t]),
+                "valid_bins": int(valid_bins[t]),
+                "samples": int(self.counts[t].sum()),
+            }
+            for t in order
+        ]
+
+    def score_by_turbine(self) -> dict:
+        return {row["turbine_id"]: row for row in self.scores()}
+
+    def add_reference(self, points: list) -> list:
+        """
+        Set power curve rows' `ideal_power` to the fleet reference (in place);
+        bins with no reference keep their `actual_power`.
+        """
+        for point in points:
+            b = int(round(point["wind_speed"] / WS_BIN_WIDTH))
+            ref = self.reference[b] if 0 <= b < N_WS_BINS else np.nan
+            point["ideal_power"] = round(float(ref), 1) if np.isfinite(ref) else point["actual_power"]
+        return points
+
+
+def fit_power_curves(cube, turbines=None, start=None, end=None,
+                     min_samples: int = POWER_CURVE_MIN_BIN_SAMPLES,
+                     threshold_pct: float = UNDERPERFORMANCE_THRESHOLD_PCT) -> FleetPowerCurves:
+    """Fit every selected turbine's binned power curve from `cube` and score it against the fleet."""
+    ids, sums, sumsq, counts = cube.turbine_bins("power", turbines, start, end)
+    valid = counts >= max(min_samples, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        power = np.where(valid, sums / counts, np.nan)
+        var = np.maximum(sumsq / counts - power ** 2, 0) * counts / np.maximum(counts - 1, 1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN bins (no turbine has enough samples)
+        reference = np.nanmedian(power, axis=0) if len(ids) else np.full(N_WS_BINS, np.nan)
+
+    # Score on bins producing power in the reference (below cut-in only adds noise)
+    scored = valid & (np.nan_to_num(reference) > 0)
+    expected = np.where(scored, counts * reference, 0).sum(axis=1)
+    actual = np.where(scored, sums, 0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        deviation = np.where(expected > 0, 100 * (actual / expected - 1), np.nan)
+
+    return FleetPowerCurves(
+        turbines=np.asarray(ids).astype(str),
+        wind_speed=np.arange(N_WS_BINS) * WS_BIN_WIDTH,
+        counts=counts.astype(np.int64),
+        power=power,
+        power_std=np.where(valid, np.sqrt(var), np.nan),
+        reference=reference,
+        deviation_pct=deviation,
+        underperforming=np.isfinite(deviation) & (np.nan_to_num(deviation) <= -threshold_pct),
+        threshold_pct=threshold_pct,
+    )
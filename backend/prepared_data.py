@@ -0,0 +1,181 @@
+"""
+prepared_data.py — Derived artifacts persisted next to the prepared La Haute Borne data.
+
+Artifacts are keyed by a fingerprint of the raw dataset files, so they are
+rebuilt automatically when the data changes and reused otherwise.
+
+With SHARED_DATA=1 the array artifacts are memory-mapped read-only instead of
+read into each process, so every uvicorn worker shares one copy through the
+OS page cache (see shared_data.py). PREPARED_DATA_DIR relocates them, e.g. to
+/dev/shm.
+
+With CHUNKED_PROCESSING=1 the SCADA store is memory-mapped as well and the
+aggregate cube is built from it in SCADA_CHUNK_ROWS chunks instead of from
+the in-memory plant, so serving charts and queries needs memory bounded by
+the chunk size rather than by the SCADA history.
+"""
+
+import hashlib
+import os
+import threading
+
+from aggregate_cube import build_cube, load_cube, save_cube
+from scada_store import ScadaStore, build_store, load_store, save_store
+from reanalysis_store import build_reanalysis_store, load_reanalysis_store, save_reanalysis_store
+from analysis_plant import build_plant_tables, load_plant_tables, save_plant_tables
+
+SHARED_DATA = os.environ.get("SHARED_DATA", "0") == "1"
+PREPARED_DATA_DIR = os.environ.get("PREPARED_DATA_DIR")
+CHUNKED_PROCESSING = os.environ.get("CHUNKED_PROCESSING", "0") == "1"
+MAP_STORE = SHARED_DATA or CHUNKED_PROCESSING
+
+
+def data_fingerprint(path: str) -> str:
+    """Cheap fingerprint of a data file or directory (names, sizes, mtimes).
+
+    A data directory that was never extracted is fingerprinted by its .zip.
+    """
+    h = hashlib.sha1()
+    if not os.path.exists(path) and os.path.isfile(f"{path}.zip"):
+        path = f"{path}.zip"
+    if os.path.isfile(path):
+        st = os.stat(path)
+        h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}".encode())
+    elif os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                fp = os.path.join(root, name)
+                st = os.stat(fp)
+                h.update(f"{os.path.relpath(fp, path)}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+def prepared_dir(data_path: str) -> str:
+    """Directory holding artifacts derived from `data_path` (sibling of it by default)."""
+    if PREPARED_DATA_DIR:
+        return os.path.join(PREPARED_DATA_DIR, f"{os.path.basename(os.path.normpath(data_path))}_prepared")
+    return f"{os.path.normpath(data_path)}_prepared"
+
+
+def cube_path(data_path: str) -> str:
+    return os.path.join(prepared_dir(data_path), "aggregate_cube.npz")
+
+
+def store_path(data_path: str) -> str:
+    return os.path.join(prepared_dir(data_path), "scada_store")
+
+
+def reanalysis_path(data_path: str) -> str:
+    return os.path.join(prepared_dir(data_path), "reanalysis_store")
+
+
+def tables_path(data_path: str) -> str:
+    return os.path.join(prepared_dir(data_path), "plant_tables")
+
+
+def _build_cube(source, fingerprint: str):
+    """Cube from a SCADA store (streamed in chunks) or from a loaded plant."""
+    if isinstance(source, ScadaStore):
+        cube = source.cube()
+        cube.fingerprint = fingerprint
+        return cube
+    return build_cube(source.scada, fingerprint=fingerprint)
+
+
+# name -> (path fn, load fn(path, fingerprint), build fn(plant or store, fingerprint), save fn)
+ARTIFACTS = {
+    "cube": (
+        cube_path,
+        load_cube,
+        _build_cube,
+        save_cube,
+    ),
+    "store": (
+        store_path,
+        lambda path, fp: load_store(path, fp, mmap=MAP_STORE),
+        lambda plant, fp: build_store(plant.scada, plant.asset, fingerprint=fp),
+        save_store,
+    ),
+    "reanalysis": (
+        reanalysis_path,
+        lambda path, fp: load_reanalysis_store(path, fp, mmap=SHARED_DATA),
+        lambda plant, fp: build_reanalysis_store(plant.reanalysis, fingerprint=fp),
+        save_reanalysis_store,
+    ),
+    "tables": (
+        tables_path,
+        load_plant_tables,
+        build_plant_tables,
+        save_plant_tables,
+    ),
+}
+
+_lock = threading.Lock()
+_cache: dict[tuple[str, str], object] = {}
+
+
+def get_artifact(name: str, data_path: str, plant=None):
+    """
+    Return the artifact `name` (a key of ARTIFACTS) for `data_path`.
+
+    Looks in memory, then on disk; if neither matches the current data
+    fingerprint and a loaded `plant` is given, builds it from `plant` and
+    persists it for the next process. Returns None if it can't be built.
+    """
+    path_fn, load_fn, build_fn, save_fn = ARTIFACTS[name]
+    fingerprint = data_fingerprint(data_path)
+    with _lock:
+        artifact = _cache.get((name, data_path))
+        if artifact is not None and artifact.fingerprint == fingerprint:
+            return artifact
+
+        artifact = load_fn(path_fn(data_path), fingerprint)
+        if artifact is None and plant is not None:
+            source = "SCADA store" if isinstance(plant, ScadaStore) else "prepared plant data"
+            print(f"🧊 Building {name} from {source}...", flush=True)
+            artifact = build_fn(plant, fingerprint)
+            try:
+                save_fn(artifact, path_fn(data_path))
+                print(f"   Saved {name} to {path_fn(data_path)}", flush=True)
+                if SHARED_DATA or (CHUNKED_PROCESSING and name == "store"):
+                    # Swap our private copy for the shared read-only mapping
+                    artifact = load_fn(path_fn(data_path), fingerprint) or artifact
+            except OSError as e:
+                print(f"⚠️ Could not persist {name}: {e}", flush=True)
+
+        if artifact is not None:
+            _cache[(name, data_path)] = artifact
+        return artifact
+
+
+def get_cube(data_path: str, plant=None):
+    """
+    Aggregate cube for `data_path` (see `get_artifact`).
+
+    With CHUNKED_PROCESSING a missing cube is built from the memory-mapped
+    SCADA store in chunks (the store itself from `plant` if needed).
+    """
+    if CHUNKED_PROCESSING and plant is not None:
+        cube = get_artifact("cube", data_path)
+        if cube is not None:
+            return cube
+        store = get_store(data_path, plant)
+        if store is not None:
+            return get_artifact("cube", data_path, store)
+    return get_artifact("cube", data_path, plant)
+
+
+def get_store(data_path: str, plant=None):
+    """Sorted columnar SCADA store for `data_path` (see `get_artifact`)."""
+    return get_artifact("store", data_path, plant)
+
+
+def get_reanalysis(data_path: str, plant=None):
+    """Prepared reanalysis products for `data_path` (see `get_artifact`)."""
+    return get_artifact("reanalysis", data_path, plant)
+
+
+def get_plant_tables(data_path: str, plant=None):
+    """Meter / curtailment / asset tables and metadata for `data_path` (see `get_artifact`)."""
+    return get_artifact("tables", data_path, plant)
@@ -0,0 +1,269 @@
+"""
+reanalysis_cache.py — Persistent per-product, per-resolution reanalysis aggregates.
+
+MonteCarloAEP density-corrects each hourly reanalysis product and resamples it
+to the analysis resolution on every run. Those aggregates depend only on the
+product's own series, so they are stored once per (series content, resolution)
+as .npz files and reused by every run and by every plant whose reanalysis
+node has the identical series.
+
+Build them ahead of time (setup_data.py and the Docker builder do this):
+    python reanalysis_cache.py [MS D h ...]
+"""
+
+import hashlib
+import json
+import os
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+try:
+    from openoa.analysis import MonteCarloAEP
+    HAS_OPENOA = True
+except Exception:
+    MonteCarloAEP = None
+    HAS_OPENOA = False
+
+CACHE_FORMAT_VERSION = 1
+
+# Resolutions built by default: monthly and daily (MonteCarloAEP's "MS" and "D")
+DEFAULT_RESOLUTIONS = ("MS", "D")
+
+WIND_SPEED_COL = "WMETR_HorWdSpd"
+DENSITY_COL = "WMETR_AirDen"
+# Extra variables MonteCarloAEP can regress on (temperature, wind components)
+EXTRA_VARS = ("WMETR_EnvTmp", "WMETR_HorWdSpdU", "WMETR_HorWdSpdV")
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "OpenOA_Repo", "examples", "data", "reanalysis_cache"
+)
+CACHE_DIR = os.environ.get("REANALYSIS_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def product_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of the columns the aggregates are derived from (incl. the time index)."""
+    cols = [c for c in (WIND_SPEED_COL, DENSITY_COL, *EXTRA_VARS) if c in df.columns]
+    h = hashlib.sha1(",".join(cols).encode())
+    h.update(pd.util.hash_pandas_object(df[cols], index=True).values.tobytes())
+    return h.hexdigest()[:16]
+
+
+def density_corrected_wind_speed(df: pd.DataFrame) -> pd.Series:
+    """IEC 61400-12-1 density correction, as in openoa.utils.met_data_processing."""
+    density = df[DENSITY_COL]
+    return df[WIND_SPEED_COL] * np.power(density / density.mean(), 1.0 / 3)
+
+
+def aggregate_product(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Resampled means of the density-corrected wind speed and the extra variables."""
+    cols = {"ws_dens_corr": density_corrected_wind_speed(df)}
+    cols.update({v: df[v] for v in EXTRA_VARS if v in df.columns})
+    return pd.DataFrame(cols, index=df.index).resample(freq).mean()
+
+
+class ReanalysisCache:
+    """In-memory + on-disk cache of product aggregates, keyed by series content and resolution."""
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._memory: dict[tuple[str, str], pd.DataFrame] = {}
+        self._fingerprints: dict[int, tuple[weakref.ref, str]] = {}  # id(frame) -> (weak ref, hash)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, product: str, fp: str, freq: str) -> str:
+        return os.path.join(self.cache_dir, f"{product}-{fp}-{freq}.npz")
+
+    def fingerprint(self, df: pd.DataFrame) -> str:
+        # Hashing is cheap but not free; remember it per frame object. The entry
+        # only holds a weak reference and is dropped when the frame is collected,
+        # so the hourly frames of finished runs are not kept alive.
+        key = id(df)
+        cached = self._fingerprints.get(key)
+        if cached is not None and cached[0]() is df:
+            return cached[1]
+        fp = product_fingerprint(df)
+        self._fingerprints[key] = (weakref.ref(df, lambda ref, key=key: self._forget(key, ref)), fp)
+        return fp
+
+    def _forget(self, key: int, ref: weakref.ref):
+        cached = self._fingerprints.get(key)
+        if cached is not None and cached[0] is ref:
+            del self._fingerprints[key]
+
+    def get(self, product: str, df: pd.DataFrame, freq: str) -> pd.DataFrame:
+        """Aggregate of `df` (hourly product `product`) at `freq`, built and persisted on a miss."""
+        fp = self.fingerprint(df)
+        with self._lock:
+            frame = self._memory.get((fp, freq))
+            if frame is not None:
+                self.hits += 1
+                return frame
+            frame = self._load(self._path(product, fp, freq), fp, freq)
+            if frame is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                frame = aggregate_product(df, freq)
+                self._save(frame, self._path(product, fp, freq), fp, freq)
+            self._memory[(fp, freq)] = frame
+            return frame
+
+    def _load(self, path: str, fp: str, freq: str) -> pd.DataFrame | None:
+        if not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                meta = json.loads(str(z["meta"]))
+                if meta.get("version") != CACHE_FORMAT_VERSION or meta.get("fingerprint") != fp or meta.get("freq") != freq:
+                    return None
+                index = pd.DatetimeIndex(z["time"], freq=freq, name=meta.get("index_name"))
+                return pd.DataFrame({c: z[f"col_{i}"] for i, c in enumerate(meta["columns"])}, index=index)
+        except Exception as e:
+            print(f"⚠️ Could not load reanalysis aggregate {path}: {e}", flush=True)
+            return None
+
+    def _save(self, frame: pd.DataFrame, path: str, fp: str, freq: str):
+        meta = {
+            "version": CACHE_FORMAT_VERSION,
+            "fingerprint": fp,
+            "freq": freq,
+            "columns": list(frame.columns),
+            "index_name": frame.index.name,
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(
+                tmp_path,
+                meta=np.array(json.dumps(meta)),
+                time=frame.index.values.astype("datetime64[ns]"),
+                **{f"col_{i}": frame[c].to_numpy(dtype=np.float64) for i, c in enumerate(frame.columns)},
+            )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not persist reanalysis aggregate {path}: {e}", flush=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "dir": self.cache_dir,
+                "entries_in_memory": len(self._memory),
+                "fingerprinted_frames": len(self._fingerprints),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+REANALYSIS_CACHE = ReanalysisCache()
+
+
+class CachedReanalysisMixin:
+    """
+    MonteCarloAEP mixin: `process_reanalysis_data` reads the product aggregates
+    from REANALYSIS_CACHE instead of resampling the hourly series. The date
+    range logic mirrors openoa's MonteCarloAEP.process_reanalysis_data.
+    """
+
+    def process_reanalysis_data(self):
+        reanalysis = {key: self.plant.reanalysis[key] for key in self.reanalysis_products}
+
+        # Date range common to all products, snapped to whole periods of the resolution
+        start_date = max(df.index.min() for df in reanalysis.values()).replace(minute=0)
+        end_date = min(df.index.max() for df in reanalysis.values())
+        start_date_minus = start_date - pd.DateOffset(hours=1)
+        if (self.time_resolution in ("MS", "ME")) & (start_date.month == start_date_minus.month):
+            start_date = start_date.replace(day=1, hour=0, minute=0) + pd.DateOffset(months=1)
+        elif (self.time_resolution == "D") & (start_date.day == start_date_minus.day):
+            start_date = start_date.replace(hour=0, minute=0) + pd.DateOffset(days=1)
+
+        if self.end_date_lt is not None:
+            end_date_lt_plus = self.end_date_lt + pd.DateOffset(hours=1)
+            if (self.time_resolution in ("MS", "ME")) & (self.end_date_lt.month == end_date_lt_plus.month):
+                self.end_date_lt = (
+                    self.end_date_lt.replace(day=1, hour=0, minute=0)
+                    + pd.DateOffset(months=1)
+                    - pd.DateOffset(hours=1)
+                )
+            elif (self.time_resolution == "D") & (self.end_date_lt.day == end_date_lt_plus.day):
+                self.end_date_lt = self.end_date_lt.replace(hour=23, minute=0)
+            if self.end_date_lt > end_date:
+                raise ValueError(
+                    "Invalid end date for long-term correction. The end date cannot exceed the "
+                    "last full time period (defined by the time resolution) in the provided "
+                    "reanalysis data."
+                )
+            end_date = self.end_date_lt
+        elif end_date.month == (end_date + pd.DateOffset(hours=1)).month:
+            end_date = end_date.replace(day=1, hour=0, minute=0) - pd.DateOffset(hours=1)
+
+        self._reanalysis_aggregate = pd.DataFrame(
+            index=pd.date_range(start=start_date, end=end_date, freq=self.resample_freq),
+            dtype=float,
+        )
+
+        start_date_required = (
+            self._reanalysis_aggregate.index[-1]
+            + self._reanalysis_aggregate.index.freq
+            - pd.offsets.DateOffset(years=self.uncertainty_windiness[1])
+        )
+        if self._reanalysis_aggregate.index[0] > start_date_required:
+            if self.end_date_lt is not None:
+                raise ValueError(
+                    "Invalid end date argument for long-term correction. This end date does not "
+                    "provide enough reanalysis data for the long-term correction."
+                )
+            raise ValueError(
+                "The date range of the provided reanalysis data is not long enough to "
+                "perform the long-term correction."
+            )
+
+        for key, df in reanalysis.items():
+            aggregate = REANALYSIS_CACHE.get(key, df, self.resample_freq)
+            self._reanalysis_aggregate[key] = aggregate["ws_dens_corr"]
+            if self.reg_wind_direction | self.reg_temperature:
+                cols = [f"{key}_{var}" for var in self.reanalysis_vars]
+                self._reanalysis_aggregate[cols] = aggregate[list(self.reanalysis_vars)]
+            if self.reg_wind_direction:
+                self._reanalysis_aggregate[key + "_WMETR_HorWdDir"] = np.rad2deg(
+                    np.pi
+                    - np.arctan2(
+                        -self._reanalysis_aggregate[key + "_WMETR_HorWdSpdU"],
+                        self._reanalysis_aggregate[key + "_WMETR_HorWdSpdV"],
+                    )
+                )
+
+        self.aggregate = self.aggregate.join(self._reanalysis_aggregate)
+
+
+if HAS_OPENOA:
+    class CachedMonteCarloAEP(CachedReanalysisMixin, MonteCarloAEP):
+        """MonteCarloAEP reading its reanalysis aggregates from the persistent cache."""
+
+
+def build(plant, resolutions=DEFAULT_RESOLUTIONS, cache: ReanalysisCache = REANALYSIS_CACHE) -> list[str]:
+    """Build (or verify) the aggregates of every product of `plant`; returns their paths."""
+    paths = []
+    for product, df in plant.reanalysis.items():
+        for freq in resolutions:
+            cache.get(product, df, freq)
+            paths.append(cache._path(product, cache.fingerprint(df), freq))
+    return paths
+
+
+if __name__ == "__main__":
+    import sys
+
+    from save_results import load_plant
+
+    resolutions = tuple(sys.argv[1:]) or DEFAULT_RESOLUTIONS
+    print(f"🌍 Building reanalysis aggregates ({', '.join(resolutions)})...", flush=True)
+    for path in build(load_plant(), resolutions):
+        print(f"   {path}", flush=True)
+    print(f"✅ Reanalysis cache ready: {REANALYSIS_CACHE.stats()}", flush=True)
@@ -0,0 +1,88 @@
+"""
+reanalysis_store.py — Columnar on-disk copy of the prepared reanalysis products.
+
+Each product (era5, merra2, ...) is written as one .npy file per numeric
+column plus its time index, so it can be loaded or memory-mapped back into a
+DataFrame without re-reading and re-deriving the hourly CSVs.
+"""
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+REANALYSIS_FORMAT_VERSION = 1
+
+
+@dataclass
+class ReanalysisStore:
+    """Reanalysis product name -> DataFrame indexed by time (numeric columns)."""
+
+    frames: dict
+    fingerprint: str = ""
+
+
+def build_reanalysis_store(reanalysis: dict, fingerprint: str = "") -> ReanalysisStore:
+    """Keep the numeric columns of each prepared reanalysis frame."""
+    frames = {}
+    for name, df in reanalysis.items():
+        numeric = df.select_dtypes(include="number").astype(np.float64)
+        numeric.index = pd.DatetimeIndex(df.index, name="time")
+        frames[name] = numeric
+    return ReanalysisStore(frames=frames, fingerprint=fingerprint)
+
+
+def save_reanalysis_store(store: ReanalysisStore, path: str) -> None:
+    """Write every product as <path>/<product>/{time,col_i}.npy + meta.json."""
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    products = {}
+    for name, df in store.frames.items():
+        os.makedirs(os.path.join(tmp_path, name))
+        np.save(os.path.join(tmp_path, name, "time.npy"), df.index.values.astype("datetime64[ns]"))
+        files = {}
+        for i, col in enumerate(df.columns):
+            files[str(col)] = f"col_{i}.npy"
+            np.save(os.path.join(tmp_path, name, files[str(col)]), df[col].to_numpy(dtype=np.float64))
+        products[name] = files
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({
+            "version": REANALYSIS_FORMAT_VERSION,
+            "fingerprint": store.fingerprint,
+            "products": products,
+        }, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_reanalysis_store(path: str, fingerprint: str | None = None, mmap: bool = False) -> ReanalysisStore | None:
+    """
+    Load a persisted reanalysis store; None if missing or outdated.
+
+    With `mmap=True` the columns are read-only memory-mapped views, so the
+    frames share the file's pages with every other process mapping them.
+    """
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.isfile(meta_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("version") != REANALYSIS_FORMAT_VERSION:
+            return None
+        if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+            return None
+        mmap_mode = "r" if mmap else None
+        frames = {}
+        for name, files in meta["products"].items():
+            time = np.load(os.path.join(path, name, "time.npy"))
+            columns = {col: np.load(os.path.join(path, name, fn), mmap_mode=mmap_mode) for col, fn in files.items()}
+            frames[name] = pd.DataFrame(columns, index=pd.DatetimeIndex(time, name="time"), copy=False)
+        return ReanalysisStore(frames=frames, fingerprint=meta.get("fingerprint", ""))
+    except Exception as e:
+        print(f"⚠️ Could not load reanalysis store from {path}: {e}")
+        return None
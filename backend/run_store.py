@@ -0,0 +1,204 @@
+"""
+run_store.py — Persistent history of analysis runs in an embedded SQLite database.
+
+Every real analysis is stored with its plant, data fingerprint, MonteCarloAEP
+parameters, full response (charts included, zlib-compressed), AEP samples and
+timings. Runs are indexed by plant and time for history views, and by
+(plant, fingerprint, parameters) so an equivalent earlier run can be served
+instead of recomputed. WAL mode lets API workers, pool workers and
+save_results.py write to the same file concurrently.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+RUN_STORE_PATH = os.environ.get(
+    "RUN_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_history.sqlite3")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plant TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    data_fingerprint TEXT NOT NULL,
+    params_key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    fields TEXT,
+    source TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    aep_gwh REAL,
+    uncertainty TEXT,
+    timings TEXT NOT NULL,
+    aep_samples BLOB,
+    response BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_plant_time ON runs (plant, created_at);
+CREATE INDEX IF NOT EXISTS runs_equivalent ON runs (plant, data_fingerprint, params_key, created_at);
+"""
+
+# Columns returned by listings (no blobs)
+SUMMARY_COLUMNS = (
+    "id", "plant", "created_at", "data_fingerprint", "params", "fields",
+    "source", "mode", "aep_gwh", "uncertainty", "timings",
+)
+
+
+def params_key(params: dict) -> str:
+    """Canonical form of a run's parameters; equal keys mean equivalent runs."""
+    canonical = dict(params)
+    if canonical.get("reanalysis_products") is not None:
+        canonical["reanalysis_products"] = sorted(canonical["reanalysis_products"])
+    return json.dumps(canonical, sort_keys=True)
+
+
+def _expand(fields, aliases: dict | None) -> set:
+    """`fields` with shorthand names (e.g. "chart_data") replaced by the fields they stand for."""
+    out = set()
+    for field in fields:
+        out.update(aliases.get(field, (field,)) if aliases else (field,))
+    return out
+
+
+def _covers(stored_fields, fields, aliases: dict | None = None) -> bool:
+    """True if a run computed with `stored_fields` (None = all) has every field in `fields`."""
+    if stored_fields is None:
+        return True
+    return fields is not None and _expand(fields, aliases) <= _expand(stored_fields, aliases)
+
+
+class RunStore:
+    """SQLite-backed run history (one connection per thread)."""
+
+    def __init__(self, path: str = RUN_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def record(self, plant: str, data_fingerprint: str, params: dict, response: dict, aep_samples=None,
+               timings: dict | None = None, fields: list | None = None, source: str = "api") -> int:
+        """Store one run; returns its id."""
+        samples = None if aep_samples is None else np.asarray(aep_samples, dtype=np.float64).tobytes()
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO runs (plant, created_at, data_fingerprint, params_key, params, fields, source, mode,"
+                " aep_gwh, uncertainty, timings, aep_samples, response) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                (
+                    plant, time.time(), data_fingerprint, params_key(params), json.dumps(params),
+                    json.dumps(sorted(fields)) if fields is not None else None, source,
+                    response.get("mode", ""), response.get("aep_gwh"), response.get("uncertainty"),
+                    json.dumps(timings or {}), samples, zlib.compress(json.dumps(response).encode()),
+                ),
+            )
+        return cur.lastrowid
+
+    @staticmethod
+    def _summary(row) -> dict:
+        out = {k: row[k] for k in SUMMARY_COLUMNS}
+        for k in ("params", "fields", "timings"):
+            out[k] = json.loads(out[k]) if out[k] is not None else None
+        return out
+
+    def find_equivalent(self, plant: str, data_fingerprint: str, params: dict, fields: list | None = None,
+                        max_age_s: float | None = None, aliases: dict | None = None) -> dict | None:
+        """
+        Latest stored run of the same plant, data and parameters that has every requested field
+        (`aliases` maps shorthand field names to the fields they stand for).
+        """
+        sql = (
+            "SELECT id, fields FROM runs WHERE plant = ? AND data_fingerprint = ? AND params_key = ?"
+            " AND mode LIKE 'REAL_DATA%'"
+        )
+        args = [plant, data_fingerprint, params_key(params)]
+        if max_age_s:
+            sql += " AND created_at >= ?"
+            args.append(time.time() - max_age_s)
+        for row in self._conn().execute(sql + " ORDER BY created_at DESC LIMIT 20", args):
+            stored_fields = json.loads(row["fields"]) if row["fields"] is not None else None
+            if _covers(stored_fields, fields, aliases):
+                return self.get(row["id"], samples=False)
+        return None
+
+    def list_runs(self, plant: str | None = None, since: float | None = None, until: float | None = None,
+                  limit: int = 50) -> list[dict]:
+        """Run summaries, newest first."""
+        clauses, args = [], []
+        for clause, value in (("plant = ?", plant), ("created_at >= ?", since), ("created_at <= ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                args.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM runs {where} ORDER BY created_at DESC LIMIT ?",
+            (*args, limit),
+        )
+        return [self._summary(row) for row in rows]
+
+    def get(self, run_id: int, samples: bool = True) -> dict | None:
+        """One run: summary, full response and (optionally) its AEP samples."""
+        row = self._conn().execute(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)}, aep_samples, response FROM runs WHERE id = ?", (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        out = self._summary(row)
+        out["response"] = json.loads(zlib.decompress(row["response"]))
+        if samples:
+            out["aep_samples"] = (
+                np.frombuffer(row["aep_samples"], dtype=np.float64).tolist() if row["aep_samples"] else []
+            )
+        return out
+
+    def compare(self, run_ids: list[int]) -> dict:
+        """AEP distribution statistics of several runs and the parameters that differ between them."""
+        runs = [self.get(run_id) for run_id in run_ids]
+        missing = [run_id for run_id, run in zip(run_ids, runs) if run is None]
+        if missing:
+            raise KeyError(f"Unknown run ids: {', '.join(map(str, missing))}")
+        keys = sorted({k for run in runs for k in run["params"]})
+        differing = [k for k in keys if len({json.dumps(run["params"].get(k)) for run in runs}) > 1]
+        out = []
+        for run in runs:
+            samples = np.asarray(run["aep_samples"], dtype=float)
+            stats = {}
+            if samples.size:
+                p10, p50, p90 = np.percentile(samples, [10, 50, 90])
+                stats = {
+                    "mean": float(samples.mean()), "std": float(samples.std()),
+                    "p10": float(p10), "p50": float(p50), "p90": float(p90), "n": int(samples.size),
+                }
+            out.append({
+                "id": run["id"], "created_at": run["created_at"], "data_fingerprint": run["data_fingerprint"],
+                "params": run["params"], "timings": run["timings"], "aep_gwh": stats,
+            })
+        base = out[0]["aep_gwh"].get("mean")
+        for entry in out:
+            mean = entry["aep_gwh"].get("mean")
+            entry["aep_delta_gwh"] = None if base is None or mean is None else round(mean - base, 4)
+        return {"runs": out, "differing_params": differing}
+
+    def stats(self) -> dict:
+        count, latest = self._conn().execute("SELECT COUNT(*), MAX(created_at) FROM runs").fetchone()
+        return {"path": self.path, "runs": count, "latest_run_at": latest}
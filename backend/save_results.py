@@ -6,6 +6,7 @@ import math
 import base64
 import json
 import gc
+import time
 import numpy as np
 import pandas as pd
 import matplotlib
@@ -39,8 +40,8 @@ def get_base64_plot():
     plt.close()
     return f"data:image/png;base64,{img_str}"
 
-def build_chart_data_from_plant(plant, analysis, aep_val):
-    """Extract interactive chart data from real PlantData and analysis results."""
+def build_chart_data_from_plant(plant, analysis, aep_val, num_sim, plant_name="La Haute Borne"):
+    """Extract interactive chart data from real PlantData and analysis results of `num_sim` simulations."""
     # --- Power Curve from SCADA ---
     power_curve = []
     try:
@@ -106,12 +107,21 @@ def build_chart_data_from_plant(plant, analysis, aep_val):
                         actual = round(val / 1e6, 3) # assume kWh -> GWh
                         monthly_production.append({
                             "month": months[m_idx],
-                            "expected_gwh": round(actual * 1.05, 3),
                             "actual_gwh": actual,
                         })
     except Exception as e:
         print(f"⚠️ Monthly production failed: {e}")
 
+    # --- Block-bootstrap confidence bands (see bootstrap.py) ---
+    try:
+        from bootstrap import add_monthly_bands, add_power_curve_bands, daily_from_frame
+        daily = daily_from_frame(plant.scada)
+        add_power_curve_bands(power_curve, daily)
+        if monthly_production:
+            add_monthly_bands(monthly_production, daily, energy_col)
+    except Exception as e:
+        print(f"⚠️ Bootstrap bands failed: {e}")
+
     # --- AEP Distribution ---
     aep_distribution = []
     try:
@@ -128,26 +138,46 @@ def build_chart_data_from_plant(plant, analysis, aep_val):
     except Exception as e:
         print(f"⚠️ AEP distribution failed: {e}")
 
-    # --- Turbine Comparison ---
+    # --- Turbine Comparison (from the aggregate cube, as in main.py) ---
     turbine_data = []
+    rated_mw = []
+    fleet = None
     try:
-        # Check if index has asset IDs
-        t_ids = []
-        if hasattr(plant, 'asset') and plant.asset is not None:
-             t_ids = plant.asset.index.tolist()
-        
-        # If no explicit turbine data, create placeholders for La Haute Borne (4 turbines)
-        if not t_ids: t_ids = ["R80711", "R80721", "R80736", "R80790"]
+        from aggregate_cube import build_cube, scada_datetimes
+        from power_curves import fit_power_curves
+        cube = build_cube(plant.scada)
+        mean_power = cube.turbine_mean_power()
+        samples = cube.turbine_stats("power")["count"]
+        # Availability of the SCADA record: share of the fleet's 10-minute
+        # timestamps at which the turbine reports power
+        intervals = max(int(scada_datetimes(plant.scada).nunique()), 1)
+        try:
+            fleet = fit_power_curves(cube)  # Fleet reference as "ideal", deviation scores (power_curves.py)
+            fleet.add_reference(power_curve)
+        except Exception as e:
+            print(f"⚠️ Per-turbine power curves failed: {e}")
+        scores = fleet.score_by_turbine() if fleet is not None else {}
 
-        for i, t_id in enumerate(t_ids):
-            # Calculate real values if possible, else placeholder
-            cf = 0.35 + (i * 0.01) # varying slightly
-            av = 0.96 + (i * 0.005)
+        for t_id in plant.asset.index:
+            if str(t_id) not in mean_power:
+                print(f"   ⚠️ No SCADA rows for turbine {t_id}")
+                continue
+            capacity_mw = float(plant.asset.loc[t_id, "rated_power"]) if "rated_power" in plant.asset.columns else np.nan
+            if capacity_mw > 10:  # kW (e.g. 2050), not MW
+                capacity_mw /= 1000.0
+            power = mean_power[str(t_id)]
+            # Mean power above 10000 is in W, otherwise kW
+            power_mw = power / 1e6 if power > 10000 else power / 1e3
+            cf = min(max(power_mw / capacity_mw, 0), 1) if capacity_mw > 0 and np.isfinite(power_mw) else 0
+            rated_mw.append(capacity_mw)
+            score = scores.get(str(t_id), {})
             turbine_data.append({
                 "turbine_id": str(t_id),
-                "capacity_factor": round(cf, 3), 
-                "availability": round(av, 3),
-                "annual_energy_mwh": round(cf * 2.05 * 8760, 1),
+                "capacity_factor": round(cf, 3),
+                "availability": round(min(float(samples.get(str(t_id), 0)) / intervals, 1.0), 3),
+                "annual_energy_mwh": round(cf * capacity_mw * 8760, 1) if capacity_mw > 0 else 0,
+                "power_curve_deviation_pct": score.get("deviation_pct"),
+                "underperforming": score.get("underperforming", False),
             })
     except Exception as e:
         print(f"⚠️ Turbine data failed: {e}")
@@ -159,78 +189,165 @@ def build_chart_data_from_plant(plant, analysis, aep_val):
         "turbine_comparison": turbine_data,
         "summary": {
             "total_turbines": len(turbine_data),
-            "rated_power_mw": 2.05,
+            "rated_power_mw": round(float(np.nanmedian(rated_mw)), 3) if rated_mw else 0,
             "avg_capacity_factor": round(np.mean([t["capacity_factor"] for t in turbine_data]), 3) if turbine_data else 0,
             "avg_availability": round(np.mean([t["availability"] for t in turbine_data]), 3) if turbine_data else 0,
-            "plant_name": "La Haute Borne",
-            "num_simulations": 50,
+            "plant_name": plant_name,
+            "num_simulations": int(num_sim),
+            "underperforming_turbines": [t["turbine_id"] for t in turbine_data if t.get("underperforming")],
         }
     }
 
 
-def main():
-    print("🚀 Starting Pre-compute Analysis...")
+# Set by setup_engie() / warm_worker() / worker_plant()
+_ENGIE = None
+WORKER_PLANT = None
+WORKER_PLANT_PATH = None
 
-    # Set up imports
-    try:
+
+def setup_engie():
+    """Make openoa and project_ENGIE importable; returns (project_ENGIE, MonteCarloAEP, data path)."""
+    global _ENGIE
+    if _ENGIE is None:
         OPENOA_REPO_PATH = os.path.join(os.getcwd(), "OpenOA_Repo")
         examples_path = os.path.join(OPENOA_REPO_PATH, "examples")
         if os.path.exists(examples_path):
             sys.path.insert(0, examples_path)
             sys.path.insert(0, os.path.join(OPENOA_REPO_PATH)) # Ensure openoa is importable
-        
+
         # We assume openoa is installed or in path
         import openoa
         import project_ENGIE
         from openoa.analysis import MonteCarloAEP
-        
-        DATA_PATH = os.path.join(examples_path, "data", "la_haute_borne")
-        print(f"   Data path: {DATA_PATH}")
-        
-        # Load Data
+
+        _ENGIE = (project_ENGIE, MonteCarloAEP, os.path.join(examples_path, "data", "la_haute_borne"))
+    return _ENGIE
+
+
+def load_plant(data_path=None):
+    """Load an ENGIE-format dataset (directory or .zip); La Haute Borne by default."""
+    project_ENGIE, _, DATA_PATH = setup_engie()
+    DATA_PATH = data_path or DATA_PATH
+    print(f"   Data path: {DATA_PATH}")
+
+    # Load Data (straight from the ZIP when it hasn't been extracted)
+    if os.path.isdir(DATA_PATH):
         plant = project_ENGIE.prepare(
             path=DATA_PATH,
             return_value="plantdata",
             use_cleansed=False,
         )
-        print("✅ PlantData loaded.")
-        
-        # Run Analysis
-        print("⏳ Running MonteCarloAEP (num_sim=20)...")
-        analysis = MonteCarloAEP(plant)
-        analysis.run(num_sim=20)
-        print("✅ Analysis complete.")
-        
-        # Extract Results
-        aep_val = float(analysis.results["aep_GWh"].mean())
-        unc_val = float(analysis.results["avail_pct"].std() * 100) if "avail_pct" in analysis.results else 4.5
-        
-        # Plot
-        plt.figure(figsize=(10, 6))
-        # Use plot method if available, else manual
-        try:
-            analysis.plot()
-        except:
-            if "aep_GWh" in analysis.results:
-                plt.hist(analysis.results["aep_GWh"], bins=12)
-        
-        plot_url = get_base64_plot()
-        
-        # Chart Data
-        chart_data = build_chart_data_from_plant(plant, analysis, aep_val)
-        
-        # Final JSON payload
-        result = {
-            "status": "success",
-            "mode": "REAL_DATA (PRE-COMPUTED)",
-            "aep_gwh": round(aep_val, 2),
-            "uncertainty": f"{round(unc_val, 2)}%",
-            "plot_image": plot_url,
-            "chart_data": chart_data,
+    else:
+        from zip_loader import prepare_from_zip
+        plant = prepare_from_zip(project_ENGIE, DATA_PATH if DATA_PATH.endswith(".zip") else f"{DATA_PATH}.zip")
+    print("✅ PlantData loaded.")
+    return plant
+
+
+def warm_worker():
+    """worker_pool initializer: import the stack and load the plant once per worker."""
+    global WORKER_PLANT, WORKER_PLANT_PATH
+    WORKER_PLANT = load_plant()
+    WORKER_PLANT_PATH = setup_engie()[2]
+
+
+def worker_plant(data_path):
+    """The plant at `data_path`, reusing the one this process holds (one plant at a time)."""
+    global WORKER_PLANT, WORKER_PLANT_PATH
+    if WORKER_PLANT is None or WORKER_PLANT_PATH != data_path:
+        WORKER_PLANT = None
+        gc.collect()
+        WORKER_PLANT = load_plant(data_path)
+        WORKER_PLANT_PATH = data_path
+    return WORKER_PLANT
+
+
+def compute_results(num_sim=20, reg_model="lin", time_resolution="MS", reanalysis_products=None, store=False,
+                    plant_name="La Haute Borne", data_path=None):
+    """
+    Run the analysis and return the sanitized results payload.
+    Takes the same MonteCarloAEP knobs as main.py's AnalysisRequest
+    (reanalysis_products=None uses every product of the plant), and the
+    dataset to analyze (`data_path`, La Haute Borne by default). With
+    store=True the run is also recorded in the run history (run_store.py).
+    Also usable as a worker_pool job ("save_results:compute_results" with
+    "save_results:setup_engie" as initializer, so each worker loads the
+    plant of its first job lazily); batch_runner.py runs fleets of these.
+    warm_worker() preloads La Haute Borne and only suits single-plant pools.
+    """
+    _, _, DATA_PATH = setup_engie()
+    DATA_PATH = data_path or DATA_PATH
+    from reanalysis_cache import CachedMonteCarloAEP
+    started = time.time()
+    plant = worker_plant(DATA_PATH)
+    plant_load_s = time.time() - started
+
+    # Run Analysis (reanalysis aggregates come from the persistent reanalysis cache)
+    print(f"⏳ Running MonteCarloAEP (num_sim={num_sim}, reg_model={reg_model}, time_resolution={time_resolution})...")
+    analysis = CachedMonteCarloAEP(
+        plant, reg_model=reg_model, time_resolution=time_resolution, reanalysis_products=reanalysis_products,
+    )
+    analysis.run(num_sim=num_sim, reg_model=reg_model, reanalysis_products=reanalysis_products)
+    analysis_s = time.time() - started - plant_load_s
+    print("✅ Analysis complete.")
+
+    # Extract Results
+    aep_val = float(analysis.results["aep_GWh"].mean())
+    unc_val = float(analysis.results["avail_pct"].std() * 100) if "avail_pct" in analysis.results else 4.5
+
+    # Plot
+    plt.figure(figsize=(10, 6))
+    # Use plot method if available, else manual
+    try:
+        analysis.plot()
+    except:
+        if "aep_GWh" in analysis.results:
+            plt.hist(analysis.results["aep_GWh"], bins=12)
+
+    plot_url = get_base64_plot()
+
+    # Chart Data
+    chart_data = build_chart_data_from_plant(plant, analysis, aep_val, num_sim, plant_name)
+
+    # Final JSON payload
+    result = {
+        "status": "success",
+        "mode": "REAL_DATA (PRE-COMPUTED)",
+        "aep_gwh": round(aep_val, 2),
+        "uncertainty": f"{round(unc_val, 2)}%",
+        "plot_image": plot_url,
+        "chart_data": chart_data,
+    }
+
+    result = sanitize_floats(result)
+    if store:
+        params = {
+            "num_sim": num_sim, "reg_model": reg_model, "time_resolution": time_resolution,
+            "reanalysis_products": list(reanalysis_products or plant.reanalysis.keys()),
         }
-        
-        sanitized = sanitize_floats(result)
-        
+        timings = {
+            "plant_load_s": round(plant_load_s, 3), "analysis_s": round(analysis_s, 3),
+            "total_s": round(time.time() - started, 3),
+        }
+        try:
+            from prepared_data import data_fingerprint
+            from run_store import RunStore
+            result["run_id"] = RunStore().record(
+                plant_name, data_fingerprint(DATA_PATH), params, result,
+                analysis.results["aep_GWh"].to_numpy(), timings, source="save_results",
+            )
+            print(f"🗄️ Run stored in the run history (id {result['run_id']})")
+        except Exception as e:  # run_store/prepared_data are not shipped to the Docker builder
+            print(f"⚠️ Run not stored in the run history: {e}")
+    return result
+
+
+def main():
+    print("🚀 Starting Pre-compute Analysis...")
+
+    try:
+        sanitized = compute_results(num_sim=20, store=True)
+
         with open("results.json", "w") as f:
             json.dump(sanitized, f)
             
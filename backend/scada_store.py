@@ -0,0 +1,229 @@
+"""
+scada_store.py — Columnar on-disk copy of the prepared SCADA, sorted for slicing.
+
+Rows are sorted by turbine, then time. A turbine's rows are the contiguous
+range `offsets[i]:offsets[i + 1]`, and a date range inside it is found by
+binary search (`np.searchsorted`) on the sorted timestamps, so a filtered
+query touches only the rows it needs.
+
+Reductions over a selection stream it in chunks of at most SCADA_CHUNK_ROWS
+rows, partitioned by turbine or by time, and merge the per-chunk cubes. With
+the store memory-mapped (`load_store(..., mmap=True)`), peak memory is bounded
+by the chunk size, not by the length of the SCADA history.
+"""
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import (
+    AggregateCube,
+    MEASURES,
+    SCADA_CHUNK_ROWS,
+    build_cube_from_arrays,
+    detect_columns,
+    merge_cubes,
+    scada_datetimes,
+    scada_turbine_ids,
+)
+
+STORE_FORMAT_VERSION = 1
+PARTITIONS = ("turbine", "time")
+
+
+@dataclass
+class ScadaStore:
+    """Per-turbine, time-sorted SCADA columns plus the metadata to slice them."""
+
+    turbines: np.ndarray  # (T,) turbine IDs as strings
+    offsets: np.ndarray  # (T + 1,) row offsets of each turbine block
+    time: np.ndarray  # (N,) datetime64[ns], sorted within each turbine block
+    data: dict  # column name -> (N,) float64
+    aliases: dict  # "wind_speed" / "power" / "energy" -> column name
+    rated_power_mw: dict  # turbine ID -> rated power (MW)
+    fingerprint: str = ""
+
+    def __len__(self):
+        return len(self.time)
+
+    def column(self, name: str) -> np.ndarray | None:
+        """Column by source name or alias ("wind_speed", "power", "energy")."""
+        return self.data.get(self.aliases.get(name, name))
+
+    def turbine_slice(self, turbine: str, start=None, end=None) -> slice:
+        """Row range of `turbine` with start <= time < end (binary search)."""
+        i = int(np.searchsorted(self.turbines, str(turbine)))
+        if i >= len(self.turbines) or self.turbines[i] != str(turbine):
+            return slice(0, 0)
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        times = self.time[lo:hi]
+        a = lo + int(np.searchsorted(times, np.datetime64(pd.Timestamp(start), "ns"))) if start is not None else lo
+        b = lo + int(np.searchsorted(times, np.datetime64(pd.Timestamp(end), "ns"))) if end is not None else hi
+        return slice(a, max(a, b))
+
+    def slices(self, turbines=None, start=None, end=None) -> list:
+        """(turbine, slice) for each selected turbine."""
+        selected = self.turbines if turbines is None else [str(t) for t in turbines]
+        return [(t, self.turbine_slice(t, start, end)) for t in selected]
+
+    def iter_chunks(self, turbines=None, start=None, end=None, by: str = "turbine",
+                    chunk_rows: int = SCADA_CHUNK_ROWS, period: str = "MS"):
+        """
+        Yield the selection as lists of (turbine, slice) holding at most `chunk_rows` rows.
+
+        by="turbine" walks each turbine's history in order; by="time" walks
+        calendar periods (`period`, monthly by default) across all turbines, so a
+        chunk covers the same time window for the whole fleet.
+        """
+        if by not in PARTITIONS:
+            raise ValueError(f"by must be one of {PARTITIONS}, got {by!r}")
+        if by == "turbine":
+            pieces = [p for p in self.slices(turbines, start, end) if p[1].stop > p[1].start]
+        else:
+            selected = self.slices(turbines, start, end)
+            first = min((self.time[s.start] for _, s in selected if s.stop > s.start), default=None)
+            last = max((self.time[s.stop - 1] for _, s in selected if s.stop > s.start), default=None)
+            pieces = []
+            if first is not None:
+                # Period boundaries inside the selection; windows are [edge_i, edge_i+1)
+                edges = [np.datetime64(e, "ns") for e in pd.date_range(first, last, freq=period)]
+                for lo, hi in zip([None, *edges], [*edges, None]):
+                    for t, s in selected:
+                        times = self.time[s.start:s.stop]
+                        a = s.start + int(np.searchsorted(times, lo)) if lo is not None else s.start
+                        b = s.start + int(np.searchsorted(times, hi)) if hi is not None else s.stop
+                        if b > a:
+                            pieces.append((t, slice(a, b)))
+
+        step = max(int(chunk_rows), 1)
+        chunk, rows = [], 0
+        for t, s in pieces:
+            a = s.start
+            while a < s.stop:
+                b = min(s.stop, a + step - rows)
+                chunk.append((t, slice(a, b)))
+                rows += b - a
+                a = b
+                if rows >= step:
+                    yield chunk
+                    chunk, rows = [], 0
+        if chunk:
+            yield chunk
+
+    def _parts_cube(self, parts) -> AggregateCube:
+        """Aggregate cube of the rows in `parts` (gathers only those rows)."""
+        idx = np.concatenate([np.arange(s.start, s.stop) for _, s in parts]) if parts else np.array([], dtype=np.int64)
+        turbine_ids = np.repeat([t for t, _ in parts], [s.stop - s.start for _, s in parts])
+        ws = self.column("wind_speed")
+        return build_cube_from_arrays(
+            turbine_ids,
+            self.time[idx],
+            ws[idx] if ws is not None else np.full(len(idx), np.nan),
+            {m: (self.column(m)[idx] if self.column(m) is not None else None) for m in MEASURES},
+            columns=self.aliases,
+            fingerprint=self.fingerprint,
+        )
+
+    def cube(self, turbines=None, start=None, end=None, by: str = "turbine",
+             chunk_rows: int = SCADA_CHUNK_ROWS) -> AggregateCube:
+        """Aggregate cube over an arbitrary (turbine, time) selection, reduced chunk by chunk."""
+        cube = None
+        for parts in self.iter_chunks(turbines, start, end, by=by, chunk_rows=chunk_rows):
+            part = self._parts_cube(parts)
+            cube = part if cube is None else merge_cubes([cube, part])
+        return cube if cube is not None else self._parts_cube([])
+
+
+def build_store(scada: pd.DataFrame, asset: pd.DataFrame | None = None, fingerprint: str = "") -> ScadaStore:
+    """Build a store from a prepared SCADA frame (numeric columns only)."""
+    times = scada_datetimes(scada).values
+    turbine_ids = scada_turbine_ids(scada)
+    codes, turbines = pd.factorize(turbine_ids, sort=True)
+    valid = ~np.isnat(times)
+    order = np.lexsort((times[valid], codes[valid]))
+    rows = np.flatnonzero(valid)[order]
+    offsets = np.searchsorted(codes[rows], np.arange(len(turbines) + 1))
+
+    data = {}
+    for c in scada.columns:
+        if pd.api.types.is_numeric_dtype(scada[c]):
+            data[str(c)] = scada[c].to_numpy(dtype=np.float64)[rows]
+
+    aliases = {k: str(v) for k, v in detect_columns(scada).items() if v is not None}
+
+    rated = {}
+    if asset is not None and "rated_power" in asset.columns:
+        for t_id, val in asset["rated_power"].items():
+            val = float(val)
+            # Heuristic: if > 10, likely kW (e.g. 2050), not MW.
+            rated[str(t_id)] = val / 1000.0 if val > 10 else val
+
+    return ScadaStore(
+        turbines=np.asarray(turbines, dtype=str),
+        offsets=offsets.astype(np.int64),
+        time=times[rows],
+        data=data,
+        aliases=aliases,
+        rated_power_mw=rated,
+        fingerprint=fingerprint,
+    )
+
+
+def save_store(store: ScadaStore, path: str) -> None:
+    """Write the store as a directory of .npy arrays plus meta.json."""
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "time.npy"), store.time)
+    np.save(os.path.join(tmp_path, "offsets.npy"), store.offsets)
+    files = {}
+    for i, (name, values) in enumerate(store.data.items()):
+        files[name] = f"col_{i}.npy"
+        np.save(os.path.join(tmp_path, files[name]), values)
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({
+            "version": STORE_FORMAT_VERSION,
+            "fingerprint": store.fingerprint,
+            "turbines": store.turbines.tolist(),
+            "columns": files,
+            "aliases": store.aliases,
+            "rated_power_mw": store.rated_power_mw,
+        }, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_store(path: str, fingerprint: str | None = None, mmap: bool = False) -> ScadaStore | None:
+    """
+    Load a persisted store; None if missing, outdated or built from other data.
+
+    With `mmap=True` the arrays are read-only memory-mapped views shared with
+    every other process mapping the same files.
+    """
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.isfile(meta_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_FORMAT_VERSION:
+            return None
+        if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+            return None
+        mmap_mode = "r" if mmap else None
+        return ScadaStore(
+            turbines=np.asarray(meta["turbines"], dtype=str),
+            offsets=np.load(os.path.join(path, "offsets.npy")),
+            time=np.load(os.path.join(path, "time.npy"), mmap_mode=mmap_mode),
+            data={name: np.load(os.path.join(path, fn), mmap_mode=mmap_mode) for name, fn in meta["columns"].items()},
+            aliases=meta["aliases"],
+            rated_power_mw=meta.get("rated_power_mw", {}),
+            fingerprint=meta.get("fingerprint", ""),
+        )
+    except Exception as e:
+        print(f"⚠️ Could not load SCADA store from {path}: {e}")
+        return None
@@ -3,15 +3,17 @@
 setup_data.py — Download and prepare the OpenOA dataset for local development.
 
 This script replicates what the Dockerfile does:
-  1. Shallow-clones the OpenOA repository (NatLabRockies fork)
-  2. Unzips the La Haute Borne sample dataset
+  1. Shallow-clones the OpenOA repository (NatLabRockies fork) at OPENOA_REF
+  2. Checks the La Haute Borne sample dataset (read straight from the ZIP by
+     zip_loader.py; pass --extract to also unzip it to disk)
   3. Patches OpenOA source to lazy-import unused heavy deps
   4. Installs OpenOA with --no-deps + only the required dependencies
+  5. Pre-builds the reanalysis aggregate cache (reanalysis_cache.py)
 
 Works on Windows, macOS, and Linux.
 
 Usage:
-    python setup_data.py
+    python setup_data.py [--extract]
 """
 
 import os
@@ -20,6 +22,8 @@ import subprocess
 import zipfile
 
 REPO_URL = "https://github.com/NatLabRockies/OpenOA.git"
+# aep_memo.py re-implements parts of this release's MonteCarloAEP (OPENOA_VERSION there)
+OPENOA_REF = os.environ.get("OPENOA_REF", "v3.2")
 REPO_DIR = "OpenOA_Repo"
 DATA_ZIP = os.path.join(REPO_DIR, "examples", "data", "la_haute_borne.zip")
 DATA_DIR = os.path.join(REPO_DIR, "examples", "data", "la_haute_borne")
@@ -40,6 +44,7 @@ REQUIRED_DEPS = [
     "tabulate",
     "pytz",
     "pyyaml",
+    "pyarrow",
 ]
 
 
@@ -64,15 +69,18 @@ def main():
     if os.path.isdir(REPO_DIR):
         print(f"\n✓ Repository already exists at ./{REPO_DIR}, skipping clone.")
     else:
-        print(f"\n[1/4] Cloning OpenOA repository (shallow)...")
-        run(["git", "clone", "--depth", "1", REPO_URL, REPO_DIR])
+        print(f"\n[1/5] Cloning OpenOA {OPENOA_REF} (shallow)...")
+        run(["git", "clone", "--depth", "1", "--branch", OPENOA_REF, REPO_URL, REPO_DIR])
         print("  ✓ Clone complete.")
 
-    # ── Step 2: Extract dataset ───────────────────────────────
+    # ── Step 2: Dataset ───────────────────────────────────────
     if os.path.isdir(DATA_DIR) and os.listdir(DATA_DIR):
         print(f"\n✓ Dataset already extracted at ./{DATA_DIR}, skipping.")
+    elif os.path.isfile(DATA_ZIP) and "--extract" not in sys.argv:
+        print(f"\n[2/5] Dataset found at ./{DATA_ZIP}")
+        print("  ✓ It is read directly from the ZIP (no extraction needed; use --extract to unzip).")
     elif os.path.isfile(DATA_ZIP):
-        print(f"\n[2/4] Extracting La Haute Borne dataset...")
+        print(f"\n[2/5] Extracting La Haute Borne dataset...")
         os.makedirs(DATA_DIR, exist_ok=True)
         with zipfile.ZipFile(DATA_ZIP, "r") as zf:
             zf.extractall(DATA_DIR)
@@ -101,7 +109,7 @@ def main():
             print(f"  ⚠️ Could not remove .git folder: {e}")
 
     # ── Step 3: Patch OpenOA source ───────────────────────────
-    print(f"\n[3/4] Patching OpenOA source (lazy-import unused deps)...")
+    print(f"\n[3/5] Patching OpenOA source (lazy-import unused deps)...")
     patch_script = os.path.join(script_dir, "patch_openoa.py")
     if os.path.isfile(patch_script):
         run([sys.executable, patch_script, os.path.join(REPO_DIR, "openoa")])
@@ -109,7 +117,7 @@ def main():
         print("  ⚠️ patch_openoa.py not found, skipping patches.")
 
     # ── Step 4: Install OpenOA (--no-deps) + required deps ────
-    print(f"\n[4/4] Installing OpenOA (slim, --no-deps) + required dependencies...")
+    print(f"\n[4/5] Installing OpenOA (slim, --no-deps) + required dependencies...")
     print("  (This may take a few minutes on first run)\n")
 
     # Install OpenOA package without its dependency tree
@@ -118,11 +126,19 @@ def main():
     # Install only the deps we actually need
     run([sys.executable, "-m", "pip", "install", "--default-timeout=300"] + REQUIRED_DEPS)
 
+    # ── Step 5: Reanalysis aggregate cache ────────────────────
+    # Runs in a fresh interpreter so the just-installed openoa is importable;
+    # optional, since analyses build missing aggregates on first use
+    print(f"\n[5/5] Building reanalysis aggregate cache...")
+    result = subprocess.run([sys.executable, "reanalysis_cache.py"])
+    if result.returncode != 0:
+        print("  ⚠️ Could not build the reanalysis cache; it will be built on the first analysis.")
+
     # ── Done ──────────────────────────────────────────────────
     print("\n" + "=" * 60)
     print("  ✓ Setup complete!")
     print("=" * 60)
-    print(f"\n  Dataset: ./{DATA_DIR}")
+    print(f"\n  Dataset: ./{DATA_DIR if os.path.isdir(DATA_DIR) else DATA_ZIP}")
     print(f"  Start the server with:")
     print(f"    uvicorn main:app --host 0.0.0.0 --port 8000 --reload\n")
 
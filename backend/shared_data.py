@@ -0,0 +1,128 @@
+"""
+shared_data.py — Share one copy of the prepared plant arrays across worker processes.
+
+With SHARED_DATA=1, the first worker to start (or `python shared_data.py`
+run before `uvicorn main:app --workers N`) loads the plant once and publishes
+the numeric arrays — sorted SCADA store and reanalysis products — as .npy
+files under prepared_dir() (the small aggregate cube and plant tables
+alongside them). Every
+worker then memory-maps the arrays read-only, so the pages live once in the OS page cache no matter how many
+workers attach. Point PREPARED_DATA_DIR at /dev/shm to keep them in RAM-backed
+shared memory instead of on disk.
+
+A file lock makes publishing single-writer: workers starting together wait for
+the publisher and then attach to its files instead of each loading the plant.
+"""
+
+import mmap
+import os
+import time
+
+import numpy as np
+
+from aggregate_cube import SCADA_CHUNK_ROWS
+from prepared_data import ARTIFACTS, CHUNKED_PROCESSING, SHARED_DATA, get_artifact, get_cube, prepared_dir
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:  # Windows: no advisory locks, every worker may build
+    fcntl = None
+    HAS_FCNTL = False
+
+
+class _PublishLock:
+    """Exclusive advisory lock on <prepared_dir>/.publish.lock (blocking)."""
+
+    def __init__(self, data_path: str):
+        os.makedirs(prepared_dir(data_path), exist_ok=True)
+        self.path = os.path.join(prepared_dir(data_path), ".publish.lock")
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        if HAS_FCNTL:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if HAS_FCNTL:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+def attach(data_path: str) -> dict:
+    """Artifacts already published for `data_path`: {name: artifact or None}."""
+    return {name: get_artifact(name, data_path) for name in ARTIFACTS}
+
+
+def publish(data_path: str, load_plant=None) -> dict:
+    """
+    Make sure every artifact is published for the current data, then attach.
+
+    Only the process holding the lock builds; `load_plant()` is called at most
+    once, and only if something is missing or stale.
+    """
+    with _PublishLock(data_path):
+        artifacts = attach(data_path)
+        missing = [name for name, artifact in artifacts.items() if artifact is None]
+        if missing and load_plant is not None:
+            started = time.time()
+            print(f"📦 Publishing shared plant data ({', '.join(missing)})...", flush=True)
+            plant = load_plant()
+            # Store first: in chunked mode the cube is built from it
+            for name in sorted(missing, key=lambda n: n != "store"):
+                artifacts[name] = get_cube(data_path, plant) if name == "cube" else get_artifact(name, data_path, plant)
+            del plant
+            print(f"✅ Shared plant data published in {time.time() - started:.1f}s", flush=True)
+    return artifacts
+
+
+def _arrays(artifact) -> list:
+    """The numpy arrays held by an artifact (store, reanalysis store, plant tables or cube)."""
+    if artifact is None:
+        return []
+    if hasattr(artifact, "meter"):
+        return [df[c].values for df in (artifact.meter, artifact.curtail) for c in df.columns]
+    if hasattr(artifact, "frames"):
+        return [df[c].values for df in artifact.frames.values() for c in df.columns]
+    if hasattr(artifact, "data"):
+        return [artifact.time, *artifact.data.values()]
+    return [v for v in vars(artifact).values() if isinstance(v, np.ndarray)]
+
+
+def _is_mapped(a) -> bool:
+    """True if `a` is (a view of) a memory-mapped file."""
+    while isinstance(a, np.ndarray):
+        if isinstance(a, np.memmap):
+            return True
+        a = a.base
+    return isinstance(a, mmap.mmap)
+
+
+def describe(data_path: str) -> dict:
+    """Per-artifact footprint: total bytes and how many of them are shared mappings."""
+    out = {
+        "enabled": SHARED_DATA,
+        "chunked": {"enabled": CHUNKED_PROCESSING, "chunk_rows": SCADA_CHUNK_ROWS},
+        "dir": prepared_dir(data_path),
+        "artifacts": {},
+    }
+    for name in ARTIFACTS:
+        arrays = _arrays(get_artifact(name, data_path))
+        out["artifacts"][name] = {
+            "available": bool(arrays),
+            "bytes": int(sum(a.nbytes for a in arrays)),
+            "shared_bytes": int(sum(a.nbytes for a in arrays if _is_mapped(a))),
+        }
+    return out
+
+
+if __name__ == "__main__":
+    # Publish ahead of `uvicorn main:app --workers N`, so workers only attach
+    from main import DATA_PATH, HAS_ENGIE, HAS_OPENOA, load_plant
+
+    artifacts = publish(DATA_PATH, load_plant if HAS_OPENOA and HAS_ENGIE else None)
+    for name, artifact in artifacts.items():
+        print(f"   {name}: {'ready' if artifact is not None else 'missing'}", flush=True)
@@ -0,0 +1,55 @@
+"""
+singleflight.py — Coalesce concurrent identical calls into one execution.
+
+The first caller for a key (the "leader") runs the function; callers arriving
+with the same key while it is in flight wait for and share its result (or
+exception) instead of starting their own run.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Per-key in-flight call deduplication with coalescing counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self.executions = 0  # calls that actually ran the function
+        self.coalesced = 0  # calls that attached to an in-flight run
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` once per in-flight `key`; returns (result, shared)."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Backend modules are flat top-level modules (run from backend/, like uvicorn main:app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,76 @@
+"""Admission control: bounded concurrency, bounded queue, queue timeouts."""
+
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def hold(controller, release, admitted, errors):
+    try:
+        with controller.slot():
+            admitted.append(threading.current_thread().name)
+            release.wait(5)
+    except Overloaded as e:
+        errors.append(e)
+
+
+def test_concurrency_limit_queue_and_rejection():
+    controller = AdmissionController(max_concurrent=2, max_queue=2, queue_timeout_s=5)
+    release, admitted, errors = threading.Event(), [], []
+    threads = [threading.Thread(target=hold, args=(controller, release, admitted, errors), name=f"t{i}")
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    wait_for(lambda: controller.running == 2 and controller.waiting == 2)
+    assert len(admitted) == 2
+
+    with pytest.raises(Overloaded) as e:
+        with controller.slot():
+            pass
+    assert e.value.status_code == 429 and e.value.retry_after >= 1
+
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert sorted(admitted) == ["t0", "t1", "t2", "t3"] and not errors
+    stats = controller.stats()
+    assert (stats["running"], stats["waiting"], stats["admitted"], stats["rejected_queue_full"]) == (0, 0, 4, 1)
+
+
+def test_queued_request_times_out_with_503():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout_s=0.05)
+    release, admitted, errors = threading.Event(), [], []
+    holder = threading.Thread(target=hold, args=(controller, release, admitted, errors))
+    holder.start()
+    wait_for(lambda: controller.running == 1)
+
+    with pytest.raises(Overloaded) as e:
+        with controller.slot():
+            pass
+    assert e.value.status_code == 503
+    assert controller.waiting == 0 and controller.stats()["rejected_timeout"] == 1
+
+    release.set()
+    holder.join(5)
+    with controller.slot() as waited:  # The slot was released
+        assert waited < 1
+
+
+def test_slot_is_released_when_the_analysis_fails():
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    with pytest.raises(RuntimeError):
+        with controller.slot():
+            raise RuntimeError("analysis failed")
+    assert controller.running == 0
+    with controller.slot():
+        assert controller.running == 1
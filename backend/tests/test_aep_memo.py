@@ -0,0 +1,59 @@
+"""Stage-memoized what-if runs must reproduce a plain seeded MonteCarloAEP run."""
+
+import numpy as np
+import pytest
+
+main = pytest.importorskip("main")
+if not (main.HAS_OPENOA and main.HAS_ENGIE and main.HAS_DATA):
+    pytest.skip("OpenOA or the La Haute Borne dataset is not available", allow_module_level=True)
+
+from aep_memo import WhatIfEngine, seeded  # noqa: E402
+from reanalysis_cache import CachedMonteCarloAEP  # noqa: E402
+
+SEED = 7
+
+
+@pytest.fixture(scope="module")
+def plant():
+    return main.analysis_plant()
+
+
+def plain_run(plant, num_sim, reg_model="lin", time_resolution="MS", **run_options):
+    with seeded(SEED):
+        analysis = CachedMonteCarloAEP(plant, reg_model=reg_model, time_resolution=time_resolution)
+        analysis.run(num_sim=num_sim, reg_model=reg_model, progress_bar=False, **run_options)
+    return analysis.results["aep_GWh"].to_numpy()
+
+
+@pytest.mark.parametrize("options", [
+    {"num_sim": 10},
+    {"num_sim": 10, "outlier_detection": True},
+    {"num_sim": 10, "time_resolution": "D", "reg_model": "gam"},
+])
+def test_cold_what_if_matches_plain_run(plant, options):
+    engine = WhatIfEngine(load_plant=lambda: plant, fingerprint=lambda: "test")
+    memoized = engine.run(dict(options), seed=SEED)["aep_gwh"]
+    run_options = {k: v for k, v in options.items() if k not in ("num_sim", "reg_model", "time_resolution")}
+    expected = plain_run(
+        plant, options["num_sim"], options.get("reg_model", "lin"), options.get("time_resolution", "MS"),
+        **run_options,
+    )
+    np.testing.assert_array_equal(memoized, expected)
+
+
+def test_cached_stages_reproduce_the_run(plant):
+    engine = WhatIfEngine(load_plant=lambda: plant, fingerprint=lambda: "test")
+    first = engine.run({"num_sim": 10}, seed=SEED)
+    again = engine.run({"num_sim": 10}, seed=SEED)
+    assert all(again["stages"][stage]["cached"] for stage in ("plant", "analysis", "mc_inputs"))
+    np.testing.assert_array_equal(again["aep_gwh"], first["aep_gwh"])
+    np.testing.assert_array_equal(again["aep_gwh"], plain_run(plant, 10))
+
+
+def test_unseeded_runs_draw_fresh_inputs(plant):
+    engine = WhatIfEngine(load_plant=lambda: plant, fingerprint=lambda: "test")
+    first = engine.run({"num_sim": 10}, seed=None)
+    second = engine.run({"num_sim": 10}, seed=None)
+    assert not second["stages"]["mc_inputs"]["cached"]
+    assert second["stages"]["analysis"]["cached"]  # Deterministic stages are still reused
+    assert not np.array_equal(first["aep_gwh"], second["aep_gwh"])
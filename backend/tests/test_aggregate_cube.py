@@ -0,0 +1,101 @@
+"""Chunked cube builds and store slices must match a single pass over the same rows."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregate_cube import OTHER_BIN, build_cube, merge_cubes
+from scada_store import build_store
+
+TURBINES = ["T3", "T1", "T2"]
+
+
+@pytest.fixture(scope="module")
+def scada():
+    rng = np.random.default_rng(3)
+    times = pd.date_range("2019-11-20", "2020-03-10", freq="10min")
+    frames = []
+    for turbine in TURBINES:
+        keep = rng.random(len(times)) > 0.05  # Gaps differ per turbine
+        ws = rng.gamma(2.0, 3.5, keep.sum())
+        ws[rng.random(len(ws)) < 0.02] = np.nan  # Missing / out of range -> OTHER_BIN
+        ws[rng.random(len(ws)) < 0.01] = 40.0
+        power = np.clip(2000 / (1 + np.exp(-(np.nan_to_num(ws) - 8))) + rng.normal(0, 30, len(ws)), 0, None)
+        power[rng.random(len(ws)) < 0.02] = np.nan
+        frames.append(pd.DataFrame({
+            "Date_time": times[keep], "Wind_turbine_name": turbine,
+            "Ws_avg": ws, "P_avg": power, "energy_kwh": power / 6,
+        }))
+    return pd.concat(frames).sort_values("Date_time", kind="stable").reset_index(drop=True)
+
+
+def assert_same_cube(a, b):
+    assert a.turbines.tolist() == b.turbines.tolist()
+    np.testing.assert_array_equal(a.months, b.months)
+    np.testing.assert_array_equal(a.counts, b.counts)
+    np.testing.assert_array_equal(a.maxima, b.maxima)
+    # Sums are the same numbers added in a different order
+    np.testing.assert_allclose(a.sums, b.sums, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(a.sumsq, b.sumsq, rtol=1e-12, atol=1e-6)
+
+
+def assert_same_queries(a, b):
+    assert a.power_curve() == b.power_curve()
+    assert a.monthly_production() == b.monthly_production()
+    mean_a, mean_b = a.turbine_mean_power(), b.turbine_mean_power()
+    assert list(mean_a) == list(mean_b)
+    np.testing.assert_allclose(list(mean_a.values()), list(mean_b.values()), rtol=1e-12)
+    pd.testing.assert_frame_equal(a.turbine_stats(), b.turbine_stats(), rtol=1e-12)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 997, 20000])
+def test_chunked_build_matches_single_pass(scada, chunk_rows):
+    rows = scada.iloc[:3000] if chunk_rows == 1 else scada  # One row per chunk is slow
+    one_pass = build_cube(rows, chunk_rows=None)
+    chunked = build_cube(rows, chunk_rows=chunk_rows)
+    assert_same_cube(chunked, one_pass)
+    assert_same_queries(chunked, one_pass)
+    assert one_pass.counts[..., OTHER_BIN].sum() > 0  # Missing wind speeds still counted
+
+
+@pytest.mark.parametrize("by", ["turbine", "time"])
+@pytest.mark.parametrize("chunk_rows", [1500, 10**9])
+def test_store_cube_matches_single_pass_for_both_partitions(scada, by, chunk_rows):
+    store = build_store(scada)
+    assert_same_cube(store.cube(by=by, chunk_rows=chunk_rows), build_cube(scada, chunk_rows=None))
+
+    start, end = pd.Timestamp("2019-12-14 09:00"), pd.Timestamp("2020-02-03")
+    rows = scada[(scada["Date_time"] >= start) & (scada["Date_time"] < end) & scada["Wind_turbine_name"].isin(["T1", "T3"])]
+    sliced = store.cube(["T3", "T1"], start, end, by=by, chunk_rows=chunk_rows)
+    assert_same_cube(sliced, build_cube(rows, chunk_rows=None))
+    assert_same_queries(sliced, build_cube(rows, chunk_rows=None))
+
+
+def test_time_chunks_cover_one_window_across_the_fleet(scada):
+    store = build_store(scada)
+    pieces = [piece for chunk in store.iter_chunks(by="time", chunk_rows=10**9) for piece in chunk]
+    months = []
+    for turbine, s in pieces:
+        window = store.time[s.start:s.stop].astype("datetime64[M]")
+        assert (window == window[0]).all()  # Each piece stays within one calendar month
+        months.append((window[0], turbine))
+    # Month by month, every turbine of the fleet within each month
+    assert [m for m, _ in months] == sorted(m for m, _ in months)
+    for month in {m for m, _ in months}:
+        assert sorted(t for m, t in months if m == month) == sorted(TURBINES)
+
+
+@pytest.mark.parametrize("by", ["turbine", "time"])
+def test_empty_selection_gives_an_empty_cube(scada, by):
+    store = build_store(scada)
+    cube = store.cube(None, "2030-01-01", "2030-02-01", by=by)
+    assert cube.counts.sum() == 0
+    assert cube.power_curve() == [] and cube.monthly_production() == []
+    assert store.cube(["T1"], "2020-01-05", "2020-01-05", by=by).counts.sum() == 0
+    assert list(store.iter_chunks(["nope"], by=by)) == []
+
+
+def test_merge_is_order_independent_and_keeps_single_cubes(scada):
+    halves = [build_cube(scada.iloc[::2], chunk_rows=None), build_cube(scada.iloc[1::2], chunk_rows=None)]
+    assert_same_cube(merge_cubes(halves), merge_cubes(halves[::-1]))
+    assert merge_cubes(halves[:1]) is halves[0]
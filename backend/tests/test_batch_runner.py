@@ -0,0 +1,89 @@
+"""Fleet batch manifests and checkpoint resume."""
+
+import json
+import os
+
+import pytest
+
+import batch_runner
+from batch_runner import append_checkpoint, job_id, load_manifest, read_checkpoint, result_path, run_batch, write_json
+
+
+def write_manifest(tmp_path, manifest):
+    path = tmp_path / "fleet.json"
+    path.write_text(json.dumps(manifest))
+    return str(path)
+
+
+def test_manifest_expands_parameter_sets(tmp_path):
+    (tmp_path / "other.zip").write_bytes(b"")
+    path = write_manifest(tmp_path, {
+        "defaults": {"num_sim": 5},
+        "plants": [
+            {"name": "La Haute Borne"},
+            {"name": "Other", "data_path": "other.zip",
+             "parameter_sets": [{"num_sim": 50}, {"reg_model": "gam", "time_resolution": "D"}, {"num_sim": 50}]},
+        ],
+    })
+    jobs = load_manifest(path)
+    assert [(job["plant"], job["params"]["num_sim"], job["params"]["reg_model"]) for job in jobs] == [
+        ("La Haute Borne", 5, "lin"), ("Other", 50, "lin"), ("Other", 5, "gam"),  # Duplicate set dropped
+    ]
+    assert jobs[0]["data_path"] is None
+    assert jobs[1]["data_path"] == str(tmp_path / "other.zip")  # Relative to the manifest
+    assert jobs[1]["id"] == job_id("Other", str(tmp_path / "other.zip"), jobs[1]["params"])
+
+
+def test_job_id_ignores_parameter_order():
+    a = {"num_sim": 5, "reanalysis_products": ["era5", "merra2"]}
+    b = {"reanalysis_products": ["merra2", "era5"], "num_sim": 5}
+    assert job_id("P", None, a) == job_id("P", None, b)
+    assert job_id("P", None, a) != job_id("Q", None, a)
+
+
+def test_manifest_rejects_unknown_keys_and_missing_data(tmp_path):
+    path = write_manifest(tmp_path, {
+        "defaults": {"num_sims": 5},
+        "plants": [{"data_path": "x"}, {"name": "P", "data_path": "missing", "parameter_sets": [{"seed": 1}]}],
+    })
+    with pytest.raises(ValueError) as e:
+        load_manifest(path)
+    for problem in ("defaults.num_sims", "plants[0].name is required", "plants[1].data_path",
+                    "plants[1].parameter_sets[0].seed"):
+        assert problem in str(e.value)
+
+
+def test_checkpoint_keeps_latest_record_and_skips_torn_lines(tmp_path):
+    out = str(tmp_path)
+    append_checkpoint(out, {"id": "a", "status": "failed", "error": "boom"})
+    append_checkpoint(out, {"id": "b", "status": "ok"})
+    append_checkpoint(out, {"id": "a", "status": "ok"})
+    with open(os.path.join(out, "checkpoint.jsonl"), "a") as f:
+        f.write('{"id": "c", "sta')  # Interrupted mid-write
+    records = read_checkpoint(out)
+    assert sorted(records) == ["a", "b"]
+    assert records["a"]["status"] == "ok"
+
+
+def test_resume_skips_finished_jobs_without_starting_workers(tmp_path, monkeypatch):
+    path = write_manifest(tmp_path, {"plants": [{"name": "A"}, {"name": "B"}]})
+    out = str(tmp_path / "out")
+    os.makedirs(out)
+    a, b = load_manifest(path)
+    write_json(result_path(out, a), {"aep_gwh": 12.0})
+    append_checkpoint(out, {"id": a["id"], "plant": "A", "status": "ok", "aep_gwh": 12.0})
+    append_checkpoint(out, {"id": b["id"], "plant": "B", "status": "failed", "error": "MemoryError"})
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("nothing left to run, no pool should start")
+
+    monkeypatch.setattr(batch_runner, "WorkerPool", no_pool)
+    index = run_batch(path, out)
+    assert index["counts"] == {"ok": 1, "failed": 1}
+    assert [job["result"] for job in index["jobs"]] == [os.path.relpath(result_path(out, a), out), None]
+    assert json.loads((tmp_path / "out" / "index.json").read_text())["counts"] == index["counts"]
+
+    # A job checkpointed as ok whose output file is gone is not done
+    os.remove(result_path(out, a))
+    with pytest.raises(AssertionError, match="no pool should start"):
+        run_batch(path, out)
@@ -0,0 +1,91 @@
+"""Vectorized block bootstrap against a plain per-replicate loop, and the monthly band rules."""
+
+import numpy as np
+import pytest
+
+from aggregate_cube import N_WS_BINS, WS_BIN_WIDTH
+from bootstrap import (
+    DailyAggregates,
+    add_monthly_bands,
+    block_bootstrap_weights,
+    monthly_energy_bands,
+    power_curve_bands,
+)
+
+
+def naive_block_indices(n, block_len, replicates, rng):
+    """Day indices drawn per replicate, one block at a time (same draws as block_bootstrap_weights)."""
+    block_len = max(1, min(block_len, n))
+    n_blocks = -(-n // block_len)
+    starts = rng.integers(0, n - block_len + 1, size=(replicates, n_blocks))
+    out = []
+    for r in range(replicates):
+        idx = []
+        for start in starts[r]:
+            idx.extend(range(start, start + block_len))
+        out.append(np.array(idx[:n]))
+    return out
+
+
+@pytest.mark.parametrize("n, block_len", [(30, 7), (10, 1), (5, 9)])
+def test_weights_match_naive_resampling(n, block_len):
+    weights = block_bootstrap_weights(n, block_len, 50, np.random.default_rng(3))
+    expected = [np.bincount(idx, minlength=n) for idx in naive_block_indices(n, block_len, 50, np.random.default_rng(3))]
+    np.testing.assert_array_equal(weights, np.array(expected, dtype=np.float64))
+    assert (weights.sum(axis=1) == n).all()
+
+
+def random_daily(n_days=60, seed=1):
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(0, 20, size=(n_days, N_WS_BINS)).astype(np.float64)
+    counts[:, 30:] = 0  # Bins nobody reaches
+    return DailyAggregates(
+        days=np.datetime64("2015-01-01") + np.arange(n_days),
+        power_sums=counts * rng.uniform(0, 2000, size=(n_days, N_WS_BINS)),
+        power_counts=counts,
+        energy=rng.uniform(0, 1e5, size=n_days),
+    )
+
+
+def test_power_curve_bands_match_loop():
+    daily = random_daily()
+    replicates, block_days, confidence = 40, 7, 0.9
+    bands = power_curve_bands(daily, replicates=replicates, block_days=block_days, confidence=confidence, seed=5)
+
+    observed = np.flatnonzero(daily.power_counts.sum(axis=0) > 0)
+    means = []
+    for idx in naive_block_indices(len(daily.days), block_days, replicates, np.random.default_rng(5)):
+        sums = daily.power_sums[idx][:, observed].sum(axis=0)
+        counts = daily.power_counts[idx][:, observed].sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means.append(np.where(counts > 0, sums / counts, np.nan))
+    low, high = np.nanpercentile(np.array(means), [5, 95], axis=0)
+
+    assert sorted(bands) == [round(float(b * WS_BIN_WIDTH), 1) for b in observed]
+    for b, lo, hi in zip(observed, low, high):
+        assert bands[round(float(b * WS_BIN_WIDTH), 1)] == pytest.approx((lo, hi))
+
+
+def test_monthly_blocks_stay_within_one_year():
+    # Two Januaries with constant but different daily energy: every replicate draws exactly
+    # 31 days of each year, so the band collapses to the observed total unless blocks wrap
+    days = np.concatenate([np.datetime64("2014-01-01") + np.arange(31), np.datetime64("2015-01-01") + np.arange(31)])
+    energy = np.concatenate([np.full(31, 1.0), np.full(31, 100.0)])
+    daily = DailyAggregates(days=days, power_sums=np.zeros((62, N_WS_BINS)),
+                            power_counts=np.zeros((62, N_WS_BINS)), energy=energy)
+    bands = monthly_energy_bands(daily, replicates=200, block_days=7)
+    assert list(bands.index) == [1]
+    assert bands.loc[1].tolist() == pytest.approx([3131.0, 3131.0, 3131.0])
+
+
+def test_monthly_bands_surround_actual():
+    daily = random_daily(n_days=59)  # January and February 2015
+    rows = [
+        {"month": "Jan", "actual_gwh": round(daily.energy[:31].sum() / 1e6, 3)},
+        {"month": "Feb", "actual_gwh": round(daily.energy[31:].sum() / 1e6, 3)},
+        {"month": "Mar", "actual_gwh": 0.0},
+    ]
+    add_monthly_bands(rows, daily, "energy_kwh", replicates=200)
+    for row in rows[:2]:
+        assert row["actual_low_gwh"] <= row["actual_gwh"] <= row["actual_high_gwh"]
+    assert "actual_low_gwh" not in rows[2]  # No days in March
@@ -0,0 +1,50 @@
+"""Multi-analysis scheduling and the plant its workers rebuild."""
+
+import numpy as np
+import pandas as pd
+
+import multi_analysis
+from analysis_plant import scada_frame
+from scada_store import build_store
+
+
+def test_worker_count_is_capped_by_memory():
+    assert multi_analysis.max_workers_for_memory(0, 700) is None
+    assert multi_analysis.max_workers_for_memory(2000, 700) == 2
+    assert multi_analysis.max_workers_for_memory(500, 700) == 1
+
+
+def test_threads_share_one_plant_and_derive_eya_gap_dependencies(monkeypatch):
+    loads, seen = [], []
+
+    def load_plant():
+        loads.append(1)
+        return object()
+
+    fake = {name: (lambda plant, num_sim, name=name: seen.append((name, plant)) or {"n": num_sim})
+            for name in multi_analysis.ANALYSES}
+    monkeypatch.setattr(multi_analysis, "ANALYSES", fake)
+    monkeypatch.setattr(multi_analysis, "_can_start_processes", lambda: False)
+    monkeypatch.setattr(multi_analysis, "run_eya_gap", lambda report, estimates: {"ok": True})
+
+    report = multi_analysis.run_report(load_plant, ["eya_gap"], num_sim=3, max_workers=2)
+    assert loads == [1]
+    assert sorted(name for name, _ in seen) == ["aep", "electrical_losses", "tie"]
+    assert len({id(plant) for _, plant in seen}) == 1
+    assert list(report["analyses"]) == ["aep", "tie", "electrical_losses", "eya_gap"]
+    assert report["analyses"]["eya_gap"]["status"] == "success" and report["executor"] == "threads"
+
+
+def test_scada_frame_is_time_major_with_every_store_column():
+    times = pd.date_range("2020-01-01", periods=4, freq="10min")
+    scada = pd.DataFrame({
+        "Date_time": np.tile(times, 2),
+        "Wind_turbine_name": np.repeat(["T2", "T1"], 4),
+        "WTUR_W": np.arange(8, dtype=float),
+        "WMET_HorWdSpd": np.arange(8, dtype=float) / 2,
+    })
+    frame = scada_frame(build_store(scada))
+    assert frame["time"].is_monotonic_increasing
+    assert frame[["time", "asset_id"]].head(2).values.tolist() == [[times[0], "T1"], [times[0], "T2"]]
+    merged = frame.merge(scada, left_on=["time", "asset_id"], right_on=["Date_time", "Wind_turbine_name"])
+    assert len(merged) == 8 and (merged["WTUR_W_x"] == merged["WTUR_W_y"]).all()
@@ -0,0 +1,107 @@
+"""Per-turbine binned power curves, the fleet reference and underperformance scoring."""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from starlette.requests import Request
+
+from aggregate_cube import N_WS_BINS, WS_BIN_WIDTH, build_cube_from_arrays, wind_speed_bins
+from power_curves import fit_power_curves
+from scada_store import build_store
+
+# Output of each turbine relative to the healthy curve; T4 is derated
+HEALTH = {"T1": 1.0, "T2": 1.01, "T3": 0.99, "T4": 0.85}
+
+
+def scada(n_per_turbine=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range("2020-01-01", periods=n_per_turbine, freq="h")
+    frames = []
+    for turbine, health in HEALTH.items():
+        ws = rng.uniform(0, 16, n_per_turbine)
+        power = health * 2000 / (1 + np.exp(-(ws - 8))) + rng.normal(0, 20, n_per_turbine)
+        frames.append(pd.DataFrame({"Date_time": times, "Wind_turbine_name": turbine,
+                                    "ws": ws, "power": power}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def cube_of(df):
+    return build_cube_from_arrays(df["Wind_turbine_name"], df["Date_time"], df["ws"],
+                                  {"power": df["power"], "energy": df["power"]})
+
+
+def naive_curves(df, min_samples):
+    """One turbine and one bin at a time."""
+    bins = wind_speed_bins(df["ws"].to_numpy())
+    power = {}
+    for turbine in sorted(HEALTH):
+        row = np.full(N_WS_BINS, np.nan)
+        for b in range(N_WS_BINS):
+            values = df["power"].to_numpy()[(df["Wind_turbine_name"] == turbine).to_numpy() & (bins == b)]
+            if len(values) >= min_samples:
+                row[b] = values.mean()
+        power[turbine] = row
+    return power
+
+
+@pytest.mark.filterwarnings("ignore:All-NaN slice")
+def test_fit_matches_per_turbine_loop():
+    df = scada(n_per_turbine=400)
+    fleet = fit_power_curves(cube_of(df), min_samples=10)
+    expected = naive_curves(df, min_samples=10)
+    assert fleet.turbines.tolist() == sorted(HEALTH)
+    for t, turbine in enumerate(fleet.turbines):
+        np.testing.assert_allclose(fleet.power[t], expected[turbine], equal_nan=True)
+    assert np.isnan(fleet.power).any()  # Sparse bins left out
+    np.testing.assert_allclose(fleet.reference, np.nanmedian(np.vstack(list(expected.values())), axis=0),
+                               equal_nan=True)
+    np.testing.assert_allclose(fleet.wind_speed, np.arange(N_WS_BINS) * WS_BIN_WIDTH)
+
+
+def test_derated_turbine_is_flagged_and_does_not_move_the_reference():
+    df = scada()
+    fleet = fit_power_curves(cube_of(df), threshold_pct=3.0)
+    scores = fleet.score_by_turbine()
+    assert fleet.scores()[0]["turbine_id"] == "T4"
+    assert scores["T4"]["underperforming"] and scores["T4"]["deviation_pct"] == pytest.approx(-15, abs=1.5)
+    assert not any(scores[t]["underperforming"] for t in ("T1", "T2", "T3"))
+
+    healthy = fit_power_curves(cube_of(df[df["Wind_turbine_name"] != "T4"]))
+    rated = fleet.wind_speed >= 14
+    np.testing.assert_allclose(fleet.reference[rated], healthy.reference[rated], rtol=0.02)
+
+
+def test_turbine_and_month_selection():
+    df = scada()
+    cube = cube_of(df)
+    subset = fit_power_curves(cube, ["T1", "T4"], start="2020-02-01", end="2020-02-29")
+    assert subset.turbines.tolist() == ["T1", "T4"]
+    february = df["Date_time"].dt.month.eq(2) & df["Wind_turbine_name"].isin(["T1", "T4"])
+    assert subset.counts.sum() == february.sum()
+
+
+def test_power_curve_endpoint_uses_whole_fleet_reference_for_partial_months(monkeypatch):
+    import main
+
+    df = scada()
+    store = build_store(df, fingerprint="test")
+    cube = store.cube()
+    cube.fingerprint = "test"
+    monkeypatch.setattr(main, "get_query_data", lambda: (cube, store))
+    request = Request({"type": "http", "method": "GET", "path": "/power-curve", "query_string": b"",
+                       "headers": []})
+    start, end = pd.Timestamp("2020-01-10").date(), pd.Timestamp("2020-03-20").date()
+
+    body = json.loads(main.get_power_curve(request, ["T4"], start, end).body)
+    assert body["source"] == "scada"
+    window = df[(df["Date_time"] >= "2020-01-10") & (df["Date_time"] < "2020-03-21")]
+    fleet = fit_power_curves(cube_of(window))
+    for point in body["power_curve"]:
+        b = int(round(point["wind_speed"] / WS_BIN_WIDTH))
+        if np.isfinite(fleet.reference[b]):
+            # The fleet median, not T4's own derated curve
+            assert point["ideal_power"] == pytest.approx(fleet.reference[b], abs=0.1)
+    top = body["power_curve"][-1]
+    assert top["ideal_power"] > 1.1 * top["actual_power"]
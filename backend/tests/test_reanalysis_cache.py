@@ -0,0 +1,104 @@
+"""Cached reanalysis aggregates against MonteCarloAEP's own processing."""
+
+import gc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import reanalysis_cache
+from reanalysis_cache import CachedReanalysisMixin, ReanalysisCache, aggregate_product
+
+pytest.importorskip("openoa")
+from openoa.analysis import MonteCarloAEP  # noqa: E402
+
+VARS = ["WMETR_EnvTmp", "WMETR_HorWdSpdU", "WMETR_HorWdSpdV"]
+
+
+def product(start, end, seed):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, end, freq="h", name="time")
+    return pd.DataFrame({
+        "WMETR_HorWdSpd": rng.gamma(2.0, 3.5, len(index)),
+        "WMETR_AirDen": rng.normal(1.225, 0.03, len(index)),
+        "WMETR_EnvTmp": rng.normal(285, 8, len(index)),
+        "WMETR_HorWdSpdU": rng.normal(0, 5, len(index)),
+        "WMETR_HorWdSpdV": rng.normal(0, 5, len(index)),
+    }, index=index)
+
+
+PRODUCTS = {
+    "era5": product("2015-01-14 05:30", "2018-06-10 12:00", 0),
+    "merra2": product("2015-01-01 00:00", "2018-07-31 23:00", 1),
+}
+
+
+class Analysis:
+    """Just the attributes process_reanalysis_data reads."""
+
+    def __init__(self, time_resolution, end_date_lt=None, regress=True):
+        self.plant = type("Plant", (), {"reanalysis": {k: df.copy() for k, df in PRODUCTS.items()}})()
+        self.reanalysis_products = list(PRODUCTS)
+        self.time_resolution = self.resample_freq = time_resolution
+        self.end_date_lt = pd.Timestamp(end_date_lt) if end_date_lt else None
+        self.uncertainty_windiness = (1, 2)
+        self.reg_wind_direction = self.reg_temperature = regress
+        self.reanalysis_vars = VARS if regress else []
+        self.aggregate = pd.DataFrame(index=pd.date_range("2014-01-01", "2019-01-01", freq=time_resolution))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ReanalysisCache(str(tmp_path))
+    monkeypatch.setattr(reanalysis_cache, "REANALYSIS_CACHE", cache)
+    return cache
+
+
+@pytest.mark.parametrize("time_resolution,end_date_lt,regress", [
+    ("MS", None, True),
+    ("MS", "2018-03-15", False),
+    ("MS", "2018-05-31 23:00", True),
+    ("D", None, False),
+    ("D", "2018-04-02 10:00", True),
+])
+def test_same_aggregate_and_date_range_as_openoa(cache, time_resolution, end_date_lt, regress):
+    expected, cached = Analysis(time_resolution, end_date_lt, regress), Analysis(time_resolution, end_date_lt, regress)
+    MonteCarloAEP.process_reanalysis_data(expected)
+    CachedReanalysisMixin.process_reanalysis_data(cached)
+
+    assert cached.end_date_lt == expected.end_date_lt
+    pd.testing.assert_index_equal(cached._reanalysis_aggregate.index, expected._reanalysis_aggregate.index)
+    columns = list(expected._reanalysis_aggregate.columns)
+    assert sorted(cached._reanalysis_aggregate.columns) == sorted(columns)
+    pd.testing.assert_frame_equal(cached.aggregate[columns], expected.aggregate[columns], check_freq=False)
+
+
+@pytest.mark.parametrize("end_date_lt", ["2018-08-15", "2015-06-30"])
+def test_invalid_end_date_raises_like_openoa(cache, end_date_lt):
+    with pytest.raises(ValueError) as expected:
+        MonteCarloAEP.process_reanalysis_data(Analysis("MS", end_date_lt))
+    with pytest.raises(ValueError) as cached:
+        CachedReanalysisMixin.process_reanalysis_data(Analysis("MS", end_date_lt))
+    assert str(cached.value) == str(expected.value)
+
+
+def test_aggregates_persist_across_caches(tmp_path):
+    df = PRODUCTS["era5"]
+    first = ReanalysisCache(str(tmp_path))
+    built = first.get("era5", df, "MS")
+    second = ReanalysisCache(str(tmp_path))
+    loaded = second.get("era5", df.copy(), "MS")
+    assert (first.misses, second.disk_hits, second.misses) == (1, 1, 0)
+    pd.testing.assert_frame_equal(loaded, built)
+    pd.testing.assert_frame_equal(loaded, aggregate_product(df, "MS"))
+    assert second.get("era5", df.copy(), "MS") is loaded  # Content-keyed, not per frame object
+
+
+def test_fingerprints_do_not_keep_frames_alive(tmp_path):
+    cache = ReanalysisCache(str(tmp_path))
+    df = PRODUCTS["era5"].copy()
+    fp = cache.fingerprint(df)
+    assert cache.fingerprint(df) == fp and cache.stats()["fingerprinted_frames"] == 1
+    del df
+    gc.collect()
+    assert cache.stats()["fingerprinted_frames"] == 0
@@ -0,0 +1,64 @@
+"""Run history: equivalence keys, field coverage and reuse lookups."""
+
+import time
+
+import pytest
+
+from run_store import RunStore, _covers, params_key
+
+CHARTS = ("power_curve", "monthly_production", "aep_distribution", "turbine_comparison", "summary")
+ALIASES = {"chart_data": CHARTS}
+PARAMS = {"num_sim": 5, "reg_model": "lin", "time_resolution": "MS", "reanalysis_products": ["era5", "merra2"]}
+
+
+def test_params_key_ignores_key_and_product_order():
+    reordered = {"reanalysis_products": ["merra2", "era5"], "time_resolution": "MS", "reg_model": "lin", "num_sim": 5}
+    assert params_key(reordered) == params_key(PARAMS)
+    assert params_key({**PARAMS, "num_sim": 6}) != params_key(PARAMS)
+
+
+@pytest.mark.parametrize("stored, requested, covered", [
+    (None, None, True),  # Full run covers everything
+    (None, ["aep_gwh"], True),
+    (["aep_gwh", "uncertainty"], None, False),  # Partial run never covers a full request
+    (["aep_gwh", "uncertainty"], ["aep_gwh"], True),
+    (["aep_gwh"], ["aep_gwh", "uncertainty"], False),
+])
+def test_covers(stored, requested, covered):
+    assert _covers(stored, requested) is covered
+
+
+def test_covers_expands_chart_data_shorthand():
+    assert _covers(["chart_data"], ["power_curve"], ALIASES)
+    assert _covers(list(CHARTS), ["chart_data"], ALIASES)
+    assert not _covers(["power_curve"], ["chart_data"], ALIASES)
+    assert not _covers(["chart_data"], ["power_curve"])  # Without aliases the names differ
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RunStore(str(tmp_path / "runs.sqlite3"))
+
+
+def record(store, fields=None, mode="REAL_DATA", params=PARAMS):
+    response = {"status": "success", "mode": mode, "aep_gwh": 12.3, "uncertainty": "4.5%"}
+    return store.record("La Haute Borne", "fp1", params, response, aep_samples=[12.0, 12.6], fields=fields)
+
+
+def test_find_equivalent(store):
+    run_id = record(store, fields=["chart_data", "aep_gwh"])
+    found = store.find_equivalent("La Haute Borne", "fp1", PARAMS, ["aep_gwh", "summary"], aliases=ALIASES)
+    assert found["id"] == run_id
+    assert store.find_equivalent("La Haute Borne", "fp1", PARAMS, ["plot_image"], aliases=ALIASES) is None
+    assert store.find_equivalent("La Haute Borne", "fp2", PARAMS) is None  # Other data
+    assert store.find_equivalent("La Haute Borne", "fp1", {**PARAMS, "num_sim": 50}) is None
+
+
+def test_find_equivalent_skips_fallbacks_and_old_runs(store):
+    record(store, mode="SIMULATION_FALLBACK")
+    assert store.find_equivalent("La Haute Borne", "fp1", PARAMS) is None
+    run_id = record(store)
+    with store._conn() as conn:
+        conn.execute("UPDATE runs SET created_at = ? WHERE id = ?", (time.time() - 7200, run_id))
+    assert store.find_equivalent("La Haute Borne", "fp1", PARAMS, max_age_s=3600) is None
+    assert store.find_equivalent("La Haute Borne", "fp1", PARAMS)["id"] == run_id
@@ -0,0 +1,63 @@
+"""Coalescing of concurrent identical calls."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def work(x):
+        calls.append(x)
+        release.wait(5)
+        return {"value": x * 2}
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flight.do, "k", work, 21) for _ in range(8)]
+        wait_for(lambda: flight.stats()["coalesced"] == 7)
+        release.set()
+        results = [f.result(5) for f in futures]
+
+    assert calls == [21]
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert all(result is results[0][0] for result, _ in results)  # The same object
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 7}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    assert flight.do("a", lambda: 3) == (3, False)  # Not cached once finished
+    assert flight.stats()["executions"] == 3
+
+
+def test_leader_exception_reaches_every_waiter_and_clears_the_key():
+    flight, release = SingleFlight(), threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "k", fail) for _ in range(4)]
+        wait_for(lambda: flight.stats()["coalesced"] == 3)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="boom"):
+                future.result(5)
+
+    assert flight.stats()["in_flight"] == 0
+    assert flight.do("k", lambda: "ok") == ("ok", False)
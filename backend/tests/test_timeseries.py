@@ -0,0 +1,54 @@
+"""LTTB downsampling and the store rows the time-series export selects."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from timeseries import lttb, select_rows
+
+
+@pytest.mark.parametrize("n,n_out", [(10, 3), (10, 9), (1000, 50), (1001, 1000), (5000, 137)])
+def test_lttb_returns_n_out_increasing_indices_with_both_ends(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.arange(n, dtype=float)
+    idx = lttb(x, rng.normal(size=n), n_out)
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert (np.diff(idx) > 0).all()
+
+
+@pytest.mark.parametrize("n_out", [100, 101, 500])
+def test_lttb_keeps_everything_when_not_reducing(n_out):
+    np.testing.assert_array_equal(lttb(np.arange(100.0), np.zeros(100), n_out), np.arange(100))
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(1000)
+    y[417] = 50.0
+    assert 417 in lttb(np.arange(1000.0), y, 20)
+
+
+def store_of(values):
+    time = pd.date_range("2020-01-01", periods=len(values), freq="10min").values
+    return SimpleNamespace(time=time, column=lambda name: np.asarray(values, dtype=float))
+
+
+def test_select_rows_drops_nan_gaps_before_downsampling():
+    values = np.sin(np.arange(400) / 10)
+    values[50:120] = np.nan
+    values[300] = np.nan
+    rows = slice(10, 390)
+    idx = select_rows(store_of(values), rows, 40, "power")
+    assert len(idx) == 40
+    assert idx[0] == 10 and idx[-1] == 389
+    assert not np.isnan(values[idx]).any()
+    assert (np.diff(idx) > 0).all()
+
+
+def test_select_rows_returns_the_whole_slice_without_downsampling():
+    values = np.full(50, np.nan)  # Not even looked at
+    store = store_of(values)
+    np.testing.assert_array_equal(select_rows(store, slice(5, 45), None, "power"), np.arange(5, 45))
+    np.testing.assert_array_equal(select_rows(store, slice(5, 45), 40, "power"), np.arange(5, 45))
@@ -0,0 +1,106 @@
+"""Worker pool recycling, crash, timeout and memory-limit paths, with trivial jobs."""
+
+import os
+import time
+
+import pytest
+
+from worker_pool import JobMemoryExceeded, WorkerCrashed, WorkerPool
+
+JOBS = "test_worker_pool"  # Jobs below, resolved inside the workers as "module:function"
+
+
+def pid():
+    return os.getpid()
+
+
+def fail():
+    raise ValueError("bad input")
+
+
+def crash():
+    os._exit(3)
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+def allocate(mb, hold_s=0.0):
+    block = b"\x01" * (int(mb) << 20)  # Written, so resident
+    time.sleep(hold_s)
+    return len(block)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        pool = WorkerPool(**kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_workers_are_recycled_after_max_jobs(make_pool):
+    pool = make_pool(size=1, max_jobs=2)
+    first = pool.run(f"{JOBS}:pid")
+    assert pool.run(f"{JOBS}:pid") == first
+    third = pool.run(f"{JOBS}:pid")
+    assert third != first
+    assert pool.stats()["recycled"] == {"max_jobs": 1}
+
+
+def test_job_errors_are_raised_and_keep_the_worker(make_pool):
+    pool = make_pool(size=1)
+    before = pool.run(f"{JOBS}:pid")
+    with pytest.raises(ValueError, match="bad input"):
+        pool.run(f"{JOBS}:fail")
+    assert pool.run(f"{JOBS}:pid") == before
+    assert pool.stats()["failed"] == 1
+
+
+def test_crashed_worker_is_replaced(make_pool):
+    pool = make_pool(size=1)
+    before = pool.run(f"{JOBS}:pid")
+    with pytest.raises(WorkerCrashed, match="exited with code 3"):
+        pool.run(f"{JOBS}:crash")
+    assert pool.run(f"{JOBS}:pid") != before
+    stats = pool.stats()
+    assert (stats["crashed"], stats["recycled"], stats["idle"], stats["busy"]) == (1, {"crashed": 1}, 1, 0)
+
+
+def test_timed_out_job_kills_and_replaces_the_worker(make_pool):
+    pool = make_pool(size=1)
+    before = pool.run(f"{JOBS}:pid")
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.run(f"{JOBS}:sleep", 30, timeout=0.5)
+    assert time.monotonic() - started < 10
+    assert pool.run(f"{JOBS}:pid") != before
+    stats = pool.stats()
+    # Counted as a timeout only, with exactly one replacement worker
+    assert (stats["timed_out"], stats["crashed"], stats["recycled"], stats["idle"]) == (1, 0, {"timeout": 1}, 1)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc for the job RSS poll")
+def test_job_over_the_rss_limit_is_killed(make_pool):
+    pool = make_pool(size=1, max_job_rss_mb=150)
+    with pytest.raises(JobMemoryExceeded):
+        pool.run(f"{JOBS}:allocate", 400, 30, timeout=60)
+    assert pool.run(f"{JOBS}:allocate", 10) == 10 << 20  # A fresh worker serves the next job
+    assert pool.stats()["memory_killed"] == 1
+
+
+@pytest.mark.skipif(os.name != "posix", reason="RLIMIT_AS is POSIX only")
+def test_allocation_past_rlimit_as_raises_memory_error_and_recycles(make_pool):
+    pool = make_pool(size=1, max_job_vm_mb=1024)
+    before = pool.run(f"{JOBS}:pid")
+    with pytest.raises(MemoryError):
+        pool.run(f"{JOBS}:allocate", 2048)
+    assert pool.run(f"{JOBS}:pid") != before
+    assert pool.stats()["recycled"] == {"memory_error": 1}
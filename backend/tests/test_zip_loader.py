@@ -0,0 +1,53 @@
+"""prepare_from_zip against a stand-in for project_ENGIE."""
+
+import importlib.util
+import sys
+import zipfile
+
+import pandas as pd
+
+from zip_loader import prepare_from_zip
+
+# Same shape as project_ENGIE: inputs come through the module globals `pd` and `extract_data`.
+# prepare also reports what the shared (sys.modules) copy of the loader looks like mid-call.
+LOADER = '''
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+
+def extract_data(path=None):
+    raise AssertionError("extraction must be skipped")
+
+
+def prepare(path, return_value="plantdata", use_cleansed=False):
+    shared = sys.modules["fake_engie"]
+    frame = pd.read_csv(Path(path) / "plant_data.csv")
+    return frame, shared.pd, shared.extract_data
+'''
+
+
+def load_fake_engie(tmp_path, monkeypatch):
+    source = tmp_path / "fake_engie.py"
+    source.write_text(LOADER)
+    spec = importlib.util.spec_from_file_location("fake_engie", source)
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, "fake_engie", module)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_prepare_reads_the_zip_without_touching_the_shared_loader(tmp_path, monkeypatch):
+    fake = load_fake_engie(tmp_path, monkeypatch)
+    original_extract = fake.extract_data
+    zip_path = tmp_path / "plant.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("plant/plant_data.csv", "time_utc,energy_kwh\n2014-01-01,1.5\n2014-01-02,2.5\n")
+
+    frame, shared_pd, shared_extract = prepare_from_zip(fake, str(zip_path))
+
+    assert frame["energy_kwh"].tolist() == [1.5, 2.5]
+    # Other prepare() callers keep reading from disk while the zip is prepared
+    assert shared_pd is pd and shared_extract is original_extract
+    assert fake.pd is pd and fake.extract_data is original_extract
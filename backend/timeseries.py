@@ -0,0 +1,122 @@
+"""
+timeseries.py — Streaming export of raw 10-minute SCADA from the SCADA store.
+
+Rows are streamed per turbine in fixed-size chunks (NDJSON lines or Arrow IPC
+record batches), so a request never materializes more than one chunk as a
+DataFrame. An optional target point count applies Largest-Triangle-Three-
+Buckets (LTTB) downsampling server-side before streaming.
+"""
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 10_000
+
+try:
+    import pyarrow as pa
+    HAS_ARROW = True
+except ImportError:
+    pa = None
+    HAS_ARROW = False
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices (into `x`/`y`) of the `n_out` points that best keep the
+    visual shape of the series. First and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket boundaries for the n - 2 interior points, split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average point of the next bucket (or the last point for the final bucket)
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        # Triangle areas (×2) between the selected point a, each candidate, and the average
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def select_rows(store, rows: slice, points: int | None, y_column: str) -> np.ndarray:
+    """Row indices of a store slice to export, LTTB-downsampled on `y_column` if requested."""
+    idx = np.arange(rows.start, rows.stop)
+    if not points or len(idx) <= points:
+        return idx
+    y = store.column(y_column)[rows]
+    keep = ~np.isnan(y)  # LTTB needs finite values; gaps are dropped
+    idx, y = idx[keep], y[keep]
+    x = store.time[idx].astype(np.int64).astype(np.float64)
+    return idx[lttb(x, y, points)]
+
+
+def _chunk_frame(store, turbine: str, idx: np.ndarray, columns: list) -> pd.DataFrame:
+    frame = pd.DataFrame({"turbine_id": turbine, "time": store.time[idx]})
+    for c in columns:
+        frame[c] = store.column(c)[idx]
+    return frame
+
+
+def _iter_chunks(store, parts, columns, points, y_column):
+    for turbine, rows in parts:
+        idx = select_rows(store, rows, points, y_column)
+        for i in range(0, len(idx), CHUNK_ROWS):
+            yield _chunk_frame(store, turbine, idx[i:i + CHUNK_ROWS], columns)
+
+
+def iter_ndjson(store, parts, columns, points=None, y_column="power"):
+    """Yield NDJSON bytes, one chunk of rows at a time."""
+    for frame in _iter_chunks(store, parts, columns, points, y_column):
+        text = frame.to_json(orient="records", lines=True, date_format="iso")
+        yield (text if text.endswith("\n") else text + "\n").encode()
+
+
+class _DrainableSink:
+    """Minimal writable file object whose buffered bytes are drained after each batch."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_arrow(store, parts, columns, points=None, y_column="power"):
+    """Yield an Arrow IPC stream: schema first, then one record batch per chunk."""
+    schema = pa.schema(
+        [("turbine_id", pa.string()), ("time", pa.timestamp("ns"))]
+        + [(c, pa.float64()) for c in columns]
+    )
+    sink = _DrainableSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for frame in _iter_chunks(store, parts, columns, points, y_column):
+            writer.write_batch(pa.RecordBatch.from_pandas(frame, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,273 @@
+"""
+worker_pool.py — Persistent pool of pre-started analysis worker processes.
+
+Each worker imports the heavy stack (openoa, statsmodels, pygam, sklearn) and
+attaches the prepared data once, in its `initializer`, then serves jobs sent
+over a local pipe. A worker exits after `max_jobs` jobs or once its peak RSS
+(the kernel's high-water mark) passes `max_rss_mb`, and the pool starts a
+fresh one in its place, so leaks and fragmentation from long MonteCarloAEP
+runs never accumulate. With `max_job_rss_mb` the parent also polls a busy
+worker's current RSS (every 0.5 s) and kills it mid-job once it passes the
+limit, so one oversized job cannot take the host down; a job allocating faster
+than that can overshoot between polls. `max_job_vm_mb` adds a hard in-kernel
+cap: the worker sets RLIMIT_AS after its initializer, so an allocation past it
+fails at once with MemoryError (the job fails and the worker is recycled). It
+bounds address space, not RSS, so leave headroom for thread arenas, BLAS
+buffers and memory-mapped data. Jobs and initializers are "module:function"
+strings so they resolve inside the worker without pickling code.
+"""
+
+import importlib
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+import time
+import traceback
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:  # Windows: no getrusage, only the job-count limit applies
+    resource = None
+    HAS_RESOURCE = False
+
+
+class WorkerCrashed(Exception):
+    """The worker process died while running a job (e.g. killed by the OOM killer)."""
+
+
+class JobMemoryExceeded(WorkerCrashed):
+    """The worker was killed because its RSS passed the per-job memory limit."""
+
+
+def resolve(target: str):
+    """Import "module:function" and return the function."""
+    module, _, name = target.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (0 if unknown)."""
+    if not HAS_RESOURCE:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+def process_rss_mb(pid: int) -> float | None:
+    """Current resident set size of process `pid` in MB (None where /proc is unavailable)."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _picklable_error(e: BaseException) -> BaseException:
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+def _limit_address_space(max_vm_mb: float):
+    """Cap this process's address space (RLIMIT_AS) at `max_vm_mb` MB, where supported."""
+    if not (HAS_RESOURCE and hasattr(resource, "RLIMIT_AS")):
+        return
+    limit = int(max_vm_mb * 1024 * 1024)
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError) as e:
+        print(f"⚠️ Worker {os.getpid()} could not set RLIMIT_AS: {e}", flush=True)
+
+
+def _worker_main(conn, initializer, max_jobs, max_rss_mb, max_vm_mb=None):
+    """Worker process loop: initialize once, then run jobs until told to stop or recycled."""
+    if initializer:
+        resolve(initializer)()
+    if max_vm_mb:
+        _limit_address_space(max_vm_mb)
+    jobs = 0
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+        target, args, kwargs = msg
+        jobs += 1
+        try:
+            reply = ["ok", resolve(target)(*args, **kwargs), None]
+        except BaseException as e:
+            reply = ["error", _picklable_error(e), traceback.format_exc()]
+
+        rss = peak_rss_mb()
+        recycle = None
+        if max_jobs and jobs >= max_jobs:
+            recycle = "max_jobs"
+        elif max_rss_mb and rss > max_rss_mb:
+            recycle = "max_rss"
+        elif reply[0] == "error" and isinstance(reply[1], MemoryError):
+            recycle = "memory_error"
+        conn.send((*reply, {"jobs": jobs, "peak_rss_mb": round(rss, 1), "recycle": recycle}))
+        if recycle:
+            break
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, ctx, initializer, max_jobs, max_rss_mb, max_vm_mb=None):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, initializer, max_jobs, max_rss_mb, max_vm_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.started = time.time()
+        self.peak_rss_mb = 0.0
+
+    def stop(self, timeout: float = 5.0):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """Fixed-size pool of long-lived worker processes fed over pipes."""
+
+    def __init__(self, size: int = 1, initializer: str | None = None, max_jobs: int = 50,
+                 max_rss_mb: float | None = None, start_method: str = "spawn",
+                 max_job_rss_mb: float | None = None, max_job_vm_mb: float | None = None):
+        self.size = max(1, size)
+        self.initializer = initializer
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.max_job_rss_mb = max_job_rss_mb
+        self.max_job_vm_mb = max_job_vm_mb
+        self._ctx = multiprocessing.get_context(start_method)
+        self._cond = threading.Condition()
+        self._idle: list[_Worker] = []
+        self._busy = 0
+        self._started = False
+        self.jobs = 0
+        self.failed = 0
+        self.crashed = 0
+        self.timed_out = 0
+        self.memory_killed = 0
+        self.recycled: dict[str, int] = {}
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self.initializer, self.max_jobs, self.max_rss_mb, self.max_job_vm_mb)
+
+    def start(self):
+        """Pre-start every worker; they initialize in parallel in the background."""
+        with self._cond:
+            if self._started:
+                return
+            self._idle = [self._spawn() for _ in range(self.size)]
+            self._started = True
+        print(f"🏭 Started {self.size} analysis worker(s) ({self.initializer or 'no initializer'})", flush=True)
+
+    def shutdown(self):
+        with self._cond:
+            workers, self._idle, self._started = self._idle, [], False
+        for w in workers:
+            w.stop()
+
+    def _replace(self, worker: _Worker, reason: str):
+        """Retire `worker` and start a fresh one (it warms up while waiting for its first job)."""
+        self.recycled[reason] = self.recycled.get(reason, 0) + 1
+        worker.stop(timeout=1.0)
+        return self._spawn()
+
+    def run(self, target: str, *args, timeout: float | None = None, **kwargs):
+        """Run `target(*args, **kwargs)` in a worker and return its result (re-raising its error)."""
+        self.start()
+        with self._cond:
+            while not self._idle:
+                self._cond.wait()
+            worker = self._idle.pop()
+            self._busy += 1
+            self.jobs += 1
+
+        deadline = time.monotonic() + timeout if timeout else None
+        replacement = worker
+        try:
+            worker.conn.send((target, args, kwargs))
+            while not worker.conn.poll(0.5):
+                if not worker.process.is_alive() and not worker.conn.poll(0):
+                    self.crashed += 1
+                    replacement = self._replace(worker, "crashed")
+                    raise WorkerCrashed(f"Analysis worker {worker.process.pid} exited with code {worker.process.exitcode}")
+                if deadline and time.monotonic() > deadline:
+                    self.timed_out += 1
+                    replacement = self._replace(worker, "timeout")
+                    raise TimeoutError(f"Analysis job {target} exceeded {timeout}s")
+                rss = process_rss_mb(worker.process.pid) if self.max_job_rss_mb else None
+                if rss is not None and rss > self.max_job_rss_mb:
+                    self.memory_killed += 1
+                    worker.process.kill()
+                    replacement = self._replace(worker, "job_rss")
+                    raise JobMemoryExceeded(
+                        f"Analysis job {target} exceeded {self.max_job_rss_mb:.0f} MB (worker at {rss:.0f} MB)"
+                    )
+            status, value, tb, info = worker.conn.recv()
+            worker.peak_rss_mb = info["peak_rss_mb"]
+            if info["recycle"]:
+                print(f"♻️ Recycling analysis worker {worker.process.pid} ({info['recycle']}, "
+                      f"{info['jobs']} jobs, peak {info['peak_rss_mb']} MB)", flush=True)
+                replacement = self._replace(worker, info["recycle"])
+        except TimeoutError:
+            raise  # An OSError too, but the worker was already replaced above
+        except (EOFError, OSError) as e:
+            self.crashed += 1
+            replacement = self._replace(worker, "crashed")
+            raise WorkerCrashed(f"Analysis worker {worker.process.pid} exited with code {worker.process.exitcode}") from e
+        finally:
+            with self._cond:
+                self._busy -= 1
+                if self._started:
+                    self._idle.append(replacement)
+                else:
+                    replacement.stop()
+                self._cond.notify()
+
+        if status == "error":
+            self.failed += 1
+            print(f"❌ Worker job {target} failed:\n{tb}", flush=True)
+            raise value
+        return value
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "busy": self._busy,
+                "idle": len(self._idle),
+                "jobs": self.jobs,
+                "failed": self.failed,
+                "crashed": self.crashed,
+                "timed_out": self.timed_out,
+                "memory_killed": self.memory_killed,
+                "recycled": dict(self.recycled),
+                "max_jobs": self.max_jobs,
+                "max_rss_mb": self.max_rss_mb,
+                "max_job_rss_mb": self.max_job_rss_mb,
+                "max_job_vm_mb": self.max_job_vm_mb,
+                "worker_peak_rss_mb": [w.peak_rss_mb for w in self._idle],
+            }
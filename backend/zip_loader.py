@@ -0,0 +1,132 @@
+"""
+zip_loader.py — Load La Haute Borne straight from la_haute_borne.zip.
+
+Member CSVs are decompressed as streams (never written to disk) and parsed in
+parallel, one thread per member, with pyarrow's multi-threaded CSV reader when
+it is installed (pandas' C parser otherwise). `prepare_from_zip` then runs the
+official `project_ENGIE.prepare()` on those frames, so the result is the same
+PlantData as after unzipping. It does so on a private copy of the loader
+module, so concurrent `project_ENGIE.prepare()` calls never see the frames.
+"""
+
+import importlib.util
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    HAS_ARROW = True
+except ImportError:
+    pa = pa_csv = None
+    HAS_ARROW = False
+
+# A timestamp format no value can match: keeps pyarrow from inferring
+# timestamp columns, so date columns stay strings exactly as with pandas.
+_NO_TIMESTAMP_INFERENCE = ["never:%Y"]
+
+
+def csv_members(zip_path: str) -> list[str]:
+    """CSV members of the archive, skipping macOS resource-fork entries."""
+    with zipfile.ZipFile(zip_path) as zf:
+        return [
+            n for n in zf.namelist()
+            if n.lower().endswith(".csv") and not n.startswith("__MACOSX/")
+        ]
+
+
+def _pandas_column_names(names: list[str]) -> list[str]:
+    """Name columns the way pandas' default parser does (Unnamed: i, dedup .1, .2)."""
+    out, seen = [], {}
+    for i, name in enumerate(names):
+        name = name or f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        out.append(name)
+    return out
+
+
+def read_member(zip_path: str, member: str) -> pd.DataFrame:
+    """Parse one CSV member, streaming it out of the archive."""
+    # Each thread opens its own handle: ZipFile objects must not be shared across threads
+    with zipfile.ZipFile(zip_path) as zf, zf.open(member) as f:
+        if not HAS_ARROW:
+            return pd.read_csv(f)
+        table = pa_csv.read_csv(
+            f,
+            convert_options=pa_csv.ConvertOptions(timestamp_parsers=_NO_TIMESTAMP_INFERENCE),
+        )
+    frame = table.to_pandas()
+    frame.columns = _pandas_column_names(list(table.column_names))
+    return frame
+
+
+def read_zip_frames(zip_path: str, members: list[str] | None = None,
+                    max_workers: int | None = None) -> dict[str, pd.DataFrame]:
+    """Parse CSV members in parallel; returns {member basename: DataFrame}."""
+    members = members or csv_members(zip_path)
+    max_workers = max_workers or min(len(members), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = pool.map(lambda m: read_member(zip_path, m), members)
+        return {os.path.basename(m): df for m, df in zip(members, frames)}
+
+
+class _ZipPandas:
+    """
+    Stand-in for the `pd` module inside project_ENGIE: `read_csv` of a member
+    returns the pre-parsed frame, everything else is plain pandas.
+    """
+
+    def __init__(self, zip_path: str, frames: dict[str, pd.DataFrame]):
+        self._zip_path = zip_path
+        self._frames = frames
+        self._members = {os.path.basename(m): m for m in csv_members(zip_path)}
+
+    def read_csv(self, filepath_or_buffer, *args, **kwargs):
+        name = os.path.basename(str(filepath_or_buffer))
+        if name in self._frames and not args and not kwargs:
+            return self._frames.pop(name)  # Each file is read once; drop our reference
+        if name in self._members:
+            # Re-read (or non-default parse options): parse this member with pandas itself
+            with zipfile.ZipFile(self._zip_path) as zf, zf.open(self._members[name]) as f:
+                return pd.read_csv(f, *args, **kwargs)
+        return pd.read_csv(filepath_or_buffer, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(pd, name)
+
+
+def _private_loader(project_engie, frames_pd: _ZipPandas):
+    """
+    Fresh instance of the `project_engie` module whose `pd` is `frames_pd` and
+    whose extraction is a no-op. The caller's module is never modified.
+    """
+    spec = importlib.util.spec_from_file_location(f"{project_engie.__name__}_zip", project_engie.__file__)
+    loader = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(loader)
+    loader.pd = frames_pd
+    loader.extract_data = lambda path=None: None
+    return loader
+
+
+def prepare_from_zip(project_engie, zip_path: str, return_value: str = "plantdata",
+                     max_workers: int | None = None):
+    """
+    Run `project_engie.prepare()` on data read directly from `zip_path`.
+
+    The data path passed to prepare is the zip path without its extension (its
+    parent must hold plant_meta.yml, as for the extracted layout). Nothing is
+    extracted.
+    """
+    data_path = os.path.splitext(zip_path)[0]
+    frames = read_zip_frames(zip_path, max_workers=max_workers)
+
+    # project_ENGIE reads its inputs through module globals: give this call its own copy
+    loader = _private_loader(project_engie, _ZipPandas(zip_path, frames))
+    return loader.prepare(path=data_path, return_value=return_value, use_cleansed=False)
@@ -56,6 +56,12 @@ export function AnalysisDashboard() {
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({ plant_name: "La Haute Borne" }),
             })
+            if (res.status === 429 || res.status === 503) {
+                const retryAfter = res.headers.get("Retry-After")
+                throw new Error(
+                    `The analysis engine is busy. Please retry${retryAfter ? ` in ${retryAfter}s` : " shortly"}.`
+                )
+            }
             if (!res.ok) {
                 throw new Error(`Server returned ${res.status}: ${res.statusText}`)
             }
@@ -157,7 +163,19 @@ export function AnalysisDashboard() {
 
                 {/* Results — Tabbed Chart Views */}
                 {data && !loading && (
-                    <div className="animate-in fade-in-0 slide-in-from-bottom-4 duration-500 px-4 lg:px-6">
+                    <div className="animate-in fade-in-0 slide-in-from-bottom-4 duration-500 space-y-4 px-4 lg:px-6">
+                        {data.reused && (
+                            <div className="rounded-lg border border-sky-200 bg-sky-50 px-4 py-3 text-xs dark:border-sky-800 dark:bg-sky-950/20">
+                                <span className="font-medium text-sky-800 dark:text-sky-300">Stored run: </span>
+                                <span className="text-sky-700 dark:text-sky-400">
+                                    These results are run #{data.run_id} from the run history
+                                    {data.reused_created_at
+                                        ? `, computed ${new Date(data.reused_created_at * 1000).toLocaleString()}`
+                                        : ""}
+                                    , not a fresh Monte Carlo simulation.
+                                </span>
+                            </div>
+                        )}
                         <Tabs defaultValue="overview" className="space-y-4">
                             <TabsList>
                                 <TabsTrigger value="overview">Overview</TabsTrigger>
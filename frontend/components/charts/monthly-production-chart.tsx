@@ -1,6 +1,6 @@
 "use client"
 
-import { Bar, BarChart, CartesianGrid, XAxis, YAxis } from "recharts"
+import { Bar, BarChart, CartesianGrid, ErrorBar, XAxis, YAxis } from "recharts"
 
 import {
     Card,
@@ -25,10 +25,6 @@ interface MonthlyProductionChartProps {
 }
 
 const chartConfig = {
-    expected_gwh: {
-        label: "Expected (GWh)",
-        color: "var(--primary)",
-    },
     actual_gwh: {
         label: "Actual (GWh)",
         color: "var(--color-chart-5)",
@@ -36,12 +32,23 @@ const chartConfig = {
 } satisfies ChartConfig
 
 export function MonthlyProductionChart({ data }: MonthlyProductionChartProps) {
+    // ErrorBar takes the distances below and above the bar, not the band's bounds
+    const rows = data.map((m) => ({
+        ...m,
+        band:
+            m.actual_low_gwh != null && m.actual_high_gwh != null
+                ? [m.actual_gwh - m.actual_low_gwh, m.actual_high_gwh - m.actual_gwh]
+                : undefined,
+    }))
+    const hasBands = rows.some((m) => m.band !== undefined)
+
     return (
         <Card className="@container/card">
             <CardHeader>
                 <CardTitle>Monthly Energy Production</CardTitle>
                 <CardDescription>
-                    Expected vs actual energy output by month (GWh)
+                    Actual energy output by month (GWh)
+                    {hasBands && ", with its bootstrap confidence band"}
                 </CardDescription>
             </CardHeader>
             <CardContent className="px-2 pt-4 sm:px-6 sm:pt-6">
@@ -49,7 +56,7 @@ export function MonthlyProductionChart({ data }: MonthlyProductionChartProps) {
                     config={chartConfig}
                     className="aspect-auto h-[280px] w-full"
                 >
-                    <BarChart data={data}>
+                    <BarChart data={rows}>
                         <CartesianGrid vertical={false} />
                         <XAxis
                             dataKey="month"
@@ -68,16 +75,19 @@ export function MonthlyProductionChart({ data }: MonthlyProductionChartProps) {
                             }
                         />
                         <ChartLegend content={<ChartLegendContent />} />
-                        <Bar
-                            dataKey="expected_gwh"
-                            fill="var(--color-expected_gwh)"
-                            radius={[4, 4, 0, 0]}
-                        />
                         <Bar
                             dataKey="actual_gwh"
                             fill="var(--color-actual_gwh)"
                             radius={[4, 4, 0, 0]}
-                        />
+                        >
+                            {hasBands && (
+                                <ErrorBar
+                                    dataKey="band"
+                                    width={4}
+                                    stroke="var(--foreground)"
+                                />
+                            )}
+                        </Bar>
                     </BarChart>
                 </ChartContainer>
             </CardContent>
@@ -144,7 +144,9 @@ export function SectionCards({ data, isConnected }: SectionCardsProps) {
                     </div>
                     <div className="text-muted-foreground">
                         {data?.mode?.includes("REAL_DATA")
-                            ? "OpenOA real data mode"
+                            ? data.reused
+                                ? `OpenOA real data mode · stored run #${data.run_id}`
+                                : "OpenOA real data mode"
                             : data?.mode === "SIMULATION_FALLBACK"
                                 ? "Simulation fallback mode"
                                 : "FastAPI + Docker"}
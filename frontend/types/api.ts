@@ -4,20 +4,45 @@ export interface HealthResponse {
     library_installed: boolean;
 }
 
-export interface AnalysisRequest {
+export type RegModel = "lin" | "gam" | "gbm" | "etr";
+export type TimeResolution = "MS" | "ME" | "D" | "h";
+export type ReanalysisProduct = "era5" | "merra2";
+
+export interface AnalysisParameters {
+    num_sim: number;
+    reg_model: RegModel;
+    time_resolution: TimeResolution;
+    reanalysis_products: ReanalysisProduct[];
+}
+
+export type ResponseField =
+    | "aep_gwh"
+    | "uncertainty"
+    | "plot_image"
+    | "chart_data"
+    | keyof ChartData;
+
+export interface AnalysisRequest extends Partial<AnalysisParameters> {
     plant_name: string;
+    fields?: ResponseField[];  // omit for the full response
+    reuse?: boolean;  // default false; true: serve an equivalent stored run (RUN_REUSE_MAX_AGE_S)
 }
 
 export interface PowerCurvePoint {
     wind_speed: number;
     actual_power: number;
     ideal_power: number;
+    // Block-bootstrap confidence band of actual_power (analysis responses only)
+    actual_power_low?: number;
+    actual_power_high?: number;
 }
 
 export interface MonthlyProduction {
     month: string;
-    expected_gwh: number;
     actual_gwh: number;
+    // Block-bootstrap confidence band of actual_gwh (analysis responses only)
+    actual_low_gwh?: number;
+    actual_high_gwh?: number;
 }
 
 export interface AEPDistributionBin {
@@ -32,6 +57,8 @@ export interface TurbineComparison {
     capacity_factor: number;
     availability: number;
     annual_energy_mwh: number;
+    power_curve_deviation_pct?: number | null;  // vs. the fleet reference curve
+    underperforming?: boolean;
 }
 
 export interface ChartData {
@@ -46,6 +73,7 @@ export interface ChartData {
         avg_availability: number;
         plant_name: string;
         num_simulations: number;
+        underperforming_turbines?: string[];
     };
 }
 
@@ -56,5 +84,225 @@ export interface AnalysisResponse {
     uncertainty: string;
     plot_image: string;
     chart_data: ChartData;
+    parameters?: AnalysisParameters;
+    run_id?: number | null;  // id in the run history (real runs only)
+    reused?: boolean;
+    reused_created_at?: number;  // Unix time of the stored run served instead of a fresh one
     debug_note?: string;
 }
+
+// Response to a request with `fields`: only the requested fields are present
+export type ProjectedAnalysisResponse = Pick<
+    AnalysisResponse,
+    "status" | "mode" | "parameters" | "run_id" | "reused" | "reused_created_at" | "debug_note"
+> &
+    Partial<Pick<AnalysisResponse, "aep_gwh" | "uncertainty" | "plot_image">> & {
+        chart_data?: Partial<ChartData>;
+    };
+
+// --- Run history (GET /runs, /runs/{id}, /runs/compare) ---
+
+export interface RunTimings {
+    plant_load_s: number;
+    analysis_s: number;
+    total_s: number;
+    peak_memory_mb?: number;
+}
+
+export interface RunSummary {
+    id: number;
+    plant: string;
+    created_at: number;  // Unix seconds
+    data_fingerprint: string;
+    params: AnalysisParameters;
+    fields: ResponseField[] | null;
+    source: "api" | "save_results" | string;
+    mode: string;
+    aep_gwh: number | null;
+    uncertainty: string | null;
+    timings: RunTimings;
+}
+
+export interface RunDetail extends RunSummary {
+    response: ProjectedAnalysisResponse;
+    aep_samples?: number[];
+}
+
+export interface RunComparison {
+    runs: {
+        id: number;
+        created_at: number;
+        data_fingerprint: string;
+        params: AnalysisParameters;
+        timings: RunTimings;
+        aep_gwh: { mean: number; std: number; p10: number; p50: number; p90: number; n: number } | Record<string, never>;
+        aep_delta_gwh: number | null;
+    }[];
+    differing_params: string[];
+}
+
+// --- POST /estimate ---
+
+export type CalibrationBasis = "prior" | "scaled_prior" | "fit";
+
+export interface AnalysisEstimate {
+    parameters: AnalysisParameters;
+    runtime_s: number;
+    peak_memory_mb: number;
+    breakdown_s: { plant_load: number; analysis: number; overhead: number };
+    breakdown_mb: { plant_loaded: number; analysis: number };
+    calibration: {
+        runtime: CalibrationBasis;
+        memory: CalibrationBasis;
+        matching_runs: number;
+        recorded_runs: number;
+    };
+}
+
+// --- Filtered query endpoints (GET /power-curve, /monthly-production, /turbines, /turbine-performance) ---
+
+export type QuerySource = "cube" | "scada";
+
+export interface PowerCurveQueryResponse {
+    turbines: string[];
+    start: string | null;
+    end: string | null;
+    source: QuerySource;
+    power_curve: PowerCurvePoint[];
+}
+
+export interface MonthlyProductionQueryResponse {
+    year: number | null;
+    turbines: string[];
+    start: string | null;
+    end: string | null;
+    source: QuerySource;
+    monthly_production: MonthlyProduction[];
+}
+
+export interface TurbineKPI {
+    turbine_id: string;
+    samples: number;
+    mean_power_kw: number;
+    std_power_kw: number;
+    max_power_kw: number;
+    capacity_factor: number;
+    energy_mwh: number;
+}
+
+export interface TurbineKPIResponse {
+    start: string | null;
+    end: string | null;
+    source: QuerySource;
+    turbines: TurbineKPI[];
+}
+
+export interface ReferenceCurvePoint {
+    wind_speed: number;
+    power: number;
+    turbines: number;  // Turbines with enough samples in this bin
+}
+
+export interface TurbineCurvePoint {
+    wind_speed: number;
+    power: number;
+    power_std: number;
+    samples: number;
+    reference_power: number;
+    deviation_pct: number | null;
+}
+
+export interface TurbinePerformance {
+    turbine_id: string;
+    deviation_pct: number | null;
+    underperforming: boolean;
+    valid_bins: number;
+    samples: number;
+    power_curve?: TurbineCurvePoint[];  // With ?curves=true
+}
+
+export interface TurbinePerformanceResponse {
+    start: string | null;
+    end: string | null;
+    source: QuerySource;
+    min_bin_samples: number;
+    threshold_pct: number;
+    reference_curve: ReferenceCurvePoint[];
+    underperforming: string[];
+    turbines: TurbinePerformance[];  // Worst first
+}
+
+// --- Multi-analysis report (POST /analyze/multi) ---
+
+export type AnalysisName = "aep" | "tie" | "electrical_losses" | "wake_losses" | "eya_gap";
+
+export interface MultiAnalysisRequest {
+    plant_name?: string;
+    analyses?: AnalysisName[];
+    num_sim?: number;
+    eya_estimates?: Record<string, number>;
+}
+
+export interface AnalysisRunResult {
+    status: "success" | "error" | "skipped";
+    duration_s: number;
+    pid?: number;
+    results?: Record<string, unknown>;
+    error?: string;
+}
+
+export interface MultiAnalysisResponse {
+    status: "success";
+    mode: "REAL_DATA";
+    plant_name: string;
+    timings: {
+        plant_load_s: number;
+        analyses_wall_s: number;
+        analyses_sum_s: number;
+        total_s: number;
+    };
+    analyses: Partial<Record<AnalysisName, AnalysisRunResult>>;
+    requested: AnalysisName[];
+    num_sim: number;
+    executor: "processes" | "threads";
+    start_method: string | null;
+    workers: number;
+}
+
+// --- What-if reruns (POST /what-if) ---
+
+export interface WhatIfRequest {
+    num_sim?: number;
+    reg_model?: RegModel;
+    time_resolution?: TimeResolution;
+    reanalysis_products?: string[];
+    reg_temperature?: boolean;
+    reg_wind_direction?: boolean;
+    outlier_detection?: boolean;
+    uncertainty_outlier?: [number, number];
+    uncertainty_loss_max?: [number, number];
+    uncertainty_windiness?: [number, number];
+    uncertainty_meter?: number;
+    uncertainty_losses?: number;
+    uncertainty_nan_energy?: number;
+    end_date_lt?: string;
+    seed?: number | null;
+}
+
+export interface WhatIfStage {
+    cached: boolean;
+    seconds?: number;
+}
+
+export interface WhatIfResponse {
+    status: "success";
+    mode: "REAL_DATA";
+    aep_gwh: number;
+    aep_std_gwh: number;
+    uncertainty: string;
+    availability_loss_pct: number;
+    curtailment_loss_pct: number;
+    parameters: WhatIfRequest;
+    stages: Record<string, WhatIfStage>;
+    elapsed_s: number;
+}